@@ -0,0 +1,40 @@
+# Copyright (c) 2020, Battelle Memorial Institute
+# Copyright 2007 - present: numerous others credited in AUTHORS.rst
+
+''' Build time of build_model as a function of buses x periods
+
+    python benchmarks/build_scaling.py [case ...] [--periods 24,96,288]
+'''
+
+import argparse
+import logging
+
+from psst.case.arrays import CaseArrays
+from psst.model import build_model
+
+from common import load_case, timer, ZONAL_DATA
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('cases', nargs='*', default=['case5', 'case14', 'case118'])
+    parser.add_argument('--periods', default='24,96,288')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    print('{:>10} {:>6} {:>8} {:>10} {:>12} {:>10}'.format('case', 'buses', 'periods', 'buses*T', 'ingest [s]', 'build [s]'))
+    for name in args.cases:
+        for periods in [int(p) for p in args.periods.split(',')]:
+            case = load_case(name, periods=periods)
+            timings = dict()
+            with timer(timings, 'ingest'):
+                CaseArrays(case)
+            with timer(timings, 'build'):
+                build_model(case, ZonalDataComplete=ZONAL_DATA)
+            print('{:>10} {:>6} {:>8} {:>10} {:>12.4f} {:>10.3f}'.format(
+                name, len(case.bus), periods, len(case.bus) * periods, timings['ingest'], timings['build']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# Copyright (c) 2020, Battelle Memorial Institute
+# Copyright 2007 - present: numerous others credited in AUTHORS.rst
+
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from psst.case import read_matpower
+
+CASES_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'cases')
+
+ZONAL_DATA = {'zonalData': {'NumberOfZones': 0, 'Zones': '', 'HasZonalReserves': False},
+              'zonalBusData': {},
+              'ReserveDownZonalPercent': {},
+              'ReserveUpZonalPercent': {}}
+
+
+def load_case(name, periods=24, minimum_up_time=2, minimum_down_time=2, segments=5):
+    ''' Reads a bundled MATPOWER case and fills in the SCUC data that MATPOWER files do not carry '''
+    case = read_matpower(os.path.join(CASES_DIRECTORY, '{}.m'.format(name)))
+
+    case.gen['UnitOnT0State'] = 1
+    case.gen['MINIMUM_UP_TIME'] = minimum_up_time
+    case.gen['MINIMUM_DOWN_TIME'] = minimum_down_time
+    case.gencost['NS'] = segments
+    case.gencost['COLD_START_HOURS'] = 2
+    case.gencost['STARTUP_HOT'] = 10.0
+    case.gencost['STARTUP_COLD'] = 20.0
+    case.gencost['SHUTDOWN_COEFFICIENT'] = 0.0
+
+    # Daily sinusoidal profile around the MATPOWER bus load, repeated for the requested number of periods
+    profile = 0.8 + 0.2 * np.sin(2 * np.pi * np.arange(periods) / 24.0)
+    case.load = pd.DataFrame(np.outer(profile, case.bus['PD'].values), columns=case.bus.index)
+    case.gen_status = pd.DataFrame(np.nan, index=case.load.index, columns=case.gen.index)
+
+    case.TimePeriodLength = 1
+    case.ReserveDownSystemPercent = 0.0
+    case.ReserveUpSystemPercent = 0.0
+    case.PositiveMismatchPenalty = 1e6
+    case.NegativeMismatchPenalty = 1e6
+    case.PriceSenLoadFlag = 0
+    case.StorageFlag = 0
+
+    return case
+
+
+@contextmanager
+def timer(timings, name):
+    start = time.perf_counter()
+    yield
+    timings[name] = time.perf_counter() - start
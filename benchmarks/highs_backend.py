@@ -0,0 +1,62 @@
+# Copyright (c) 2020, Battelle Memorial Institute
+# Copyright 2007 - present: numerous others credited in AUTHORS.rst
+
+''' Solve times of the in-process HiGHS backend against the subprocess solvers
+
+    python benchmarks/highs_backend.py [case ...] [--periods 24] [--solvers highs glpk cbc] [--threads 1]
+
+Each solver solves the unit commitment, then the dispatch with the commitment fixed for the LMPs. The lmp
+column is the number of (bus, time) prices returned. Solvers that are not installed are skipped.
+'''
+
+import argparse
+import logging
+
+from pyomo.environ import SolverFactory, value
+
+from psst.model import build_model
+
+from common import load_case, timer, ZONAL_DATA
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('cases', nargs='*', default=['case5', 'case14', 'case118'])
+    parser.add_argument('--periods', type=int, default=24)
+    parser.add_argument('--solvers', nargs='*', default=['highs', 'glpk', 'cbc'])
+    parser.add_argument('--threads', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    solvers = list()
+    for solver in args.solvers:
+        if SolverFactory(solver).available(exception_flag=False):
+            solvers.append(solver)
+        else:
+            print('Skipping {}, it is not available'.format(solver))
+
+    print('{:>10} {:>8} {:>10} {:>16} {:>10} {:>10} {:>8}'.format('case', 'solver', 'status', 'objective', 'uc', 'dispatch', 'lmp'))
+    for name in args.cases:
+        for solver in solvers:
+            options = dict() if args.threads is None else {'threads': args.threads}
+            timings = dict()
+
+            psst_model = build_model(load_case(name, periods=args.periods), ZonalDataComplete=ZONAL_DATA)
+            with timer(timings, 'uc'):
+                _, status = psst_model.solve(solver=solver, **options)
+            objective = value(psst_model._model.TotalCostObjective)
+
+            case = load_case(name, periods=args.periods)
+            case.gen_status = psst_model.results._get('UnitOn', psst_model._model).round().astype(int)
+            dispatch = build_model(case, ZonalDataComplete=ZONAL_DATA)
+            with timer(timings, 'dispatch'):
+                dispatch.solve(solver=solver, **options)
+            prices = dispatch.results.lmp.notnull().values.sum()
+
+            print('{:>10} {:>8} {:>10} {:>16.3f} {:>10.3f} {:>10.3f} {:>8}'.format(
+                name, solver, status, objective, timings['uc'], timings['dispatch'], prices))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# Copyright (c) 2020, Battelle Memorial Institute
+# Copyright 2007 - present: numerous others credited in AUTHORS.rst
+
+''' Build time and relaxation gap of the big-M and startup type startup cost formulations
+
+    python benchmarks/startup_cost.py [case ...] [--periods 48] [--hot-start 50] [--cold-start 150] [--solver cbc]
+
+Start up costs are set per MW of PMAX, so that commitment decisions matter.
+'''
+
+import argparse
+import logging
+
+from pyomo.environ import TransformationFactory, value
+
+from psst.model import build_model
+from psst.solver import solve_model
+
+from common import load_case, timer, ZONAL_DATA
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('cases', nargs='*', default=['case24_ieee_rts', 'case118'])
+    parser.add_argument('--periods', type=int, default=48)
+    parser.add_argument('--hot-start', type=float, default=50.0)
+    parser.add_argument('--cold-start', type=float, default=150.0)
+    parser.add_argument('--cold-start-hours', type=int, default=6)
+    parser.add_argument('--solver', default='cbc')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    print('{:>16} {:>14} {:>12} {:>16} {:>16} {:>10} {:>10}'.format(
+        'case', 'formulation', 'build [s]', 'LP bound', 'MIP objective', 'gap [%]', 'solve [s]'))
+    for name in args.cases:
+        for formulation in ['big_m', 'startup_type']:
+            case = load_case(name, periods=args.periods, minimum_up_time=3, minimum_down_time=3)
+            case.gencost['STARTUP_HOT'] = args.hot_start * case.gen['PMAX'].values
+            case.gencost['STARTUP_COLD'] = args.cold_start * case.gen['PMAX'].values
+            case.gencost['COLD_START_HOURS'] = args.cold_start_hours
+
+            timings = dict()
+            with timer(timings, 'build'):
+                model = build_model(case, ZonalDataComplete=ZONAL_DATA, config={'startup_cost_formulation': formulation})
+
+            relaxed = model._model.clone()
+            TransformationFactory('core.relax_integer_vars').apply_to(relaxed)
+            solve_model(relaxed, solver=args.solver, verbose=False, is_mip=False)
+
+            with timer(timings, 'solve'):
+                model.solve(solver=args.solver, verbose=False)
+            bound, objective = value(relaxed.TotalCostObjective), value(model._model.TotalCostObjective)
+            print('{:>16} {:>14} {:>12.3f} {:>16.2f} {:>16.2f} {:>10.3f} {:>10.2f}'.format(
+                name, formulation, timings['build'], bound, objective, 100 * (objective - bound) / objective, timings['solve']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# Copyright (c) 2020, Battelle Memorial Institute
+# Copyright 2007 - present: numerous others credited in AUTHORS.rst
+
+''' Build time, size and relaxation strength of the minimum up and down time formulations
+
+    python benchmarks/up_down_time.py [case ...] [--periods 48] [--up-down-time 4] [--solver cbc]
+'''
+
+import argparse
+import logging
+
+from pyomo.environ import TransformationFactory, value
+
+from psst.model import build_model
+from psst.solver import solve_model
+
+from common import load_case, timer, ZONAL_DATA
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('cases', nargs='*', default=['case24_ieee_rts', 'case118'])
+    parser.add_argument('--periods', type=int, default=48)
+    parser.add_argument('--up-down-time', type=int, default=4)
+    parser.add_argument('--solver', default='cbc')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    print('{:>16} {:>12} {:>12} {:>12} {:>16} {:>16} {:>10}'.format(
+        'case', 'formulation', 'build [s]', 'constraints', 'LP bound', 'MIP objective', 'solve [s]'))
+    for name in args.cases:
+        for formulation in ['window', 'turn_on_off']:
+            case = load_case(name, periods=args.periods, minimum_up_time=args.up_down_time, minimum_down_time=args.up_down_time)
+            model = build_model(case, ZonalDataComplete=ZONAL_DATA, config={'up_down_time_formulation': formulation, 'report': True})
+            stage = model.build_report.stages.loc['constraint_up_down_time']
+
+            relaxed = model._model.clone()
+            TransformationFactory('core.relax_integer_vars').apply_to(relaxed)
+            solve_model(relaxed, solver=args.solver, verbose=False, is_mip=False)
+
+            timings = dict()
+            with timer(timings, 'solve'):
+                model.solve(solver=args.solver, verbose=False)
+            print('{:>16} {:>12} {:>12.3f} {:>12} {:>16.2f} {:>16.2f} {:>10.2f}'.format(
+                name, formulation, stage['time'], int(stage['constraints']), value(relaxed.TotalCostObjective),
+                value(model._model.TotalCostObjective), timings['solve']))
+
+
+if __name__ == '__main__':
+    main()
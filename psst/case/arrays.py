@@ -0,0 +1,202 @@
+# Copyright (c) 2020, Battelle Memorial Institute
+# Copyright 2007 - present: numerous others credited in AUTHORS.rst
+
+import logging
+
+import pandas as pd
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _column(df, name, default=0.0, dtype=float):
+    if name not in df.columns:
+        return np.full(len(df.index), default, dtype=dtype)
+    return pd.to_numeric(df[name], errors='coerce').fillna(default).values.astype(dtype)
+
+
+def _positions(index, names, kind):
+    positions = index.get_indexer(pd.Index(names))
+    if (positions == -1).any():
+        missing = pd.Index(names)[positions == -1].unique().tolist()
+        raise KeyError('Unknown {} referenced in case: {}'.format(kind, missing))
+    return positions
+
+
+def status_matrix(gen_status, time_periods, gen_names):
+    ''' Returns gen_status as a (time, generator) float array, NaN where the status is not fixed '''
+    if gen_status is None:
+        return np.full((len(time_periods), len(gen_names)), np.nan)
+    gen_status = gen_status.reindex(index=time_periods, columns=gen_names)
+    return gen_status.apply(pd.to_numeric, errors='coerce').values.astype(float)
+
+
+def fixed_entries(status, time_periods, gen_names):
+    ''' Returns (generator, time, status) triples for every non-NaN entry of a status matrix '''
+    tt, gg = np.nonzero(~np.isnan(status))
+    return zip(pd.Index(gen_names)[gg], [time_periods[i] for i in tt], status[tt, gg].astype(int).tolist())
+
+
+class CaseArrays(object):
+    ''' Typed NumPy view of the case tables used to build a model.
+
+    Every table is read once and stored as arrays aligned to ``bus_names``,
+    ``line_names``, ``gen_names`` and ``time_periods``, so that the model
+    helpers can be fed without walking the DataFrames row by row.
+    '''
+
+    def __init__(self, case, generator_df=None, load_df=None, branch_df=None, bus_df=None, base_MVA=None):
+
+        if base_MVA is None:
+            base_MVA = case.baseMVA
+
+        if generator_df is None:
+            generator_df = pd.merge(case.gen, case.gencost, left_index=True, right_index=True)
+        if load_df is None:
+            load_df = case.load
+        if branch_df is None:
+            branch_df = case.branch
+        if bus_df is None:
+            bus_df = case.bus
+
+        self.base_MVA = base_MVA
+
+        # Buses
+        self.bus_names = pd.Index(bus_df.index, dtype=object)
+        self.bus_index = {b: i for i, b in enumerate(self.bus_names)}
+        slack = np.flatnonzero(_column(bus_df, 'TYPE') == 3)
+        self.slack_bus = int(slack[0]) if len(slack) else 0
+
+        # Branches
+        self.line_names = pd.Index(branch_df.index, dtype=object)
+        self.line_from = _positions(self.bus_names, branch_df['F_BUS'].values, 'bus')
+        self.line_to = _positions(self.bus_names, branch_df['T_BUS'].values, 'bus')
+        self.reactance = _column(branch_df, 'BR_X') / base_MVA
+        self.thermal_limit = _column(branch_df, 'RATE_A')
+        self.line_status = _column(branch_df, 'BR_STATUS', default=1.0)
+
+        # Generators
+        self.gen_names = pd.Index(generator_df.index, dtype=object)
+        self.gen_bus = _positions(self.bus_names, generator_df['GEN_BUS'].values, 'bus')
+        self.pmin = _column(generator_df, 'PMIN')
+        self.pmax = _column(generator_df, 'PMAX')
+        self.ramp_up = _column(generator_df, 'RAMP_10')
+        self.ramp_down = _column(generator_df, 'RAMP_10')
+        self.startup_ramp = _column(generator_df, 'STARTUP_RAMP')
+        self.shutdown_ramp = _column(generator_df, 'SHUTDOWN_RAMP')
+        self.minimum_up_time = _column(generator_df, 'MINIMUM_UP_TIME', default=0, dtype=int)
+        self.minimum_down_time = _column(generator_df, 'MINIMUM_DOWN_TIME', default=0, dtype=int)
+        self.unit_on_t0_state = _column(generator_df, 'UnitOnT0State')
+
+        self.ncost = _column(generator_df, 'NCOST', default=0, dtype=int)
+        self.segments = _column(generator_df, 'NS', default=0, dtype=int)
+        self.cost = np.column_stack([_column(generator_df, 'COST_{}'.format(i)) for i in range(0, 3)])
+
+        # Start up and shut down costs are always read from the case gencost table
+        gencost = case.gencost.reindex(self.gen_names)
+        self.cold_start_hours = _column(gencost, 'COLD_START_HOURS', default=0, dtype=int)
+        self.hot_start_cost = _column(gencost, 'STARTUP_HOT')
+        self.cold_start_cost = _column(gencost, 'STARTUP_COLD')
+        self.shutdown_cost_coefficient = _column(gencost, 'SHUTDOWN_COEFFICIENT')
+
+        # Time series
+        self.time_periods = list(load_df.index)
+        self.load_buses = pd.Index(load_df.columns, dtype=object)
+        self.load = load_df.apply(pd.to_numeric, errors='coerce').values.astype(float)
+
+        self.gen_status = status_matrix(getattr(case, 'gen_status', None), self.time_periods, self.gen_names)
+
+    def __repr__(self):
+        repr_string = 'Buses={}, Branches={}, Generators={}, TimePeriods={}'.format(
+                len(self.bus_names), len(self.line_names), len(self.gen_names), len(self.time_periods))
+        return '<{}.{}({})>'.format(self.__class__.__module__, self.__class__.__name__, repr_string)
+
+    def _by_position(self, values, names):
+        return dict(zip(names, values.tolist()))
+
+    def line_dict(self, values):
+        return self._by_position(values, self.line_names)
+
+    def gen_dict(self, values):
+        return self._by_position(values, self.gen_names)
+
+    @property
+    def line_from_bus(self):
+        return self.bus_names[self.line_from]
+
+    @property
+    def line_to_bus(self):
+        return self.bus_names[self.line_to]
+
+    def lines_at_bus(self):
+        ''' Returns the (lines_from, lines_to) mappings of bus name to list of line names '''
+        return self._group_lines(self.line_from), self._group_lines(self.line_to)
+
+    def _group_lines(self, bus_positions):
+        line_names = np.asarray(self.line_names, dtype=object)
+        order = np.argsort(bus_positions, kind='stable')
+        boundaries = np.searchsorted(bus_positions[order], np.arange(1, len(self.bus_names)))
+        return {b: list(l) for b, l in zip(self.bus_names, np.split(line_names[order], boundaries))}
+
+    def generators_at_bus(self):
+        ''' Returns a mapping of bus name to list of generator names, for buses that have generators '''
+        generator_at_bus = dict()
+        for b, g in zip(self.bus_names[self.gen_bus], self.gen_names):
+            generator_at_bus.setdefault(b, list()).append(g)
+        return generator_at_bus
+
+    def demand(self):
+        ''' Returns the (bus, time) demand dictionary for every non-zero entry of the load table '''
+        load = np.nan_to_num(self.load)
+        tt, bb = np.nonzero(load)
+        buses = self.load_buses[bb]
+        periods = [self.time_periods[i] for i in tt]
+        return dict(zip(zip(buses, periods), load[tt, bb].tolist()))
+
+    def demand_matrix(self):
+        ''' Returns the load table as a (time, bus) array aligned to bus_names '''
+        positions = self.bus_names.get_indexer(self.load_buses)
+        demand = np.zeros((len(self.time_periods), len(self.bus_names)))
+        valid = positions != -1
+        demand[:, positions[valid]] = np.nan_to_num(self.load[:, valid])
+        return demand
+
+    def fixed_commitment(self):
+        ''' Returns (generator, time, status) triples for every fixed entry of gen_status '''
+        return fixed_entries(self.gen_status, self.time_periods, self.gen_names)
+
+    def cost_coefficients(self):
+        ''' Returns the (constant, linear, quadratic) cost coefficients of every generator
+
+        Generators with a linear cost (NCOST=2) get a zero quadratic coefficient.
+        '''
+        polynomial = (self.ncost == 2) | (self.ncost == 3)
+        if not polynomial.all():
+            i = np.flatnonzero(~polynomial)[0]
+            raise ValueError('Generator {} has no polynomial cost curve (NCOST={})'.format(self.gen_names[i], self.ncost[i]))
+        return self.cost[:, 0], self.cost[:, 1], np.where(self.ncost == 3, self.cost[:, 2], 0)
+
+    def cost_curves(self):
+        ''' Returns the (points, values) dictionaries of the piecewise linear production cost curves
+
+        Breakpoints are spaced linearly between PMIN and PMAX with NS segments; generators that share the
+        same number of segments are evaluated together.
+        '''
+        points = dict()
+        values = dict()
+
+        linear = self.ncost == 2
+        quadratic = self.ncost == 3
+
+        pmax = np.where(linear & (self.pmin == self.pmax), self.pmax + 1, self.pmax)
+
+        for ns in np.unique(self.segments[linear | quadratic]):
+            selected = np.flatnonzero((linear | quadratic) & (self.segments == ns))
+            x = np.linspace(self.pmin[selected], pmax[selected], num=int(ns) + 1, axis=1)
+            c = self.cost[selected]
+            y = c[:, [0]] + c[:, [1]] * x + np.where(quadratic[selected], c[:, 2], 0)[:, None] * x ** 2
+            for i, g in enumerate(self.gen_names[selected]):
+                points[g] = x[i].tolist()
+                values[g] = y[i].tolist()
+
+        return points, values
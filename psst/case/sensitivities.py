@@ -0,0 +1,287 @@
+# Copyright (c) 2020, Battelle Memorial Institute
+# Copyright 2007 - present: numerous others credited in AUTHORS.rst
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+
+from .arrays import _column, _positions
+
+logger = logging.getLogger(__name__)
+
+# Number of factorized networks kept in memory by SensitivityEngine.from_case
+ENGINE_CACHE_SIZE = 8
+_engines = OrderedDict()
+
+DEFAULT_CACHE_DIRECTORY = os.environ.get('PSST_CACHE_DIRECTORY', os.path.join(os.path.expanduser('~'), '.cache', 'psst', 'sensitivities'))
+
+
+class SensitivityEngine(object):
+    ''' Sparse DC power flow sensitivities of a network
+
+    The bus susceptance matrix is built sparsely from the branch table, reduced by the slack bus and factorized
+    once with a sparse LU decomposition; PTDF rows and LODF columns are then obtained by solving against the
+    factors, only for the lines that are asked for. Conventions follow pypower's makePTDF and makeLODF: rows
+    are branches, columns are buses in the order of the bus table, the slack column is zero and out of service
+    branches have zero susceptance. With taps=False the susceptance of a branch is 1 / BR_X whatever its TAP,
+    as in the angle formulation of build_model.
+    '''
+
+    def __init__(self, case=None, branch_df=None, bus_df=None, slack_bus=None, taps=True):
+
+        if branch_df is None:
+            branch_df = case.branch
+        if bus_df is None:
+            bus_df = case.bus
+
+        self.bus_names = pd.Index(bus_df.index, dtype=object)
+        self.line_names = pd.Index(branch_df.index, dtype=object)
+        self.line_from = _positions(self.bus_names, branch_df['F_BUS'].values, 'bus')
+        self.line_to = _positions(self.bus_names, branch_df['T_BUS'].values, 'bus')
+
+        if slack_bus is None:
+            slack = np.flatnonzero(_column(bus_df, 'TYPE') == 3)
+            slack_bus = int(slack[0]) if len(slack) else 0
+        self.slack_bus = slack_bus
+
+        reactance = _column(branch_df, 'BR_X')
+        tap = _column(branch_df, 'TAP') if taps is True else np.ones(len(reactance))
+        tap[tap == 0] = 1
+        status = _column(branch_df, 'BR_STATUS', default=1.0)
+        self.susceptance = np.divide(status, reactance * tap, out=np.zeros(len(reactance)), where=status != 0)
+
+        nb, nl = len(self.bus_names), len(self.line_names)
+        lines = np.arange(nl)
+        # Branch-bus incidence matrix, +1 at the from bus and -1 at the to bus
+        self.incidence = sp.csr_matrix((np.concatenate([np.ones(nl), -np.ones(nl)]),
+                                        (np.concatenate([lines, lines]), np.concatenate([self.line_from, self.line_to]))),
+                                       shape=(nl, nb))
+        self.bus_susceptance = (self.incidence.T @ sp.diags(self.susceptance) @ self.incidence).tocsc()
+
+        self._noslack = np.flatnonzero(np.arange(nb) != self.slack_bus)
+        self._lu = None
+
+    def __repr__(self):
+        repr_string = 'Buses={}, Branches={}, slack_bus={}'.format(len(self.bus_names), len(self.line_names), self.bus_names[self.slack_bus])
+        return '<{}.{}({})>'.format(self.__class__.__module__, self.__class__.__name__, repr_string)
+
+    @classmethod
+    def from_case(cls, case, slack_bus=None, taps=True):
+        ''' Returns the engine of the network of case, reusing the factors of a previous call on the same topology '''
+        engine = cls(case, slack_bus=slack_bus, taps=taps)
+        key = engine.fingerprint
+        if key in _engines:
+            _engines.move_to_end(key)
+            return _engines[key]
+        _engines[key] = engine
+        while len(_engines) > ENGINE_CACHE_SIZE:
+            _engines.popitem(last=False)
+        return engine
+
+    @property
+    def fingerprint(self):
+        ''' Hash of everything the sensitivities depend on: branch endpoints, susceptances and slack bus '''
+        h = hashlib.sha1()
+        for a in (self.line_from, self.line_to, self.susceptance, np.array([self.slack_bus, len(self.bus_names)])):
+            h.update(np.ascontiguousarray(a).tobytes())
+        return h.hexdigest()
+
+    @property
+    def factors(self):
+        ''' Sparse LU factors of the bus susceptance matrix without the slack row and column '''
+        if self._lu is None:
+            reduced = self.bus_susceptance[self._noslack][:, self._noslack].tocsc()
+            try:
+                # Symmetric positive definite, so diagonal pivots and a symmetric ordering keep the fill-in low
+                self._lu = splu(reduced, permc_spec='MMD_AT_PLUS_A', diag_pivot_thresh=0., options=dict(SymmetricMode=True))
+            except RuntimeError:
+                raise ValueError('Bus susceptance matrix is singular, the network is islanded')
+        return self._lu
+
+    def _line_positions(self, lines):
+        if lines is None:
+            return np.arange(len(self.line_names))
+        return _positions(self.line_names, lines, 'branch')
+
+    def _solve(self, rhs):
+        # Solves B x = rhs for a (bus, k) right hand side, with x and rhs zero at the slack bus
+        x = np.zeros(rhs.shape)
+        x[self._noslack] = self.factors.solve(np.ascontiguousarray(rhs[self._noslack]))
+        return x
+
+    def _ptdf_rows(self, positions):
+        # The susceptance matrix is symmetric, so row l of the PTDF is B^-1 (b_l a_l)
+        rhs = (sp.diags(self.susceptance[positions]) @ self.incidence[positions]).T.toarray()
+        return self._solve(rhs).T
+
+    def ptdf(self, lines=None, chunk=1024):
+        ''' Returns the dense (line, bus) PTDF rows of lines, all branches by default '''
+        positions = self._line_positions(lines)
+        ptdf = np.empty((len(positions), len(self.bus_names)))
+        for start in range(0, len(positions), chunk):
+            ptdf[start:start + chunk] = self._ptdf_rows(positions[start:start + chunk])
+        return ptdf
+
+    def sparse_ptdf(self, lines=None, tolerance=0, chunk=1024):
+        ''' Returns the PTDF rows of lines as a CSR matrix, dropping entries smaller than tolerance in magnitude
+
+        Rows are computed chunk by chunk, so the dense matrix is never held in memory at once.
+        '''
+        positions = self._line_positions(lines)
+        blocks = [sp.csr_matrix((0, len(self.bus_names)))]
+        for start in range(0, len(positions), chunk):
+            block = self._ptdf_rows(positions[start:start + chunk])
+            block[abs(block) <= tolerance] = 0
+            blocks.append(sp.csr_matrix(block))
+        return sp.vstack(blocks, format='csr')
+
+    def lodf(self, lines=None, outages=None):
+        ''' Returns the dense (monitored line, outaged branch) LODF matrix
+
+        Entry (l, k) is the change of flow on l per unit of pre-outage flow on k when k is taken out of service.
+        The diagonal entries are -1. Outages that island the network have no defined LODF and are NaN.
+        '''
+        monitored = self._line_positions(lines)
+        outaged = self._line_positions(outages)
+
+        # Flows on every branch caused by a unit transfer between the ends of each outaged branch
+        transfer = self._solve(self.incidence[outaged].T.toarray())
+        flows = self.susceptance[:, None] * (self.incidence @ transfer)
+
+        denominator = 1 - flows[outaged, np.arange(len(outaged))]
+        islanding = np.isclose(denominator, 0, atol=1e-8)
+        if islanding.any():
+            logger.warning('Outage of branches {} islands the network'.format(self.line_names[outaged[islanding]].tolist()))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lodf = flows[monitored] / np.where(islanding, np.nan, denominator)
+        lodf[monitored[:, None] == outaged[None, :]] = -1
+        return lodf
+
+
+    def _outage_system(self, outaged, ptdf_outaged):
+        # I - H, with H[j, k] the flow on outaged branch j per unit transfer across outaged branch k
+        return np.eye(len(outaged)) - (ptdf_outaged[:, self.line_from[outaged]] - ptdf_outaged[:, self.line_to[outaged]])
+
+    def islanding(self, outages):
+        ''' Returns True if taking the branches in outages out of service splits the network '''
+        outaged = np.unique(self._line_positions(outages))
+        return _is_singular(self._outage_system(outaged, self._ptdf_rows(outaged)))
+
+    def outage_ptdf(self, outages, lines=None, base=None):
+        ''' Returns the (line, bus) PTDF rows of lines after the branches in outages are taken out of service
+
+        The post-outage PTDF is a rank-k (Sherman-Morrison-Woodbury) correction of the pre-outage rows that only
+        needs k solves against the factors of the base network, which is never refactorized. base holds the
+        pre-outage PTDF rows of lines, as returned by ptdf(lines); passing it lets many outages share them.
+        Outaged lines get zero rows. Raises ValueError when the outage islands the network.
+        '''
+        monitored = self._line_positions(lines)
+        outaged = np.unique(self._line_positions(outages))
+        ptdf = self._ptdf_rows(monitored) if base is None else np.array(base, dtype=float)
+        ptdf_outaged = self._ptdf_rows(outaged)
+
+        system = self._outage_system(outaged, ptdf_outaged)
+        if _is_singular(system):
+            raise ValueError('Outage of branches {} islands the network'.format(self.line_names[outaged].tolist()))
+
+        transfer = ptdf[:, self.line_from[outaged]] - ptdf[:, self.line_to[outaged]]
+        ptdf = ptdf + transfer @ np.linalg.solve(system, ptdf_outaged)
+        ptdf[np.isin(monitored, outaged)] = 0
+        return ptdf
+
+
+def _is_singular(matrix, tolerance=1e-8):
+    if len(matrix) == 0:
+        return False
+    return np.linalg.svd(matrix, compute_uv=False).min() < tolerance
+
+
+class SensitivityCache(object):
+    ''' On-disk cache of full PTDF and LODF matrices keyed by the topology fingerprint of the network
+
+    Every network gets a directory named after SensitivityEngine.fingerprint holding one ``.npy`` file per
+    matrix. Cached matrices are returned as read-only memory maps, so loading them costs little more than
+    opening the file. Entries not used for ``max_age`` seconds are removed, and the least recently used
+    entries are removed while the cache holds more than ``max_size`` bytes.
+    '''
+
+    def __init__(self, directory=None, max_size=2 ** 30, max_age=30 * 24 * 3600):
+        if directory is None:
+            directory = DEFAULT_CACHE_DIRECTORY
+        self.directory = os.path.abspath(directory)
+        self.max_size = max_size
+        self.max_age = max_age
+
+    def __repr__(self):
+        repr_string = 'directory={}, entries={}'.format(self.directory, len(self._entries()))
+        return '<{}.{}({})>'.format(self.__class__.__module__, self.__class__.__name__, repr_string)
+
+    def ptdf(self, case):
+        return self.get(SensitivityEngine.from_case(case), 'ptdf')
+
+    def lodf(self, case):
+        return self.get(SensitivityEngine.from_case(case), 'lodf')
+
+    def get(self, engine, kind):
+        ''' Returns the full ``kind`` matrix of engine ('ptdf' or 'lodf'), computing and storing it on a miss '''
+        entry = os.path.join(self.directory, engine.fingerprint)
+        filename = os.path.join(entry, '{}.npy'.format(kind))
+        if os.path.exists(filename):
+            logger.debug('Loading {} from {}'.format(kind, filename))
+            os.utime(entry)
+            return np.load(filename, mmap_mode='r')
+
+        matrix = getattr(engine, kind)()
+        os.makedirs(entry, exist_ok=True)
+        # Written to a temporary file first, so concurrent readers never see a partial matrix
+        handle, temporary = tempfile.mkstemp(dir=entry, suffix='.npy')
+        with os.fdopen(handle, 'wb') as f:
+            np.save(f, matrix)
+        os.replace(temporary, filename)
+        os.utime(entry)
+        logger.debug('Stored {} in {}'.format(kind, filename))
+
+        self.evict(keep=entry)
+        return matrix
+
+    def _entries(self):
+        # Returns (last used, size, path) of every cache entry, least recently used first
+        if not os.path.isdir(self.directory):
+            return list()
+        entries = list()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.isdir(path):
+                size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+                entries.append((os.path.getmtime(path), size, path))
+        return sorted(entries)
+
+    def evict(self, keep=None):
+        ''' Removes entries older than max_age, then the least recently used ones until the cache fits in max_size
+
+        The entry at path keep is never removed.
+        '''
+        entries = self._entries()
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+        for used, size, path in entries:
+            if path == keep:
+                continue
+            if (self.max_age is None or now - used <= self.max_age) and (self.max_size is None or total <= self.max_size):
+                continue
+            logger.debug('Evicting {}'.format(path))
+            shutil.rmtree(path, ignore_errors=True)
+            total = total - size
+
+    def clear(self):
+        for _, _, path in self._entries():
+            shutil.rmtree(path, ignore_errors=True)
@@ -7,10 +7,11 @@ import os
 import pandas as pd
 import numpy as np
 
-from pypower.makePTDF import makePTDF
 from pypower.runpf import runpf
 from pypower.rundcpf import rundcpf
 
+from .sensitivities import SensitivityEngine, SensitivityCache
+
 logger = logging.getLogger(__name__)
 
 
@@ -47,25 +48,91 @@ def incremental_cost(p, cost, N):
     return sum(cost['COST_{}'.format(i)] * i * p ** (i-1) for i in range(1, N))
 
 
-def calculate_PTDF(case, precision=None, tolerance=None):
-    bus = case.bus.copy(deep=True)
-    branch = case.branch.copy(deep=True)
-    value = [i + 1 for i in range(0, len(bus.index))]
-    bus_name = bus.index
-    bus.index = value
-    bus.index = bus.index.astype(int)
-    branch['F_BUS'] = branch['F_BUS'].apply(lambda x: value[bus_name.get_loc(x)]).astype(int)
-    branch['T_BUS'] = branch['T_BUS'].apply(lambda x: value[bus_name.get_loc(x)]).astype(int)
-    bus = np.array(bus.reset_index())
-    branch = np.array(branch)
-    ptdf = makePTDF(case.baseMVA, bus, branch, )
+def calculate_PTDF(case, precision=None, tolerance=None, lines=None, cache=None, taps=True):
+    ''' Returns the dense (line, bus) PTDF of case, for the given lines or all branches
+
+    cache is a SensitivityCache, a cache directory or True for the default directory; the full PTDF is then
+    read from or stored in the on-disk cache. With taps=False the PTDF is the one of the network without taps.
+    '''
+    cache = sensitivity_cache(cache)
+    engine = SensitivityEngine.from_case(case, taps=taps)
+    if cache is not None and lines is None:
+        ptdf = cache.get(engine, 'ptdf')
+    else:
+        ptdf = engine.ptdf(lines=lines)
     if precision is not None:
         ptdf = ptdf.round(precision)
     if tolerance is not None:
-        ptdf[abs(ptdf) < tolerance] = 0
+        ptdf = np.where(abs(ptdf) < tolerance, 0, ptdf)
     return ptdf
 
 
+def calculate_LODF(case, lines=None, outages=None, cache=None, taps=True):
+    ''' Returns the dense (monitored line, outaged branch) LODF of case, of the network without taps for taps=False '''
+    cache = sensitivity_cache(cache)
+    engine = SensitivityEngine.from_case(case, taps=taps)
+    if cache is not None and lines is None and outages is None:
+        return cache.get(engine, 'lodf')
+    return engine.lodf(lines=lines, outages=outages)
+
+
+def sensitivity_cache(cache):
+    if cache is None or cache is False:
+        return None
+    if cache is True:
+        return SensitivityCache()
+    if isinstance(cache, SensitivityCache):
+        return cache
+    return SensitivityCache(directory=cache)
+
+
+def line_flow_bounds(ptdf, bus, lower, upper, demand, method='balance'):
+    ''' Returns (lower, upper) bounds on the flow of every (line, time) pair over all feasible dispatches
+
+    ptdf is the (line, bus) PTDF matrix and demand a (bus, time) array of fixed demand. Every dispatchable
+    injection sits at bus position bus and varies between lower and upper, arrays of shape (injection,) or
+    (injection, time); generators range from 0 to PMAX and price sensitive loads are negative injections. With
+    method='interval' every injection varies independently; with method='balance' the injections must also add
+    up to total demand, which makes the bound the solution of a fractional knapsack per line and time period.
+    The bounds do not account for a load generation mismatch.
+    '''
+    ptdf = np.asarray(ptdf)
+    demand_flow = ptdf @ demand
+    shape = (len(bus), demand.shape[1])
+    lower = np.broadcast_to(np.asarray(lower, dtype=float).reshape(len(bus), -1), shape)
+    upper = np.broadcast_to(np.asarray(upper, dtype=float).reshape(len(bus), -1), shape)
+    coefficients = ptdf[:, bus]
+
+    if method == 'interval':
+        flow_upper = np.maximum(coefficients, 0) @ upper + np.minimum(coefficients, 0) @ lower
+        flow_lower = np.minimum(coefficients, 0) @ upper + np.maximum(coefficients, 0) @ lower
+        return flow_lower - demand_flow, flow_upper - demand_flow
+    elif method != 'balance':
+        raise ValueError('Unknown line flow bound method {}'.format(method))
+
+    total_demand = demand.sum(axis=0)
+    flow_upper = np.empty(demand_flow.shape)
+    flow_lower = np.empty(demand_flow.shape)
+    for l, c in enumerate(coefficients):
+        flow_upper[l] = _knapsack(c, lower, upper, total_demand)
+        flow_lower[l] = -_knapsack(-c, lower, upper, total_demand)
+    return flow_lower - demand_flow, flow_upper - demand_flow
+
+
+def _knapsack(c, lower, upper, total):
+    # max sum(c * p) subject to sum(p) == total and lower <= p <= upper, for every time period; the injections
+    # start at their lower bounds and the remaining total fills them up in decreasing order of c
+    order = np.argsort(-c, kind='stable')
+    c, lower, capacity = c[order], lower[order], (upper - lower)[order]
+    zero = np.zeros((1, capacity.shape[1]))
+    filled = np.concatenate([zero, np.cumsum(capacity, axis=0)])
+    value = np.concatenate([zero, np.cumsum(c[:, None] * capacity, axis=0)])
+    periods = np.arange(capacity.shape[1])
+    remaining = np.clip(total - lower.sum(axis=0), 0, filled[-1])
+    k = np.clip((filled < remaining).sum(axis=0) - 1, 0, len(c) - 1)
+    return c @ lower + value[k, periods] + c[k] * (remaining - filled[k, periods])
+
+
 def solve_dcopf(case, hour=None,
         results=None,
         ppopt={'VERBOSE': False},
@@ -7,6 +7,7 @@
 import os
 import click
 import pandas as pd
+from pyomo.environ import value
 
 from .utils import read_unit_commitment, read_model
 from .model import build_model
@@ -24,7 +25,7 @@ def cli():
     pass
 
 
-def _scuc(data, output, solver):
+def _scuc(data, output, solver, report=False):
     click.echo("Running SCUC using PSST TrailVersion")
 
     click.echo("Solver: " + str(solver))
@@ -35,8 +36,10 @@ def _scuc(data, output, solver):
     click.echo("SCUC Data is read")
     # click.echo("printing c:" + c)
 
-    model = build_model(c, ZonalDataComplete=ZonalDataComplete, PriceSenLoadData=priceSenLoadData)
+    model = build_model(c, ZonalDataComplete=ZonalDataComplete, PriceSenLoadData=priceSenLoadData, config={"report": report})
     click.echo("Model is built")
+    if report:
+        click.echo(model.build_report)
 
     model.solve(solver=solver)
     # click.echo("Model is solved")
@@ -114,7 +117,7 @@ def _scuc(data, output, solver):
         for b in sorted(instance.Buses.value):
             outfile.write("%s\n" % str(b).ljust(8))
             for t in sorted(instance.TimePeriods):
-                outfile.write(" %6.2f \n" % (SlackVariablePower[(b, t)].value))
+                outfile.write(" %6.2f \n" % (value(SlackVariablePower[(b, t)])))
 
     if len(priceSenLoadData) != 0:
         with open("./SCUCPriceSensitiveLoad.dat", "w") as outfile:
@@ -135,8 +138,9 @@ def _scuc(data, output, solver):
 @click.option("--data", default=None, type=click.Path(), help="Path to model data")
 @click.option("--output", default=None, type=click.Path(), help="Path to output file")
 @click.option("--solver", default=SOLVER, help="Solver")
-def scuc(data, output, solver):
-    _scuc(data, output, solver)
+@click.option("--report", is_flag=True, default=False, help="Print the per-stage model build report")
+def scuc(data, output, solver, report):
+    _scuc(data, output, solver, report=report)
 
 
 @cli.command()
@@ -144,7 +148,8 @@ def scuc(data, output, solver):
 @click.option("--data", default=None, type=click.Path(), help="Path to model data")
 @click.option("--output", default="./output.dat", type=click.Path(), help="Path to output file")
 @click.option("--solver", default=SOLVER, help="Solver")
-def sced(uc, data, output, solver):
+@click.option("--report", is_flag=True, default=False, help="Print the per-stage model build report")
+def sced(uc, data, output, solver, report):
 
     click.echo("Running SCED using PSST")
 
@@ -160,8 +165,10 @@ def sced(uc, data, output, solver):
     c.gen_status = uc_df.astype(int)
     # click.echo("Gen status is read")
 
-    model = build_model(c, ZonalDataComplete=ZonalDataComplete, PriceSenLoadData=priceSenLoadData)
+    model = build_model(c, ZonalDataComplete=ZonalDataComplete, PriceSenLoadData=priceSenLoadData, config={"report": report})
     click.echo("Model is built")
+    if report:
+        click.echo(model.build_report)
     model.solve(solver=solver)
     click.echo("Model is solved")
     # click.echo("Model results ")
@@ -177,7 +184,7 @@ def sced(uc, data, output, solver):
         for b in sorted(instance.Buses.value):
             outfile.write("%s\n" % str(b).ljust(8))
             for t in sorted(instance.TimePeriods):
-                outfile.write(" %6.2f \n" % (SlackVariablePower[(b, t)].value))
+                outfile.write(" %6.2f \n" % (value(SlackVariablePower[(b, t)])))
 
     with open(output.strip("'"), "w") as f:
         f.write("LMP\n")
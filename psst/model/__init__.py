@@ -2,6 +2,7 @@
 # Copyright 2007 - present: numerous others credited in AUTHORS.rst
 
 import logging
+import time
 import click
 
 import pandas as pd
@@ -11,20 +12,23 @@ from .model import (create_model, initialize_buses,
                 initialize_time_periods, initialize_model, Suffix
                     )
 from .network import (initialize_network, derive_network, calculate_network_parameters, enforce_thermal_limits)
-from .generators import (initialize_generators, initial_state, maximum_minimum_power_output_generators,
+from .generators import (initialize_generators, initial_state, initial_state_from_commitment, update_initial_state, fix_initial_commitment,
+                        fix_commitment, unfix_commitment,
+                        maximum_minimum_power_output_generators,
                         ramp_up_ramp_down_limits, start_up_shut_down_ramp_limits, minimum_up_minimum_down_time,
                         fuel_cost, piece_wise_linear_cost,
-                        production_cost, minimum_production_cost,
+                        production_cost, minimum_production_cost, quadratic_cost_coefficients,
                         hot_start_cold_start_costs,
                         forced_outage,
                         generator_bus_contribution_factor)
 
 from .price_sensitive_load import (initialize_price_senstive_load, maximum_minimum_power_demand_loads,
                                    piece_wise_linear_benefit,initialize_load_demand,
-                                   quadratic_benefit_coefficients, load_benefit)
+                                   quadratic_benefit_coefficients, benefit_curves, demand_bounds)
 
-from .reserves import initialize_global_reserves, initialize_regulating_reserves, initialize_zonal_reserves
-from .demand import (initialize_demand)
+from .reserves import (initialize_global_reserves, update_global_reserves,
+                       initialize_regulating_reserves, initialize_zonal_reserves)
+from .demand import (initialize_demand, update_demand)
 
 from .constraints import (constraint_line, constraint_total_demand, constraint_net_power,
                         constraint_load_generation_mismatch,
@@ -34,10 +38,19 @@ from .constraints import (constraint_line, constraint_total_demand, constraint_n
                         constraint_up_down_time,
                         constraint_for_cost,
                         constraint_for_benefit,
-                        objective_function)
+                        update_hot_start,
+                        add_violated_line_limits,
+                        constraint_contingency,
+                        add_violated_contingency_limits,
+                        objective_function,
+                        LineSensitivities)
 
-from ..solver import solve_model, PSSTResults
-from ..case.utils import calculate_PTDF
+from .report import BuildReport
+from .scaling import scale_constraints
+
+from ..solver import solve_model, PSSTResults, PersistentSolver, has_sos_constraints, IN_PROCESS_SOLVERS
+from ..case.utils import calculate_PTDF, calculate_LODF, line_flow_bounds
+from ..case.arrays import CaseArrays, status_matrix, fixed_entries
 
 logger = logging.getLogger(__file__)
 
@@ -69,153 +82,122 @@ def build_model(case,
 
     # Get configuration parameters from dictionary
     use_ptdf = config.pop('use_ptdf', False)
+    template = config.pop('template', False)
+    lazy_line_limits = config.pop('lazy_line_limits', False)
+    screen_line_limits = config.pop('screen_line_limits', False)
+    security_constraints = config.pop('security_constraints', False)
+    up_down_time_formulation = config.pop('up_down_time_formulation', 'window')
+    startup_cost_formulation = config.pop('startup_cost_formulation', 'big_m')
+    production_cost_formulation = config.pop('production_cost_formulation', 'epigraph')
+    lean_formulation = config.pop('lean_formulation', False)
+    # Scaling compiles the whole constraint matrix once more, which about doubles the build time of large cases
+    scaling = config.pop('scaling', False)
+
+    if screen_line_limits is not False and case.StorageFlag != 0:
+        raise ValueError('Line limit screening does not support storage')
 
-    generator_df = generator_df or pd.merge(case.gen, case.gencost, left_index=True, right_index=True)
-    load_df = load_df or case.load
-    branch_df = branch_df or case.branch
-    bus_df = bus_df or case.bus
     ReserveDownSystemPercent = case.ReserveDownSystemPercent
     ReserveUpSystemPercent = case.ReserveUpSystemPercent
 
+    model = create_model()
+    report = BuildReport(model, enabled=config.pop('report', False))
 
-    branch_df.index = branch_df.index.astype(object)
-    generator_df.index = generator_df.index.astype(object)
-    bus_df.index = bus_df.index.astype(object)
-    load_df.index = load_df.index.astype(object)
-
-    branch_df = branch_df.astype(object)
-    generator_df = generator_df.astype(object)
-    bus_df = bus_df.astype(object)
-    load_df = load_df.astype(object)
+    # Read the case tables once into typed arrays
+    report.begin('ingest')
+    arrays = CaseArrays(case, generator_df=generator_df, load_df=load_df, branch_df=branch_df, bus_df=bus_df, base_MVA=base_MVA)
 
     # Build model information
 
-    model = create_model()
-
-    initialize_buses(model, bus_names=bus_df.index)
-    initialize_time_periods(model, time_periods=list(load_df.index), time_period_length=case.TimePeriodLength)
+    report.begin('buses_time_periods')
+    initialize_buses(model, bus_names=list(arrays.bus_names))
+    initialize_time_periods(model, time_periods=arrays.time_periods, time_period_length=case.TimePeriodLength)
 
     # Build network data
-    initialize_network(model, transmission_lines=list(branch_df.index), bus_from=branch_df['F_BUS'].to_dict(), bus_to=branch_df['T_BUS'].to_dict())
-
-    lines_to = {b: list() for b in bus_df.index.unique()}
-    lines_from = {b: list() for b in bus_df.index.unique()}
+    report.begin('network')
+    initialize_network(model, transmission_lines=list(arrays.line_names),
+                        bus_from=arrays.line_dict(arrays.line_from_bus), bus_to=arrays.line_dict(arrays.line_to_bus))
 
-    for i, l in branch_df.iterrows():
-        lines_from[l['F_BUS']].append(i)
-        lines_to[l['T_BUS']].append(i)
+    lines_from, lines_to = arrays.lines_at_bus()
 
     derive_network(model, lines_from=lines_from, lines_to=lines_to)
-    calculate_network_parameters(model, reactance=(branch_df['BR_X'] / base_MVA).to_dict())
-    enforce_thermal_limits(model, thermal_limit=branch_df['RATE_A'].to_dict())
+    calculate_network_parameters(model, reactance=arrays.line_dict(arrays.reactance))
+    enforce_thermal_limits(model, thermal_limit=arrays.line_dict(arrays.thermal_limit))
 
     # Build generator data
 
-    generator_at_bus = {b: list() for b in generator_df['GEN_BUS'].unique()}
-
-    for i, g in generator_df.iterrows():
-        generator_at_bus[g['GEN_BUS']].append(i)
-
+    report.begin('generators')
     initialize_generators(model,
-                        generator_names=generator_df.index,
-                        generator_at_bus=generator_at_bus)
+                        generator_names=list(arrays.gen_names),
+                        generator_at_bus=arrays.generators_at_bus())
 
     fuel_cost(model)
 
     maximum_minimum_power_output_generators(model,
-                                        minimum_power_output=generator_df['PMIN'].to_dict(),
-                                        maximum_power_output=generator_df['PMAX'].to_dict())
+                                        minimum_power_output=arrays.gen_dict(arrays.pmin),
+                                        maximum_power_output=arrays.gen_dict(arrays.pmax))
 
-    ramp_up_ramp_down_limits(model, ramp_up_limits=generator_df['RAMP_10'].to_dict(), ramp_down_limits=generator_df['RAMP_10'].to_dict())
+    ramp_up_ramp_down_limits(model, ramp_up_limits=arrays.gen_dict(arrays.ramp_up), ramp_down_limits=arrays.gen_dict(arrays.ramp_down))
 
-    start_up_shut_down_ramp_limits(model, start_up_ramp_limits=generator_df['STARTUP_RAMP'].to_dict(), shut_down_ramp_limits=generator_df['SHUTDOWN_RAMP'].to_dict(),
-                                   max_power_available=generator_df['PMAX'].to_dict())
+    start_up_shut_down_ramp_limits(model, start_up_ramp_limits=arrays.gen_dict(arrays.startup_ramp), shut_down_ramp_limits=arrays.gen_dict(arrays.shutdown_ramp),
+                                   max_power_available=arrays.gen_dict(arrays.pmax))
 
-    minimum_up_minimum_down_time(model, minimum_up_time=generator_df['MINIMUM_UP_TIME'].astype(int).to_dict(), 
-                                 minimum_down_time=generator_df['MINIMUM_DOWN_TIME'].astype(int).to_dict())
+    minimum_up_minimum_down_time(model, minimum_up_time=arrays.gen_dict(arrays.minimum_up_time),
+                                 minimum_down_time=arrays.gen_dict(arrays.minimum_down_time))
 
     forced_outage(model)
 
     generator_bus_contribution_factor(model)
 
     
-    if previous_unit_commitment_df is None:
-        previous_unit_commitment = dict()
-        for g in generator_df.index:
-            previous_unit_commitment[g] = [0] * len(load_df)
-        previous_unit_commitment_df = pd.DataFrame(previous_unit_commitment)
-        previous_unit_commitment_df.index = load_df.index
-
-    diff = previous_unit_commitment_df.diff()
-
-    initial_state_dict = dict()
-    for col in diff.columns:
-        s = diff[col].dropna()
-        diff_s = s[s!=0]
-        if diff_s.empty:
-            check_row = previous_unit_commitment_df[col].head(1)
-        else:
-            check_row = diff_s.tail(1)
-
-        if check_row.values == -1 or check_row.values == 0:
-            initial_state_dict[col] = -1 * (len(load_df) - int(check_row.index.values))
-        else:
-            initial_state_dict[col] = len(load_df) - int(check_row.index.values)
+    report.begin('initial_state')
+    initial_state_dict = arrays.gen_dict(arrays.unit_on_t0_state)
+    if previous_unit_commitment_df is not None:
+        # The commitment of the previous horizon overrides UnitOnT0State for the generators it covers
+        derived = initial_state_from_commitment(previous_unit_commitment_df, time_period_length=case.TimePeriodLength)
+        initial_state_dict.update({g: v for g, v in derived.items() if g in initial_state_dict})
 
     logger.debug("Initial State of generators is {}".format(initial_state_dict))
-    initial_state_dict = generator_df['UnitOnT0State'].to_dict()
 
     initial_state(model, initial_state=initial_state_dict)
 
     # setup production cost for generators
 
-    points = dict()
-    values = dict()
-
-    for i, g in generator_df.iterrows():
-        #click.echo("i:" + i + " g: " + str(g))
-        if g['NCOST'] == 2:
-            logger.debug("NCOST=2")
-            if g['PMIN'] == g['PMAX']:
-                small_increment = 1
-            else:
-                small_increment = 0
-            points[i] = np.linspace(g['PMIN'], g['PMAX'] + small_increment, num=int(g['NS'])+1)
-            values[i] = g['COST_0'] + g['COST_1'] * points[i]
-        if g['NCOST'] == 3:
-            points[i] = np.linspace(g['PMIN'], g['PMAX'], num=int(g['NS'])+1)
-            values[i] = g['COST_0'] + g['COST_1'] * points[i] + g['COST_2'] * points[i] ** 2
-
-    for k, v in points.items():
-        points[k] = [float(i) for i in v]
-    for k, v in values.items():
-        values[k] = [float(i) for i in v]
+    report.begin('production_cost')
+    breakpoints = None
+    if production_cost_formulation == 'quadratic':
+        # The cost polynomial is passed to the solver as is, without piecewise linear breakpoints
+        a0, a1, a2 = arrays.cost_coefficients()
+        if (a2 < 0).any():
+            raise ValueError('Generators {} have concave cost curves, which make the quadratic objective non-convex; use '
+                             'the epigraph production_cost_formulation'.format(arrays.gen_names[a2 < 0].tolist()))
+        quadratic_cost_coefficients(model, production_cost_a=arrays.gen_dict(a0),
+                                    production_cost_b=arrays.gen_dict(a1), production_cost_c=arrays.gen_dict(a2))
+        piece_wise_linear_cost(model, {g: [] for g in arrays.gen_names}, {g: [] for g in arrays.gen_names})
+        minimum_production_cost(model)
+    else:
+        points, values = arrays.cost_curves()
 
-    piece_wise_linear_cost(model, points, values)
+        piece_wise_linear_cost(model, points, values)
 
-    minimum_production_cost(model)
-    production_cost(model)
+        minimum_production_cost(model)
+        breakpoints = production_cost(model)
 
     # setup start up and shut down costs for generators
 
-    cold_start_hours = case.gencost['COLD_START_HOURS'].astype(int).to_dict()
-    hot_start_costs = case.gencost['STARTUP_HOT'].to_dict()
-    cold_start_costs = case.gencost['STARTUP_COLD'].to_dict()
-    shutdown_coefficient = case.gencost['SHUTDOWN_COEFFICIENT'].to_dict()
-
-    hot_start_cold_start_costs(model, hot_start_costs=hot_start_costs, cold_start_costs=cold_start_costs, cold_start_hours=cold_start_hours, shutdown_cost_coefficient=shutdown_coefficient)
+    report.begin('startup_shutdown_costs')
+    hot_start_cold_start_costs(model, hot_start_costs=arrays.gen_dict(arrays.hot_start_cost),
+                               cold_start_costs=arrays.gen_dict(arrays.cold_start_cost),
+                               cold_start_hours=arrays.gen_dict(arrays.cold_start_hours),
+                               shutdown_cost_coefficient=arrays.gen_dict(arrays.shutdown_cost_coefficient))
 
     # Build load data
-    load_dict = dict()
-    columns = load_df.columns
-    for i, t in load_df.iterrows():
-        for col in columns:
-            load_dict[(col, i)] = t[col]
-
-    initialize_demand(model, demand=load_dict)
+    report.begin('demand')
+    initialize_demand(model, demand=arrays.demand())
 
     # Initialize Pyomo Variables
-    initialize_model(model,positive_mismatch_penalty=case.PositiveMismatchPenalty,negative_mismatch_penalty=case.NegativeMismatchPenalty)
+    report.begin('variables')
+    initialize_model(model,positive_mismatch_penalty=case.PositiveMismatchPenalty,negative_mismatch_penalty=case.NegativeMismatchPenalty,
+                     line_flow_variables=use_ptdf is not True, lean=lean_formulation)
 
     # price sensitive load
 
@@ -226,68 +208,45 @@ def build_model(case,
 
     # adding segments for price sensitive loads
     segments = config.pop('segments', 5)
-    psl_points = dict()
-    psl_values = dict()
-
-    pmin_values = dict()
-    pmax_values = dict()
-
-    coefficient_e_values = dict()
-    coefficient_d_values = dict()
-    coefficient_f_values = dict()
+    benefit_formulation = config.pop('benefit_formulation', 'epigraph')
 
+    report.begin('price_sensitive_load')
     # print('segments=',segments)
     if PriceSenLoadFlag is True:
         if PriceSenLoadData is not None:
-            psl_names =[]
-            psl_at_buses={}
-            for name, hour in PriceSenLoadData:
-                if(name not in psl_names):
-                    psl_names.append(name)
-                psl_record = PriceSenLoadData[name,hour]
-                if(psl_record['atBus'] not in psl_at_buses.keys()):
-                    psl_at_buses[psl_record['atBus']] = []
-                if name not in psl_at_buses[psl_record['atBus']]:
-                    #TODO need to check whether append() function is suitable for multiple loads at the same bus
-                    psl_at_buses[psl_record['atBus']].append(name)
-
-                psl_points[name,hour] = np.linspace(psl_record['Pmin'], psl_record['Pmax'], num=int(segments))
-                psl_values[name,hour] = psl_record['d'] + psl_record['e'] * psl_points[name,hour] + psl_record['f'] * psl_points[name,hour] ** 2
-                pmin_values[name,hour] = psl_record['Pmin']
-                pmax_values[name,hour] = psl_record['Pmax']
-
-                coefficient_d_values[name, hour] = psl_record['d']
-                coefficient_e_values[name,hour] = psl_record['e']
-                coefficient_f_values[name, hour] = psl_record['f']
-
-
-            for k, v in psl_points.items():
-                psl_points[k] = [float(i) for i in v]
-            for k, v in psl_values.items():
-                psl_values[k] = [float(i) for i in v]
+            psl_keys, points, values = benefit_curves(PriceSenLoadData, segments)
+            psl_names = list(dict.fromkeys(name for name, hour in psl_keys))
+            psl_at_buses = {}
+            for name, hour in psl_keys:
+                psl_at_buses.setdefault(PriceSenLoadData[name, hour]['atBus'], {})[name] = None
+            psl_at_buses = {b: list(names) for b, names in psl_at_buses.items()}
+
+            def psl_dict(column):
+                return {k: PriceSenLoadData[k][column] for k in psl_keys}
+
             initialize_price_senstive_load(model,
                                            price_sensitive_load_names=psl_names,
                                            price_sensitive_load_at_bus=psl_at_buses)
 
             maximum_minimum_power_demand_loads(model,
-                                               minimum_power_demand=pmin_values,
-                                               maximum_power_demand=pmax_values)
+                                               minimum_power_demand=psl_dict('Pmin'),
+                                               maximum_power_demand=psl_dict('Pmax'))
 
             initialize_load_demand(model)
 
             quadratic_benefit_coefficients(model,
-                                           coefficient_c0=coefficient_d_values,
-                                           coefficient_c1=coefficient_e_values,
-                                           coefficient_c2=coefficient_f_values)
-            piece_wise_linear_benefit(model, psl_points, psl_values)
-            load_benefit(model)
-            constraint_for_benefit(model)
+                                           coefficient_c0=psl_dict('d'),
+                                           coefficient_c1=psl_dict('e'),
+                                           coefficient_c2=psl_dict('f'))
+            piece_wise_linear_benefit(model, dict(zip(psl_keys, points.tolist())), dict(zip(psl_keys, values.tolist())))
+            constraint_for_benefit(model, formulation=benefit_formulation)
         else:
             PriceSenLoadFlag = False
             raise RuntimeError('PriceSenLoadFlag is set to be True, but no Price Sensitive Load Data is correctly loaded')
 
 
 
+    report.begin('reserves')
     initialize_global_reserves(model, ReserveDownSystemPercent=ReserveDownSystemPercent, ReserveUpSystemPercent=ReserveUpSystemPercent)
     initialize_regulating_reserves(model, )
 
@@ -301,51 +260,117 @@ def build_model(case,
     else:
         bStorageFlag = True
 
+    report.begin('constraint_net_power')
     constraint_net_power(model, StorageFlag=bStorageFlag, PriceSenLoadFlag=PriceSenLoadFlag)
 
-    if use_ptdf is True:
-        ptdf = calculate_PTDF(case, precision=config.pop('ptdf_precision', None), tolerance=config.pop('ptdf_tolerance', None))
-        constraint_line(model, ptdf=ptdf)
-    else:
-        constraint_line(model, slack_bus=bus_df.index.get_loc(bus_df[bus_df['TYPE'] == 3].index[0])+1)
-        # Pyomo is 1-indexed for sets, and MATPOWER type of bus should be used to get the slack bus
-
+    report.begin('constraint_line')
+    ptdf = None
+    if use_ptdf is True or screen_line_limits is not False:
+        # Screening an angle formulation needs the PTDF of its network, which has B = 1 / BR_X without taps
+        ptdf = calculate_PTDF(case, precision=config.pop('ptdf_precision', None), tolerance=config.pop('ptdf_tolerance', None),
+                              cache=config.pop('ptdf_cache', None), taps=use_ptdf is True)
+
+    lines = None
+    screened_line_limits = 0
+    if screen_line_limits is not False:
+        # Skip the limits of the (line, time) pairs whose flow cannot exceed RATE_A for any dispatch
+        # with the injections of generators and price sensitive loads. The load generation mismatch and the
+        # injections of buses without generators are not bounded, so PSSTModel.solve adds back the screened out
+        # limits that the solution violates
+        method = 'balance' if screen_line_limits is True else screen_line_limits
+        shape = (len(arrays.gen_bus), len(arrays.time_periods))
+        bus, minimum, maximum = arrays.gen_bus, np.zeros(shape), np.broadcast_to(arrays.pmax[:, None], shape)
+        if PriceSenLoadFlag is True:
+            load_bus, minimum_demand, maximum_demand = demand_bounds(PriceSenLoadData, arrays.bus_index, arrays.time_periods)
+            bus = np.concatenate([bus, load_bus])
+            minimum, maximum = np.vstack([minimum, -maximum_demand]), np.vstack([maximum, -minimum_demand])
+        lower, upper = line_flow_bounds(ptdf, bus, minimum, maximum, arrays.demand_matrix().T, method=method)
+        limit = np.absolute(arrays.thermal_limit)[:, None]
+        enforced = limit > 1e-3
+        binding = enforced & ((upper > limit) | (lower < -limit))
+        lines = set((arrays.line_names[i], arrays.time_periods[j]) for i, j in zip(*np.nonzero(binding)))
+        screened_line_limits = 2 * int(enforced.sum() * len(arrays.time_periods) - binding.sum())
+        logger.info('Screening removed {} of {} thermal limit constraints'.format(screened_line_limits, 2 * int(enforced.sum()) * len(arrays.time_periods)))
+
+    # Pyomo is 1-indexed for sets, and MATPOWER type of bus should be used to get the slack bus
+    sensitivities = LineSensitivities(model, ptdf=ptdf if use_ptdf is True else None, slack_bus=model.Buses.at(arrays.slack_bus+1))
+    constraint_line(model, sensitivities, slack_bus=arrays.slack_bus+1, lazy=lazy_line_limits, lines=lines)
+
+    if security_constraints is not False:
+        # N-1 limits of every monitored line for the outage of every contingency branch, added lazily by PSSTModel.solve
+        report.begin('constraint_contingency')
+        in_service = arrays.line_names[arrays.line_status != 0]
+        monitored = arrays.line_names[(np.absolute(arrays.thermal_limit) > 1e-3) & (arrays.line_status != 0)]
+        contingencies = in_service if security_constraints is True else in_service.intersection(pd.Index(security_constraints, dtype=object))
+        # The LODF must describe the flows of the model, so the angle formulation has no taps here either
+        lodf = calculate_LODF(case, lines=monitored, outages=contingencies, taps=use_ptdf is True)
+        constraint_contingency(model, sensitivities, lodf, monitored, contingencies)
+
+    report.begin('constraint_power_balance')
     constraint_power_balance(model, PriceSenLoadFlag=PriceSenLoadFlag)
 
+    report.begin('constraint_total_demand')
     constraint_total_demand(model, PriceSenLoadFlag=PriceSenLoadFlag)
-    constraint_load_generation_mismatch(model)
+    report.begin('constraint_load_generation_mismatch')
+    constraint_load_generation_mismatch(model, lean=lean_formulation)
+    report.begin('constraint_reserves')
     constraint_reserves(model, has_zonal_reserves=zonalData['HasZonalReserves'], PriceSenLoadFlag=PriceSenLoadFlag)
+    report.begin('constraint_generator_power')
     constraint_generator_power(model)
-    constraint_up_down_time(model)
-    constraint_for_cost(model)
+    report.begin('constraint_up_down_time')
+    constraint_up_down_time(model, template=template, formulation=up_down_time_formulation)
+    report.begin('constraint_for_cost')
+    constraint_for_cost(model, breakpoints=breakpoints, template=template, startup_cost_formulation=startup_cost_formulation,
+                        production_cost_formulation=production_cost_formulation, lean=lean_formulation)
 
     # Add objective function
+    report.begin('objective_function')
     objective_function(model, PriceSenLoadFlag=PriceSenLoadFlag)
 
-    for t, row in case.gen_status.iterrows():
-        for g, v in row.iteritems():
-            if not pd.isnull(v):
-                try:
-                    model.UnitOn[g, t].fixed = True
-                    model.UnitOn[g, t] = int(float(v))
-                except:
-                    pass
+    report.begin('fix_commitment')
+    if template is True:
+        fix_initial_commitment(model)
+
+    for g, t, v in arrays.fixed_commitment():
+        fix_commitment(model, g, t, v)
 
+    scaling_report = None
+    if scaling is True:
+        # Scaling multiplies every row and slack column by a power of two, PSSTResults unscales the duals and slacks
+        report.begin('scaling')
+        scaling_report = scale_constraints(model)
+        logger.info('Coefficient ranges:\n{}'.format(scaling_report))
+
+    report.end()
 
     model.dual = Suffix(direction=Suffix.IMPORT)
 
     # output the model
     # model.pprint(filename="model.out")
-    return PSSTModel(model)
+    psst_model = PSSTModel(model, build_report=report if report.enabled else None, lazy_line_limits=lazy_line_limits,
+                           security_constraints=security_constraints is not False, screened_line_limits=screened_line_limits,
+                           sensitivities=sensitivities)
+    psst_model.scaling_report = scaling_report
+    return psst_model
 
 
 class PSSTModel(object):
 
-    def __init__(self, model, is_solved=False):
+    def __init__(self, model, is_solved=False, build_report=None, lazy_line_limits=False, security_constraints=False, screened_line_limits=0, sensitivities=None):
         self._model = model
         self._is_solved = is_solved
         self._status = None
         self._results = None
+        self._build_report = build_report
+        self._lazy_line_limits = lazy_line_limits
+        self._security_constraints = security_constraints
+        self.line_limit_iterations = list()
+        self.contingency_iterations = list()
+        self.screened_line_limits = screened_line_limits
+        self._sensitivities = sensitivities
+        self.scaling_report = None
+        self._persistent = None
+        self._sos = has_sos_constraints(model)
 
     def __repr__(self):
 
@@ -359,11 +384,203 @@ class PSSTModel(object):
 
         return string
 
-    def solve(self, solver='glpk', verbose=False, keepfiles=True, **kwargs):
-        TC = solve_model(self._model, solver=solver, verbose=verbose, keepfiles=keepfiles, **kwargs)
-        self._results = PSSTResults(self._model)
-        return TC
+    def _solve_function(self, solver, persistent):
+        # solve_model, or the solve of the persistent solver that this model keeps between solves; in-process
+        # solvers always keep the model, unless it has SOS constraints, which they do not accept
+        if (persistent is False and solver not in IN_PROCESS_SOLVERS) or self._sos is True:
+            return solve_model
+        if self._persistent is None or self._persistent.solver != solver:
+            self._persistent = PersistentSolver(solver)
+        return self._persistent.solve
+
+    def _solve_commitment(self, solve, commitment, **kwargs):
+        # Solves the model as an LP with the (generator, time) statuses of commitment fixed, then frees them again
+        m = self._model
+        for (g, t), v in commitment.items():
+            fix_commitment(m, g, t, v)
+        kwargs = {k: v for k, v in kwargs.items() if k not in ('is_mip', 'mipgap', 'warmstart')}
+        try:
+            return solve(m, is_mip=False, **kwargs)
+        finally:
+            unfix_commitment(m, list(commitment))
+
+    def _pricing(self, solve, **kwargs):
+        # In-memory solvers have no duals for a MIP, so the prices are the duals of the LP with the commitment of the
+        # solution. Returns the function that solves that LP, which PSSTResults calls on the first read of a dual,
+        # or None when the model already has its duals
+        if solve is solve_model or len(self._model.dual) > 0:
+            return None
+        commitment = {k: int(round(u.value)) for k, u in self._model.UnitOn.items() if not u.fixed}
+
+        def prices():
+            _, TC = self._solve_commitment(solve, commitment, **kwargs)
+            if TC != 'optimal':
+                logger.warning('The LP with the commitment of the solution is {}, it has no prices'.format(TC))
+
+        return prices
+
+    def set_warmstart(self, unit_commitment, solver='glpk', persistent=False, **kwargs):
+        ''' Sets a MIP start from a (time, generator) commitment DataFrame and returns whether it is feasible
+
+        Generators and periods missing from unit_commitment keep the current value of UnitOn, and fixed
+        commitments keep their fixed value. The rest of the start, dispatch and start up and shut down costs
+        included, is completed by solving the model as an LP with this commitment.
+        '''
+        m = self._model
+        periods, generators = list(m.TimePeriods), list(m.Generators)
+        status = status_matrix(unit_commitment, periods, generators)
+
+        commitment = dict()
+        for i, t in enumerate(periods):
+            for j, g in enumerate(generators):
+                u = m.UnitOn[g, t]
+                if u.fixed:
+                    continue
+                if not np.isnan(status[i, j]):
+                    commitment[g, t] = int(round(status[i, j]))
+                elif u.value is None:
+                    commitment[g, t] = 1
+                else:
+                    commitment[g, t] = int(round(u.value))
+
+        _, TC = self._solve_commitment(self._solve_function(solver, persistent), commitment, solver=solver, **kwargs)
+
+        if TC != 'optimal':
+            logger.warning('The warm start commitment is infeasible ({}), solving without it'.format(TC))
+            return False
+        return True
+
+    def solve(self, solver='glpk', verbose=False, keepfiles=True, max_line_iterations=50, warmstart=None, persistent=False, **kwargs):
+        solve = self._solve_function(solver, persistent)
+        if warmstart is not None:
+            kwargs['warmstart'] = self.set_warmstart(warmstart, solver=solver, persistent=persistent, verbose=verbose, keepfiles=keepfiles, **kwargs)
+        _, TC = solve(self._model, solver=solver, verbose=verbose, keepfiles=keepfiles, **kwargs)
+
+        if self._lazy_line_limits is True or self.screened_line_limits > 0 or self._security_constraints is True:
+            # Re-solve with the violated thermal and post-contingency limits until no flow exceeds its limit
+            for i in range(max_line_iterations):
+                added = 0
+                if self._lazy_line_limits is True or self.screened_line_limits > 0:
+                    lines = add_violated_line_limits(self._model, self._sensitivities)
+                    self.line_limit_iterations.append(len(lines))
+                    if self._lazy_line_limits is not True and len(lines) > 0:
+                        logger.warning('The solution violates {} screened out (line, time) limits, adding them and solving again'.format(len(lines)))
+                    logger.info('Line limit iteration {}: added {} violated (line, time) limits'.format(i, len(lines)))
+                    added = added + len(lines)
+                if self._security_constraints is True:
+                    contingencies = add_violated_contingency_limits(self._model, self._sensitivities)
+                    self.contingency_iterations.append(len(contingencies))
+                    logger.info('Contingency iteration {}: added {} violated (contingency, line, time) limits'.format(i, len(contingencies)))
+                    added = added + len(contingencies)
+                if added == 0:
+                    break
+                _, TC = solve(self._model, solver=solver, verbose=verbose, keepfiles=keepfiles, **kwargs)
+            else:
+                logger.warning('Line limits are still violated after {} iterations'.format(max_line_iterations))
+
+        prices = None
+        if TC == 'optimal':
+            prices = self._pricing(solve, solver=solver, verbose=verbose, keepfiles=keepfiles, **kwargs)
+        self._results = PSSTResults(self._model, sensitivities=self._sensitivities, prices=prices)
+        return self._model, TC
 
     @property
     def results(self):
         return self._results
+
+    @property
+    def build_report(self):
+        return self._build_report
+
+    @property
+    def sensitivities(self):
+        return self._sensitivities
+
+    @property
+    def persistent_solver(self):
+        return self._persistent
+
+
+class PSSTModelTemplate(object):
+    ''' A model that is built once and re-solved for new loads, commitments and initial conditions.
+
+    The model is built with ``config['template']`` set, so that everything that depends on the initial
+    state is expressed through mutable parameters and fixed variables. ``update`` only assigns new values,
+    no constraint is reconstructed.
+    '''
+
+    def __init__(self, case, config=None, **kwargs):
+        config = dict(config or dict())
+        config['template'] = True
+
+        start = time.time()
+        self._psst_model = build_model(case, config=config, **kwargs)
+        self.build_time = time.time() - start
+
+        model = self._psst_model._model
+        self._time_periods = list(model.TimePeriods)
+        self._buses = list(model.Buses)
+        self._generators = list(model.Generators)
+        self._fixed_status = status_matrix(getattr(case, 'gen_status', None), self._time_periods, self._generators)
+        self.update_times = list()
+
+    def __repr__(self):
+        repr_string = 'build_time={:.3f}, updates={}'.format(self.build_time, len(self.update_times))
+        return '<{}.{}({})>'.format(self.__class__.__module__, self.__class__.__name__, repr_string)
+
+    @property
+    def model(self):
+        return self._psst_model
+
+    @property
+    def results(self):
+        return self._psst_model.results
+
+    @property
+    def saved_build_time(self):
+        ''' Build time saved by each update compared to building the model from scratch '''
+        return [self.build_time - t for t in self.update_times]
+
+    def update(self, load_df=None, gen_status=None, initial_state=None):
+        ''' Assigns new data to the model
+
+        load_df is a (time, bus) frame like case.load, gen_status a (time, generator) frame like
+        case.gen_status and initial_state a frame (or dict of dicts) indexed by generator with the columns
+        UnitOnT0State and optionally PowerGeneratedT0.
+        '''
+        start = time.time()
+        model = self._psst_model._model
+
+        if load_df is not None:
+            if list(load_df.index) != self._time_periods:
+                raise ValueError('load_df must be indexed by the time periods of the template {}'.format(self._time_periods))
+            demand = load_df.reindex(columns=self._buses).fillna(0).astype(float)
+            update_demand(model, demand={(b, t): v for b in self._buses for t, v in demand[b].items()})
+            update_global_reserves(model)
+
+        if initial_state is not None:
+            initial_state = pd.DataFrame(initial_state)
+            power_generated = initial_state['PowerGeneratedT0'].to_dict() if 'PowerGeneratedT0' in initial_state else None
+            update_initial_state(model, initial_state=initial_state['UnitOnT0State'].to_dict(), power_generated=power_generated)
+            update_hot_start(model)
+
+        if gen_status is not None:
+            self._fixed_status = status_matrix(gen_status, self._time_periods, self._generators)
+
+        if initial_state is not None or gen_status is not None:
+            unfix_commitment(model)
+            fix_initial_commitment(model)
+            for g, t, v in fixed_entries(self._fixed_status, self._time_periods, self._generators):
+                fix_commitment(model, g, t, v)
+
+        update_time = time.time() - start
+        self.update_times.append(update_time)
+        logger.info('Updated model template in {:.3f}s, saving {:.3f}s over a full build'.format(update_time, self.build_time - update_time))
+
+        return self
+
+    def solve(self, **kwargs):
+        # The in-process and persistent solvers do not preprocess the model, so they are not passed the option
+        if kwargs.get('persistent', False) is False and kwargs.get('solver', 'glpk') not in IN_PROCESS_SOLVERS:
+            kwargs.setdefault('preprocess', False)
+        return self._psst_model.solve(**kwargs)
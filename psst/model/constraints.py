@@ -3,11 +3,15 @@
 
 import numpy as np
 from functools import partial
+from scipy.sparse import csr_matrix
 import click
 import logging
 
 from pyomo.environ import *
 
+from .generators import epigraph_segments
+from .price_sensitive_load import benefit_segments
+
 logger = logging.getLogger(__file__)
 
 eps = 1e-3
@@ -15,20 +19,124 @@ eps = 1e-3
 def fix_first_angle_rule(m,t, slack_bus=1):
     return m.Angle[m.Buses[slack_bus], t] == 0.0
 
-def lower_line_power_bounds_rule(m, l, t):
+def line_power(m, l, t, sensitivities=None):
+    # Flow on l in period t; PTDF models have no LinePower and use the PTDF row of l over the injections
+    if hasattr(m, 'LinePower'):
+        return m.LinePower[l, t]
+    return sum(c * m.NetPowerInjectionAtBus[b, t] for b, c in sensitivities.terms[l])
+
+def lower_line_power_bounds_rule(m, l, t, lines=None, sensitivities=None):
+    # lines, when given, is the set of (line, time) pairs whose limits are enforced
+    if lines is not None and (l, t) not in lines:
+        return Constraint.Skip
     if m.EnforceLine[l] and np.any(np.absolute(m.ThermalLimit[l]) > eps):
-        return -m.ThermalLimit[l] <= m.LinePower[l, t]
+        flow = line_power(m, l, t, sensitivities)
+        if is_constant(flow):
+            return Constraint.Skip
+        return -m.ThermalLimit[l] <= flow
     else:
         return Constraint.Skip
 
-def upper_line_power_bounds_rule(m, l, t):
+def upper_line_power_bounds_rule(m, l, t, lines=None, sensitivities=None):
+    if lines is not None and (l, t) not in lines:
+        return Constraint.Skip
     if m.EnforceLine[l] and np.any(np.absolute(m.ThermalLimit[l]) > eps):
-        return m.ThermalLimit[l] >= m.LinePower[l, t]
+        flow = line_power(m, l, t, sensitivities)
+        if is_constant(flow):
+            return Constraint.Skip
+        return m.ThermalLimit[l] >= flow
     else:
         return Constraint.Skip
 
-def line_power_ptdf_rule(m, l, t):
-    return m.LinePower[l,t] == sum(float(m.PTDF[l, i]) * m.NetPowerInjectionAtBus[b, t] for i, b in enumerate(m.Buses))
+def line_flows(m, sensitivities=None):
+    # Returns the (line, time) array of flows of the current solution
+    lines, periods = list(m.TransmissionLines), list(m.TimePeriods)
+    if not hasattr(m, 'LinePower'):
+        injections = np.array([[value(m.NetPowerInjectionAtBus[b, t]) for t in periods] for b in m.Buses])
+        return sensitivities.ptdf @ injections
+    return np.array([[value(m.LinePower[l, t]) for t in periods] for l in lines])
+
+def add_violated_line_limits(m, sensitivities=None, tolerance=1e-6):
+    # Adds the thermal limits of every (line, time) pair whose flow exceeds its limit and returns the pairs added
+    lines, periods = list(m.TransmissionLines), list(m.TimePeriods)
+    limits = np.array([value(m.ThermalLimit[l]) if value(m.EnforceLine[l]) else 0 for l in lines])
+    flows = line_flows(m, sensitivities)
+
+    violated = (np.absolute(limits) > eps)[:, None] & (np.absolute(flows) > np.absolute(limits)[:, None] + tolerance)
+    added = list()
+    for i, j in zip(*np.nonzero(violated)):
+        l, t = lines[i], periods[j]
+        if (l, t) in m.LinePowerConstraintHigher:
+            continue
+        m.LinePowerConstraintLower[l, t] = lower_line_power_bounds_rule(m, l, t, sensitivities=sensitivities)
+        m.LinePowerConstraintHigher[l, t] = upper_line_power_bounds_rule(m, l, t, sensitivities=sensitivities)
+        added.append((l, t))
+    return added
+
+def contingency_line_power_rule(m, k, l, t, sensitivities):
+    # Flow on l after the outage of k, from the pre-contingency flows and the LODF
+    c = sensitivities.lodf[sensitivities.monitored[l], sensitivities.contingencies[k]]
+    return (-m.ThermalLimit[l], line_power(m, l, t, sensitivities) + float(c) * line_power(m, k, t, sensitivities), m.ThermalLimit[l])
+
+def add_violated_contingency_limits(m, sensitivities, tolerance=1e-6, chunk=2 ** 22):
+    # Adds the post-contingency limits of every (contingency, line, time) triple whose flow exceeds the limit
+    # of the line and returns the triples added. All contingencies are screened at once, chunk entries at a time.
+    lines, periods = list(m.TransmissionLines), list(m.TimePeriods)
+    monitored, contingencies = list(sensitivities.monitored), list(sensitivities.contingencies)
+    flows = line_flows(m, sensitivities)
+    limits = np.array([np.absolute(value(m.ThermalLimit[l])) for l in monitored])
+    position = {l: i for i, l in enumerate(lines)}
+    monitored_flows = flows[[position[l] for l in monitored]]
+    contingency_flows = flows[[position[k] for k in contingencies]]
+
+    added = list()
+    step = max(1, chunk // max(1, len(monitored) * len(periods)))
+    for start in range(0, len(contingencies), step):
+        lodf = sensitivities.lodf[:, start:start + step]
+        post = monitored_flows[:, None, :] + lodf[:, :, None] * contingency_flows[None, start:start + step, :]
+        violated = np.absolute(post) > limits[:, None, None] + tolerance
+        for i, j, n in zip(*np.nonzero(violated)):
+            k, l, t = contingencies[start + j], monitored[i], periods[n]
+            if (k, l, t) in m.ContingencyLinePowerConstraint:
+                continue
+            m.ContingencyLinePowerConstraint[k, l, t] = contingency_line_power_rule(m, k, l, t, sensitivities)
+            added.append((k, l, t))
+    return added
+
+def ptdf_terms(model, ptdf):
+    # Returns the nonzero (bus, PTDF) pairs of every line from a CSR PTDF matrix
+    buses = list(model.Buses)
+    terms = dict()
+    for i, l in enumerate(model.TransmissionLines):
+        start, stop = ptdf.indptr[i], ptdf.indptr[i + 1]
+        terms[l] = [(buses[j], float(v)) for j, v in zip(ptdf.indices[start:stop], ptdf.data[start:stop])]
+    return terms
+
+class LineSensitivities(object):
+    ''' The PTDF and LODF data of a model, kept by its PSSTModel rather than on the Pyomo model
+
+    ptdf is the CSR (line, bus) PTDF matrix of a PTDF model, with its nonzero (bus, PTDF) pairs per line in
+    terms; both are None when the flows are LinePower variables. lodf is the (monitored line, contingency)
+    LODF matrix of the N-1 limits, with the positions of the monitored lines and contingencies.
+    '''
+
+    def __init__(self, model, ptdf=None, slack_bus=None):
+        self.ptdf = None
+        self.terms = None
+        if ptdf is not None:
+            # Stored as CSR so that only the nonzero entries become constraint terms
+            self.ptdf = csr_matrix(ptdf)
+            self.ptdf.eliminate_zeros()
+            self.terms = ptdf_terms(model, self.ptdf)
+        self.slack_bus = slack_bus
+        self.lodf = None
+        self.monitored = dict()
+        self.contingencies = dict()
+
+    def __repr__(self):
+        return '<{}.{}(ptdf={}, contingencies={})>'.format(
+            self.__class__.__module__, self.__class__.__name__,
+            None if self.ptdf is None else self.ptdf.nnz, len(self.contingencies))
 
 def line_power_rule(m, l, t):
     if m.B[l] == 99999999:
@@ -73,6 +181,10 @@ def power_balance(m, b, t, StorageFlag=False, NDGFlag=False, PriceSenLoadFlag=Fa
 
     return constraint
 
+def system_power_balance_rule(m, t):
+    # Without LinePower the flows cancel out of the sum of the bus balances, which is all that remains
+    return sum(m.NetPowerInjectionAtBus[b, t] + m.LoadGenerateMismatch[b, t] for b in m.Buses) == 0
+
 ##  This function defines m.NetPowerInjectionAtBus[b, t] constraint
 def net_power_at_bus_rule(m, b, t, StorageFlag=False, NDGFlag=False, PriceSenLoadFlag=False):
     if b not in m.GeneratorsAtBus:
@@ -341,18 +453,36 @@ def enforce_ramp_up_limits_rule(m, g, t):
 
 
 # compute startup costs for each generator, for each time period
-def compute_hot_start_rule(m, g, t):
+def compute_hot_start_rule(m, g, t, template=False):
     if t <= value(m.ColdStartHours[g]):
-        if t - value(m.ColdStartHours[g]) <= value(m.UnitOnT0State[g]):
+        if template is False and t - value(m.ColdStartHours[g]) <= value(m.UnitOnT0State[g]):
             m.HotStart[g, t] = 1
             m.HotStart[g, t].fixed = True
             return Constraint.Skip
         else:
+            # in a template the constraint is always built and toggled by update_hot_start
             return m.HotStart[g, t] <= sum( m.UnitOn[g, i] for i in range(1, t) )
     else:
         return m.HotStart[g, t] <= sum( m.UnitOn[g, i] for i in range(t - m.ColdStartHours[g], t) )
 
 
+def update_hot_start(m):
+    # initial conditions decide whether a start within the first ColdStartHours is a hot start
+    if hasattr(m, 'InitialHotStart'):
+        for g, t in m.InitialHotStart:
+            m.InitialHotStart[g, t] = initial_hot_start_rule(m, g, t)
+        return
+    for g, t in m.ComputeHotStart:
+        if t > value(m.ColdStartHours[g]):
+            continue
+        if t - value(m.ColdStartHours[g]) <= value(m.UnitOnT0State[g]):
+            m.ComputeHotStart[g, t].deactivate()
+            m.HotStart[g, t].fix(1)
+        else:
+            m.ComputeHotStart[g, t].activate()
+            m.HotStart[g, t].unfix()
+
+
 def compute_startup_costs_rule_minusM(m, g, t):
     if t == 0:
         return m.StartupCost[g, t] >= m.ColdStartCost[g] - (m.ColdStartCost[g] - m.HotStartCost[g])*m.HotStart[g, t] \
@@ -378,9 +508,9 @@ def enforce_up_time_constraints_initial(m, g):
 
 # constraint for each time period after that not involving the initial condition.
 @simple_constraint_rule
-def enforce_up_time_constraints_subsequent(m, g, t):
-   if t <= value(m.InitialTimePeriodsOnLine[g]):
-      # handled by the EnforceUpTimeConstraintInitial constraint.
+def enforce_up_time_constraints_subsequent(m, g, t, skip_initial=True):
+   if skip_initial is True and (t+1) <= value(m.InitialTimePeriodsOnLine[g]):
+      # handled by the EnforceUpTimeConstraintInitial constraint, which covers the same (t+1) periods.
       return Constraint.Skip
    elif t <= (value(m.NumTimePeriods - m.MinimumUpTime[g]) + 1):
       # the right-hand side terms below are only positive if the unit was off in the previous time period but on in this one =>
@@ -409,9 +539,9 @@ def enforce_down_time_constraints_initial(m, g):
 
 # constraint for each time period after that not involving the initial condition.
 @simple_constraint_rule
-def enforce_down_time_constraints_subsequent(m, g, t):
-   if t <= value(m.InitialTimePeriodsOffLine[g]):
-      # handled by the EnforceDownTimeConstraintInitial constraint.
+def enforce_down_time_constraints_subsequent(m, g, t, skip_initial=True):
+   if skip_initial is True and (t+1) <= value(m.InitialTimePeriodsOffLine[g]):
+      # handled by the EnforceDownTimeConstraintInitial constraint, which covers the same (t+1) periods.
       return Constraint.Skip
    elif t <= (value(m.NumTimePeriods - m.MinimumDownTime[g]) + 1):
       # the right-hand side terms below are only positive if the unit was off in the previous time period but on in this one =>
@@ -431,18 +561,64 @@ def enforce_down_time_constraints_subsequent(m, g, t):
          return sum(((1 - m.UnitOn[g, n]) - (m.UnitOn[g, t-1] - m.UnitOn[g, t])) for n in m.TimePeriods if n >= t) >= 0.0
 
 
-def commitment_in_stage_st_cost_rule(m, st):
-    return m.CommitmentStageCost[st] == (sum(m.StartupCost[g,t] + m.ShutdownCost[g,t] for g in m.Generators for t in m.CommitmentTimeInStage[st]) + sum(sum(m.UnitOn[g,t] for t in m.CommitmentTimeInStage[st]) * m.MinimumProductionCost[g] * m.TimePeriodLength for g in m.Generators))
+def unit_start_stop_rule(m, g, t):
+    # UnitStart and UnitStop are the turn-on and turn-off of the unit in period t
+    if t == 0:
+        return m.UnitOn[g, t] - m.UnitOnT0[g] == m.UnitStart[g, t] - m.UnitStop[g, t]
+    return m.UnitOn[g, t] - m.UnitOn[g, t-1] == m.UnitStart[g, t] - m.UnitStop[g, t]
 
 
-def generation_in_stage_st_cost_rule(m, st):
-    return m.GenerationStageCost[st] == sum(m.ProductionCost[g, t] for g in m.Generators for t in m.GenerationTimeInStage[st]) + m.LoadPositiveMismatchPenalty * m.TimePeriodLength *\
+def turn_on_up_time_rule(m, g, t, windows=True):
+    # a unit started in the last MinimumUpTime periods must still be on; without windows only UnitStart <= UnitOn
+    up_time = max(1, int(value(m.MinimumUpTime[g]))) if windows is True else 1
+    return sum(m.UnitStart[g, n] for n in range(max(0, t - up_time + 1), t + 1)) <= m.UnitOn[g, t]
+
+
+def turn_off_down_time_rule(m, g, t, windows=True):
+    # a unit shut down in the last MinimumDownTime periods must still be off
+    down_time = max(1, int(value(m.MinimumDownTime[g]))) if windows is True else 1
+    return sum(m.UnitStop[g, n] for n in range(max(0, t - down_time + 1), t + 1)) <= 1 - m.UnitOn[g, t]
+
+
+def initial_hot_start_rule(m, g, t):
+    # 1 if the initial conditions make a start in period t a hot start, as in compute_hot_start_rule
+    return int(t <= value(m.ColdStartHours[g]) and t - value(m.ColdStartHours[g]) <= value(m.UnitOnT0State[g]))
+
+
+def hot_startup_rule(m, g, t):
+    # a start is hot only if the unit was shut down less than ColdStartHours periods ago
+    cold_start_hours = int(value(m.ColdStartHours[g]))
+    return m.HotStartup[g, t] <= sum(m.UnitStop[g, n] for n in range(max(0, t - cold_start_hours + 1), t)) + m.InitialHotStart[g, t]
+
+
+def startup_type_rule(m, g, t):
+    return m.UnitStart[g, t] == m.HotStartup[g, t] + m.ColdStartup[g, t]
+
+
+def compute_startup_costs_rule_startup_type(m, g, t):
+    return m.StartupCost[g, t] >= m.HotStartCost[g] * m.HotStartup[g, t] + m.ColdStartCost[g] * m.ColdStartup[g, t]
+
+
+def commitment_stage_cost(m, st):
+    return sum(m.StartupCost[g,t] + m.ShutdownCost[g,t] for g in m.Generators for t in m.CommitmentTimeInStage[st]) + sum(sum(m.UnitOn[g,t] for t in m.CommitmentTimeInStage[st]) * m.MinimumProductionCost[g] * m.TimePeriodLength for g in m.Generators)
+
+
+def generation_stage_cost(m, st):
+    return sum(m.ProductionCost[g, t] for g in m.Generators for t in m.GenerationTimeInStage[st]) + m.LoadPositiveMismatchPenalty * m.TimePeriodLength *\
     (sum(m.posLoadGenerateMismatch[b, t] for b in m.Buses for t in m.GenerationTimeInStage[st])) + m.LoadNegativeMismatchPenalty * m.TimePeriodLength *\
     (sum(m.negLoadGenerateMismatch[b, t] for b in m.Buses for t in m.GenerationTimeInStage[st])) + m.LoadPositiveMismatchPenalty * m.TimePeriodLength *\
     (sum(m.posGlobalReserveMismatch[t] for t in m.GenerationTimeInStage[st])) + m.LoadNegativeMismatchPenalty * m.TimePeriodLength *\
     (sum(m.negGlobalReserveMismatch[t] for t in m.GenerationTimeInStage[st]))
 
 
+def commitment_in_stage_st_cost_rule(m, st):
+    return m.CommitmentStageCost[st] == commitment_stage_cost(m, st)
+
+
+def generation_in_stage_st_cost_rule(m, st):
+    return m.GenerationStageCost[st] == generation_stage_cost(m, st)
+
+
 # def load_benefit_rule(m):
     # return m.TotalLoadBenefit == sum(m.LoadBenefit[l, t] for l in m.PriceSensitiveLoads for t in m.TimePeriods)
 
@@ -452,9 +628,15 @@ def StageCost_rule(m, st):
 
 
 def total_cost_objective_rule(m, PriceSenLoadFlag=False):
+    if hasattr(m, 'StageCost'):
+        cost = sum(m.StageCost[st] for st in m.StageSet)
+    else:
+        cost = sum(commitment_stage_cost(m, st) + generation_stage_cost(m, st) for st in m.StageSet)
+    if hasattr(m, 'ProductionCostQuadratic'):
+        cost = cost + sum(m.ProductionCostQuadratic[g, t] for g in m.Generators for t in m.TimePeriods)
     if (PriceSenLoadFlag is True):
-        return (sum(m.LoadBenefit[l, t] for l in m.PriceSensitiveLoads for t in m.TimePeriods) - sum(m.StageCost[st] for st in m.StageSet))
-    return sum(m.StageCost[st] for st in m.StageSet)
+        return (sum(m.LoadBenefit[l, t] for l in m.PriceSensitiveLoads for t in m.TimePeriods) - cost)
+    return cost
 
 
 def constraint_net_power(model, StorageFlag=False, NDGFlag=False, PriceSenLoadFlag=False):
@@ -464,26 +646,45 @@ def constraint_net_power(model, StorageFlag=False, NDGFlag=False, PriceSenLoadFl
 
 ################################################
 
-def constraint_line(model, ptdf=None, slack_bus=1):
+def constraint_line(model, sensitivities=None, slack_bus=1, lazy=False, lines=None):
 
-    model.LinePowerConstraintLower = Constraint(model.TransmissionLines, model.TimePeriods, rule=lower_line_power_bounds_rule)
-    model.LinePowerConstraintHigher = Constraint(model.TransmissionLines, model.TimePeriods, rule=upper_line_power_bounds_rule)
-
-    if ptdf is not None:
-        model.PTDF = ptdf
-        model.CalculateLinePower = Constraint(model.TransmissionLines, model.TimePeriods, rule=line_power_ptdf_rule)
-    else:
+    # PTDF models substitute the flows into the limits and recover them after the solve, so there are no
+    # LinePower, Angle or CalculateLinePower
+    if sensitivities is None or sensitivities.ptdf is None:
         partial_fix_first_angle_rule = partial(fix_first_angle_rule, slack_bus=slack_bus)
         model.FixFirstAngle = Constraint(model.TimePeriods, rule=partial_fix_first_angle_rule)
         model.CalculateLinePower = Constraint(model.TransmissionLines, model.TimePeriods, rule=line_power_rule)
 
+    # In lazy mode the thermal limits start empty and are added by add_violated_line_limits
+    if lazy is True:
+        lines = set()
+    model.LinePowerConstraintLower = Constraint(model.TransmissionLines, model.TimePeriods, rule=partial(lower_line_power_bounds_rule, lines=lines, sensitivities=sensitivities))
+    model.LinePowerConstraintHigher = Constraint(model.TransmissionLines, model.TimePeriods, rule=partial(upper_line_power_bounds_rule, lines=lines, sensitivities=sensitivities))
+
+
+def constraint_contingency(model, sensitivities, lodf, monitored, contingencies):
+    # N-1 limits on the monitored lines for the outage of every contingency branch. lodf is the (monitored,
+    # contingency) LODF matrix, kept in sensitivities; the constraints start empty and are added by
+    # add_violated_contingency_limits. Outages that island the network have no LODF and are left out.
+    secure = np.isfinite(lodf).all(axis=0)
+    if not secure.all():
+        logger.warning('Skipping {} contingencies that island the network'.format(int((~secure).sum())))
+    sensitivities.lodf = lodf[:, secure]
+    sensitivities.monitored = {l: i for i, l in enumerate(monitored)}
+    sensitivities.contingencies = {k: i for i, k in enumerate(np.asarray(contingencies, dtype=object)[secure])}
+    model.ContingencyLinePowerConstraint = Constraint(Any)
+
 
 def constraint_total_demand(model, PriceSenLoadFlag=False):
     partial_calculate_total_demand = partial(calculate_total_demand, PriceSenLoadFlag=PriceSenLoadFlag)
     model.CalculateTotalDemand = Constraint(model.TimePeriods, rule=partial_calculate_total_demand)
 
 
-def constraint_load_generation_mismatch(model):
+def constraint_load_generation_mismatch(model, lean=False):
+    # Lean models split the mismatch into its nonnegative parts directly, and the tolerances are sums of
+    # nonnegative variables, so there is nothing to add
+    if lean is True:
+        return
     model.PosLoadGenerateMismatchTolerance = Constraint(model.Buses, rule=pos_load_generate_mismatch_tolerance_rule)
     model.NegLoadGenerateMismatchTolerance = Constraint(model.Buses, rule=neg_load_generate_mismatch_tolerance_rule)
     model.DefinePosMismatch = Constraint(model.Buses, model.TimePeriods, rule = pos_rule)
@@ -499,6 +700,9 @@ def constraint_load_generation_mismatch(model):
 
 def constraint_power_balance(model, StorageFlag=False, NDGFlag=False, PriceSenLoadFlag=False):
 
+    if not hasattr(model, 'LinePower'):
+        model.PowerBalance = Constraint(model.TimePeriods, rule=system_power_balance_rule)
+        return
     fn_power_balance = partial(power_balance, StorageFlag=StorageFlag, NDGFlag=NDGFlag, PriceSenLoadFlag=PriceSenLoadFlag)
     model.PowerBalance = Constraint(model.Buses, model.TimePeriods, rule=fn_power_balance)
 
@@ -551,35 +755,150 @@ def constraint_generator_power(model):
     model.EnforceNominalRampUpLimits = Constraint(model.Generators, model.TimePeriods, rule=enforce_ramp_up_limits_rule)
 
 
-def constraint_up_down_time(model):
+def constraint_start_stop(model, windows=False):
+    # Explicit turn-on and turn-off variables. They are continuous, the bounds by UnitOn make them integral when
+    # UnitOn is; with windows the bounds are the minimum up and down time inequalities.
+    model.UnitStart = Var(model.Generators, model.TimePeriods, bounds=(0, 1))
+    model.UnitStop = Var(model.Generators, model.TimePeriods, bounds=(0, 1))
+    model.ComputeUnitStartStop = Constraint(model.Generators, model.TimePeriods, rule=unit_start_stop_rule)
+    model.EnforceTurnOnUpTime = Constraint(model.Generators, model.TimePeriods, rule=partial(turn_on_up_time_rule, windows=windows))
+    model.EnforceTurnOffDownTime = Constraint(model.Generators, model.TimePeriods, rule=partial(turn_off_down_time_rule, windows=windows))
 
-    model.EnforceUpTimeConstraintsInitial = Constraint(model.Generators, rule=enforce_up_time_constraints_initial)
-    model.EnforceUpTimeConstraintsSubsequent = Constraint(model.Generators, model.TimePeriods, rule=enforce_up_time_constraints_subsequent)
 
-    model.EnforceDownTimeConstraintsInitial = Constraint(model.Generators, rule=enforce_down_time_constraints_initial)
-    model.EnforceDownTimeConstraintsSubsequent = Constraint(model.Generators, model.TimePeriods, rule=enforce_down_time_constraints_subsequent)
+def constraint_up_down_time(model, template=False, formulation='window'):
 
+    if formulation not in ('window', 'turn_on_off'):
+        raise ValueError('Unknown minimum up and down time formulation {}'.format(formulation))
 
-def production_cost_function(m, g, t, x):
-    # a function for use in piecewise linearization of the cost function.
-    # print('production_cost_function: ', g, t, x)
-    return m.TimePeriodLength * m.PowerGenerationPiecewiseValues[g,t][x] * m.FuelCost[g]
+    if template is False:
+        model.EnforceUpTimeConstraintsInitial = Constraint(model.Generators, rule=enforce_up_time_constraints_initial)
+        model.EnforceDownTimeConstraintsInitial = Constraint(model.Generators, rule=enforce_down_time_constraints_initial)
 
+    if formulation == 'turn_on_off':
+        # One window inequality per period over the turn-on and turn-off variables. In a template the initial
+        # conditions are imposed by fixing UnitOn, as below.
+        constraint_start_stop(model, windows=True)
+        return
 
-def load_benefit_function(m, g, t, x):
-    # a function for use in piecewise linearization of the price sensitive load benefit function.
-    # print ('load_benefit_function: ',g,t,int(x))
-    return m.TimePeriodLength * m.LoadDemandPiecewiseValues[g,t][x]
+    if template is True:
+        # Initial conditions are imposed by fixing UnitOn (see fix_initial_commitment), so that they can be
+        # changed without rebuilding; the subsequent constraints of the fixed periods are then redundant, and
+        # the feasible set is the one of a normal build.
+        fn_enforce_up_time_constraints_subsequent = partial(enforce_up_time_constraints_subsequent, skip_initial=False)
+        fn_enforce_down_time_constraints_subsequent = partial(enforce_down_time_constraints_subsequent, skip_initial=False)
+    else:
+        fn_enforce_up_time_constraints_subsequent = enforce_up_time_constraints_subsequent
+        fn_enforce_down_time_constraints_subsequent = enforce_down_time_constraints_subsequent
 
+    model.EnforceUpTimeConstraintsSubsequent = Constraint(model.Generators, model.TimePeriods, rule=fn_enforce_up_time_constraints_subsequent)
+    model.EnforceDownTimeConstraintsSubsequent = Constraint(model.Generators, model.TimePeriods, rule=fn_enforce_down_time_constraints_subsequent)
 
-def constraint_for_cost(model):
 
-    model.ComputeProductionCosts = Piecewise(model.Generators * model.TimePeriods, model.ProductionCost, model.PowerGenerated, pw_pts=model.PowerGenerationPiecewisePoints, f_rule=production_cost_function, pw_constr_type='LB', warning_tol=1e-20)
+def production_cost_function(m, g, t, x, breakpoints=None):
+    # a function for use in piecewise linearization of the cost function.
+    # print('production_cost_function: ', g, t, x)
+    return m.TimePeriodLength * breakpoints.value_dict(breakpoints.curve(g))[x] * m.FuelCost[g]
 
-    model.ComputeHotStart = Constraint(model.Generators, model.TimePeriods, rule=compute_hot_start_rule)
-    model.ComputeStartupCostsMinusM = Constraint(model.Generators, model.TimePeriods, rule=compute_startup_costs_rule_minusM)
+
+def load_benefit_function(m, g, t, x, values=None):
+    # a function for use in piecewise linearization of the price sensitive load benefit function.
+    # print ('load_benefit_function: ',g,t,int(x))
+    return m.TimePeriodLength * values[g,t][x]
+
+
+def load_benefit_epigraph_rule(m, l, t, k):
+    return m.LoadBenefit[l, t] <= m.TimePeriodLength * (m.LoadBenefitIntercept[l, t, k] + m.LoadBenefitSlope[l, t, k] * m.PSLoadDemand[l, t])
+
+
+def production_cost_epigraph_rule(m, g, k, t):
+    return m.ProductionCost[g, t] >= m.TimePeriodLength * m.FuelCost[g] * (m.ProductionCostIntercept[g, k] + m.ProductionCostSlope[g, k] * m.PowerGenerated[g, t])
+
+
+def production_cost_linear_rule(m, g, t):
+    return m.ProductionCost[g, t] >= m.TimePeriodLength * m.FuelCost[g] * m.ProductionCostA1[g] * (m.PowerGenerated[g, t] - m.MinimumPowerOutput[g] * m.UnitOn[g, t])
+
+
+def production_cost_quadratic_rule(m, g, t):
+    return m.TimePeriodLength * m.FuelCost[g] * m.ProductionCostA2[g] * (m.PowerGenerated[g, t]**2 - m.MinimumPowerOutput[g]**2 * m.UnitOn[g, t])
+
+
+def constraint_production_cost(model, breakpoints=None, formulation='epigraph'):
+
+    if formulation not in ('epigraph', 'piecewise', 'quadratic'):
+        raise ValueError('Unknown production cost formulation {}'.format(formulation))
+
+    if formulation == 'quadratic':
+        # ProductionCost keeps the linear part of the cost above MinimumProductionCost; the quadratic part
+        # goes to the objective through ProductionCostQuadratic, so no breakpoints are needed. A negative linear
+        # coefficient makes that part negative, so ProductionCost is not bounded below by zero
+        model.ProductionCost.domain = Reals
+        model.ComputeProductionCostsLinear = Constraint(model.Generators, model.TimePeriods, rule=production_cost_linear_rule)
+        model.ProductionCostQuadratic = Expression(model.Generators, model.TimePeriods, rule=production_cost_quadratic_rule)
+        return
+
+    generators = list(model.Generators)
+    if formulation == 'epigraph':
+        # Convex curves need only one inequality per segment and period; the others fall back to Piecewise
+        segments = {}
+        intercepts = {}
+        slopes = {}
+        for g in generators:
+            curve = breakpoints.curve(g)
+            if curve not in segments:
+                segments[curve] = epigraph_segments(breakpoints.points[curve], breakpoints.values[curve])
+            if segments[curve] is not None:
+                for k, (intercept, slope) in enumerate(zip(*(s.tolist() for s in segments[curve]))):
+                    intercepts[g, k] = intercept
+                    slopes[g, k] = slope
+        convex = set(g for g, k in intercepts)
+        generators = [g for g in generators if g not in convex]
+        if len(generators) > 0:
+            logger.info('Production cost curves of {} generators are not convex'.format(len(generators)))
+        model.ProductionCostSegments = Set(dimen=2, initialize=list(intercepts))
+        model.ProductionCostIntercept = Param(model.ProductionCostSegments, initialize=intercepts)
+        model.ProductionCostSlope = Param(model.ProductionCostSegments, initialize=slopes)
+        model.ComputeProductionCostsEpigraph = Constraint(model.ProductionCostSegments, model.TimePeriods, rule=production_cost_epigraph_rule)
+
+    piecewise = [(g, t) for g in generators for t in model.TimePeriods]
+    if len(piecewise) > 0:
+        # Piecewise only accepts a dict of breakpoints; its entries share the interned lists of breakpoints
+        points = {(g, t): breakpoints.point_list(breakpoints.curve(g)) for g, t in piecewise}
+        # Piecewise only accepts a plain function as f_rule, not a partial
+        def fn_production_cost_function(m, g, t, x):
+            return production_cost_function(m, g, t, x, breakpoints=breakpoints)
+
+        model.PiecewiseProductionCostIndex = Set(dimen=2, initialize=piecewise)
+        model.ComputeProductionCosts = Piecewise(model.PiecewiseProductionCostIndex, model.ProductionCost, model.PowerGenerated, pw_pts=points, f_rule=fn_production_cost_function, pw_constr_type='LB', warning_tol=1e-20)
+
+
+def constraint_for_cost(model, breakpoints=None, template=False, startup_cost_formulation='big_m', production_cost_formulation='epigraph', lean=False):
+
+    if startup_cost_formulation not in ('big_m', 'startup_type'):
+        raise ValueError('Unknown startup cost formulation {}'.format(startup_cost_formulation))
+
+    constraint_production_cost(model, breakpoints=breakpoints, formulation=production_cost_formulation)
+
+    if startup_cost_formulation == 'startup_type':
+        # Every start is either hot or cold, and hot only if the unit was shut down within ColdStartHours
+        if not hasattr(model, 'UnitStart'):
+            constraint_start_stop(model)
+        model.HotStartup = Var(model.Generators, model.TimePeriods, bounds=(0, 1))
+        model.ColdStartup = Var(model.Generators, model.TimePeriods, bounds=(0, 1))
+        model.InitialHotStart = Param(model.Generators, model.TimePeriods, initialize=initial_hot_start_rule, mutable=True)
+        model.ComputeHotStartup = Constraint(model.Generators, model.TimePeriods, rule=hot_startup_rule)
+        model.ComputeStartupType = Constraint(model.Generators, model.TimePeriods, rule=startup_type_rule)
+        model.ComputeStartupCosts = Constraint(model.Generators, model.TimePeriods, rule=compute_startup_costs_rule_startup_type)
+    else:
+        fn_compute_hot_start_rule = partial(compute_hot_start_rule, template=template)
+        model.ComputeHotStart = Constraint(model.Generators, model.TimePeriods, rule=fn_compute_hot_start_rule)
+        if template is True:
+            update_hot_start(model)
+        model.ComputeStartupCostsMinusM = Constraint(model.Generators, model.TimePeriods, rule=compute_startup_costs_rule_minusM)
     model.ComputeShutdownCosts = Constraint(model.Generators, model.TimePeriods, rule=compute_shutdown_costs_rule)
 
+    if lean is True:
+        return
+
     model.Compute_commitment_in_stage_st_cost = Constraint(model.StageSet, rule = commitment_in_stage_st_cost_rule)
 
     model.Compute_generation_in_stage_st_cost = Constraint(model.StageSet, rule = generation_in_stage_st_cost_rule)
@@ -587,9 +906,53 @@ def constraint_for_cost(model):
     model.Compute_Stage_Cost = Constraint(model.StageSet, rule = StageCost_rule)
 
 
-def constraint_for_benefit(model):
-
-    model.ComputePSLoadBenefits = Piecewise(model.PriceSensitiveLoads * model.TimePeriods, model.LoadBenefit, model.PSLoadDemand, pw_pts=model.LoadDemandPiecewisePoints, f_rule=load_benefit_function, pw_constr_type='UB', warning_tol=1e-20)
+def constraint_for_benefit(model, formulation='epigraph'):
+
+    if formulation not in ('epigraph', 'piecewise'):
+        raise ValueError('Unknown benefit formulation {}'.format(formulation))
+
+    piecewise = list(model.PriceSensitiveLoads * model.TimePeriods)
+    if formulation == 'epigraph':
+        # Concave benefits need only one upper bound per segment; the others fall back to Piecewise
+        intercepts = {}
+        slopes = {}
+        curves = {}
+        for k in piecewise:
+            curves.setdefault(len(model.BenefitPiecewisePoints[k]), []).append(k)
+        for n, keys in curves.items():
+            if n == 0:
+                continue
+            points = np.array([model.BenefitPiecewisePoints[k] for k in keys], dtype=float).reshape(len(keys), n)
+            values = np.array([model.BenefitPiecewiseValues[k] for k in keys], dtype=float).reshape(len(keys), n)
+            if n == 1:
+                points, values = np.repeat(points, 2, axis=1), np.repeat(values, 2, axis=1)
+            segment_intercepts, segment_slopes, concave = benefit_segments(points, values)
+            keep = np.diff(points, axis=1) > 0
+            keep[~keep.any(axis=1), 0] = True
+            for i in np.flatnonzero(concave):
+                l, t = keys[i]
+                for j, (intercept, slope) in enumerate(zip(segment_intercepts[i, keep[i]].tolist(), segment_slopes[i, keep[i]].tolist())):
+                    intercepts[l, t, j] = intercept
+                    slopes[l, t, j] = slope
+        concave = set((l, t) for l, t, j in intercepts)
+        piecewise = [i for i in piecewise if i not in concave]
+        if len(piecewise) > 0:
+            logger.info('Benefit curves of {} (load, time) pairs are not concave'.format(len(piecewise)))
+        model.LoadBenefitSegments = Set(dimen=3, initialize=list(intercepts))
+        model.LoadBenefitIntercept = Param(model.LoadBenefitSegments, initialize=intercepts)
+        model.LoadBenefitSlope = Param(model.LoadBenefitSegments, initialize=slopes)
+        model.ComputePSLoadBenefitsEpigraph = Constraint(model.LoadBenefitSegments, rule=load_benefit_epigraph_rule)
+
+    if len(piecewise) > 0:
+        # Piecewise only accepts a dict of breakpoints and a plain function as f_rule, not a partial
+        points = {k: list(model.BenefitPiecewisePoints[k]) for k in piecewise}
+        values = {k: dict(zip(points[k], model.BenefitPiecewiseValues[k])) for k in piecewise}
+
+        def fn_load_benefit_function(m, l, t, x):
+            return load_benefit_function(m, l, t, x, values=values)
+
+        model.PiecewiseLoadBenefitIndex = Set(dimen=2, initialize=piecewise)
+        model.ComputePSLoadBenefits = Piecewise(model.PiecewiseLoadBenefitIndex, model.LoadBenefit, model.PSLoadDemand, pw_pts=points, f_rule=fn_load_benefit_function, pw_constr_type='UB', warning_tol=1e-20)
     # model.ComputeTotalBenefit = Constraint(rule=load_benefit_rule)
 
 
@@ -0,0 +1,197 @@
+# Copyright (c) 2020, Battelle Memorial Institute
+# Copyright 2007 - present: numerous others credited in AUTHORS.rst
+
+import copy
+import logging
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from pyomo.environ import value
+
+from . import build_model
+from .generators import initial_state_from_commitment
+
+logger = logging.getLogger(__name__)
+
+
+WindowSolution = namedtuple('WindowSolution', ['start', 'stop', 'status', 'objective', 'unit_commitment', 'power_generated'])
+
+# Termination conditions whose solution is stitched into the schedule
+SOLVED_STATUSES = ('optimal', 'feasible')
+
+
+def _frame(model, name, generators, periods, offset):
+    component = getattr(model, name)
+    return pd.DataFrame([[value(component[g, t]) for g in generators] for t in periods],
+                        index=pd.RangeIndex(offset + periods[0], offset + periods[-1] + 1), columns=generators)
+
+
+def solve_window(case, load_df, start, stop, commit_start, commit_stop, initial_state=None, gen_status=None,
+                 fixed_power=None, ZonalDataComplete=None, PriceSenLoadData=None, config=None, solve_kwargs=None):
+    ''' Builds and solves the periods [start, stop) of load_df and returns the solution over [commit_start, commit_stop)
+
+    initial_state is a frame indexed by generator with UnitOnT0State and optionally PowerGeneratedT0.
+    gen_status and fixed_power are (time, generator) frames indexed like load_df; non-NaN entries fix UnitOn
+    and PowerGenerated respectively. A window that is not solved to a SOLVED_STATUSES status has no objective,
+    unit_commitment or power_generated.
+    '''
+    case = copy.deepcopy(case)
+    periods = range(start, stop)
+
+    generator_df = pd.merge(case.gen, case.gencost, left_index=True, right_index=True)
+    if initial_state is not None:
+        generator_df['UnitOnT0State'] = initial_state['UnitOnT0State'].reindex(generator_df.index).fillna(generator_df['UnitOnT0State'])
+
+    if gen_status is not None:
+        case.gen_status = gen_status.reindex(periods).reset_index(drop=True)
+    else:
+        case.gen_status = None
+
+    model = build_model(case, generator_df=generator_df, load_df=load_df.iloc[start:stop].reset_index(drop=True),
+                        ZonalDataComplete=ZonalDataComplete, PriceSenLoadData=PriceSenLoadData, config=dict(config or dict()))
+    instance = model._model
+
+    if initial_state is not None and 'PowerGeneratedT0' in initial_state:
+        for g, v in initial_state['PowerGeneratedT0'].dropna().items():
+            instance.PowerGeneratedT0[g].fix(v)
+
+    if fixed_power is not None:
+        fixed_power = fixed_power.reindex(periods).reset_index(drop=True)
+        for t, row in fixed_power.iterrows():
+            for g, v in row.dropna().items():
+                instance.PowerGenerated[g, t].fix(v)
+
+    _, status = model.solve(**(solve_kwargs or dict()))
+    if status not in SOLVED_STATUSES:
+        return WindowSolution(start=commit_start, stop=commit_stop, status=status, objective=None,
+                              unit_commitment=None, power_generated=None)
+
+    generators = list(instance.Generators)
+    committed = list(range(commit_start - start, commit_stop - start))
+    return WindowSolution(start=commit_start, stop=commit_stop, status=status,
+                          objective=value(instance.TotalCostObjective),
+                          unit_commitment=_frame(instance, 'UnitOn', generators, committed, start).round().astype(int),
+                          power_generated=_frame(instance, 'PowerGenerated', generators, committed, start))
+
+
+class PSSTParallelHorizon(object):
+    ''' Solves a long horizon as overlapping windows in a process pool and repairs the seams between them
+
+    The horizon is split into blocks of ``window`` periods. Every block is solved together with ``overlap``
+    periods on each side, which absorb the unknown initial conditions and end effects, and only the block
+    itself is kept. Because every block but the first starts from assumed initial conditions, the stitched
+    schedule can violate ramp and minimum up/down constraints at the seams. Each seam is therefore re-solved
+    over ``seam`` periods on each side, starting from the initial state implied by the stitched schedule
+    before it and with the commitment and output of its last periods fixed to the stitched schedule after it.
+    Seams are independent of each other and are solved concurrently too, so ``seam`` is at most half of
+    ``window``: the periods re-solved around one seam never overlap those of the next. A seam that is not solved
+    leaves the schedule of the windows in place; a window that is not solved is an error.
+    '''
+
+    def __init__(self, case, load_df=None, window=168, overlap=24, seam=12, processes=None,
+                 ZonalDataComplete=None, PriceSenLoadData=None, config=None):
+
+        if load_df is None:
+            load_df = case.load
+
+        if 2 * seam > window:
+            raise ValueError('The seams of {} periods on each side overlap in windows of {} periods, use a seam of at most {}'.format(seam, window, window // 2))
+
+        self.case = case
+        self.load = load_df.reset_index(drop=True)
+        self.window = window
+        self.overlap = overlap
+        self.seam = seam
+        self.processes = processes
+        self.gen_status = getattr(case, 'gen_status', None)
+        if self.gen_status is not None:
+            self.gen_status = self.gen_status.reset_index(drop=True)
+
+        self._model_kwargs = dict(ZonalDataComplete=ZonalDataComplete, PriceSenLoadData=PriceSenLoadData, config=config)
+        self._initial_state = pd.DataFrame({'UnitOnT0State': case.gen['UnitOnT0State'].astype(float)})
+
+        # Longest minimum up or down time, the commitment that has to be held fixed behind every seam
+        generators = case.gen.reindex(columns=['MINIMUM_UP_TIME', 'MINIMUM_DOWN_TIME']).fillna(0)
+        self._tail = int(max(1, generators.values.max()))
+
+        self.windows = list()
+        self.seams = list()
+
+    def __repr__(self):
+        repr_string = 'periods={}, window={}, overlap={}, seam={}'.format(len(self.load.index), self.window, self.overlap, self.seam)
+        return '<{}.{}({})>'.format(self.__class__.__module__, self.__class__.__name__, repr_string)
+
+    def solve(self, executor=None, **kwargs):
+        ''' Solves the horizon and returns the stitched (unit_commitment, power_generated) frames
+
+        Keyword arguments are passed to PSSTModel.solve. A custom concurrent.futures executor can be given,
+        otherwise a ProcessPoolExecutor with ``processes`` workers is used.
+        '''
+        periods = len(self.load.index)
+        own_executor = executor is None
+        if own_executor:
+            executor = ProcessPoolExecutor(max_workers=self.processes)
+
+        try:
+            futures = list()
+            for commit_start in range(0, periods, self.window):
+                commit_stop = min(periods, commit_start + self.window)
+                start, stop = max(0, commit_start - self.overlap), min(periods, commit_stop + self.overlap)
+                futures.append(executor.submit(solve_window, self.case, self.load, start, stop, commit_start, commit_stop,
+                                               initial_state=self._initial_state, gen_status=self.gen_status,
+                                               solve_kwargs=kwargs, **self._model_kwargs))
+            self.windows = [f.result() for f in futures]
+            logger.info('Solved {} windows with statuses {}'.format(len(self.windows), [w.status for w in self.windows]))
+            failed = ['{} to {} ({})'.format(w.start, w.stop - 1, w.status) for w in self.windows if w.status not in SOLVED_STATUSES]
+            if len(failed) > 0:
+                raise ValueError('Unable to solve the windows of periods {}'.format(', '.join(failed)))
+
+            unit_commitment = pd.concat([w.unit_commitment for w in self.windows])
+            power_generated = pd.concat([w.power_generated for w in self.windows])
+
+            futures = list()
+            for seam in [w.start for w in self.windows[1:]]:
+                futures.append(executor.submit(solve_window, self.case, self.load, *self._seam(seam, unit_commitment, power_generated),
+                                               solve_kwargs=kwargs, **self._model_kwargs))
+            self.seams = [f.result() for f in futures]
+            logger.info('Repaired {} seams with statuses {}'.format(len(self.seams), [s.status for s in self.seams]))
+        finally:
+            if own_executor:
+                executor.shutdown()
+
+        for s in self.seams:
+            if s.status not in SOLVED_STATUSES:
+                logger.warning('Unable to repair the seam of periods {} to {} ({}), keeping the window schedule'.format(s.start, s.stop - 1, s.status))
+                continue
+            unit_commitment.loc[s.start:s.stop - 1] = s.unit_commitment.values
+            power_generated.loc[s.start:s.stop - 1] = s.power_generated.values
+
+        return unit_commitment, power_generated
+
+    def _seam(self, seam, unit_commitment, power_generated):
+        periods = len(self.load.index)
+        start = max(0, seam - self.seam)
+        stop = min(periods, seam + self.seam)
+        tail = min(self._tail, stop - seam) if stop < periods else 0
+
+        initial_state = self._initial_state
+        if start > 0:
+            before = unit_commitment.loc[:start - 1]
+            initial_state = pd.DataFrame({
+                'UnitOnT0State': initial_state_from_commitment(before, previous_state=self._initial_state['UnitOnT0State'],
+                                                               time_period_length=self.case.TimePeriodLength),
+                'PowerGeneratedT0': power_generated.loc[start - 1].clip(lower=0),
+            })
+
+        gen_status = pd.DataFrame(np.nan, index=range(start, stop), columns=unit_commitment.columns)
+        if self.gen_status is not None:
+            gen_status.update(self.gen_status.reindex(index=range(start, stop), columns=unit_commitment.columns))
+        fixed_power = gen_status.copy() * np.nan
+        if tail > 0:
+            gen_status.loc[stop - tail:] = unit_commitment.loc[stop - tail:stop - 1].values
+            fixed_power.loc[stop - tail:] = power_generated.loc[stop - tail:stop - 1].clip(lower=0).values
+
+        return (start, stop, start, stop - tail, initial_state, gen_status, fixed_power)
@@ -10,5 +10,6 @@ def initialize_demand(model, demand=None):
     model.Demand = Param(model.Buses, model.TimePeriods, initialize=demand, default=0.0, mutable=True)
 
 
+def update_demand(model, demand=None):
 
-
+    model.Demand.store_values(demand)
@@ -1,9 +1,13 @@
 # Copyright (c) 2020, Battelle Memorial Institute
 # Copyright 2007 - present: numerous others credited in AUTHORS.rst
 
+
 from pyomo.environ import *
 import click
 
+import numpy as np
+import pandas as pd
+
 
 def initialize_generators(model,
                         generator_names=None,
@@ -145,6 +149,71 @@ def initial_state(model, initial_state=None,
     model.InitialTimePeriodsOffLine = Param(model.Generators, within=NonNegativeIntegers, initialize=_initial_time_periods_offline_rule, mutable=True)
 
 
+def initial_state_from_commitment(unit_commitment, previous_state=None, time_period_length=1):
+    ''' Returns the signed time each generator has been on (positive) or off (negative) at the end of unit_commitment
+
+    unit_commitment is a (time, generator) frame of 0/1 values. If a generator does not change status
+    over the whole frame and previous_state has the same sign, the two are added together.
+    '''
+    status = unit_commitment.values.round().astype(int)
+    last = status[-1]
+    periods = len(status)
+
+    changed = status != last
+    run = np.where(changed.any(axis=0), np.argmax(changed[::-1], axis=0), periods) * time_period_length
+    state = pd.Series(np.where(last == 1, run, -run).astype(float), index=unit_commitment.columns)
+
+    if previous_state is not None:
+        previous_state = pd.Series(previous_state).reindex(state.index).fillna(0)
+        carry = ~changed.any(axis=0) & (np.sign(previous_state.values) == np.sign(state.values))
+        state[carry] = state[carry] + previous_state[carry]
+
+    return state
+
+
+def update_initial_state(model, initial_state=None, power_generated=None):
+    # Sets UnitOnT0State (and PowerGeneratedT0 if given) and recomputes the parameters derived from it
+
+    if initial_state is not None:
+        for g, v in initial_state.items():
+            model.UnitOnT0State[g] = v
+            model.UnitOnT0[g] = int(v >= 1)
+        for g in initial_state:
+            model.InitialTimePeriodsOnLine[g] = _initial_time_periods_online_rule(model, g)
+            model.InitialTimePeriodsOffLine[g] = _initial_time_periods_offline_rule(model, g)
+
+    if power_generated is not None:
+        for g, v in power_generated.items():
+            model.PowerGeneratedT0[g].fix(v)
+
+
+def fix_commitment(model, g, t, v):
+    # Fixes UnitOn[g, t] to v. A fixed status is given a continuous domain, which does not change the problem, but
+    # in-memory solvers keep fixed variables as columns, and a model with a fixed commitment is then solved as
+    # the LP it is, with duals. Use unfix_commitment to free it again.
+    model.UnitOn[g, t].fix(v)
+    model.UnitOn[g, t].domain = UnitInterval
+
+
+def unfix_commitment(model, index=None):
+    # Frees UnitOn over the (generator, time) pairs of index, or everywhere, and restores its binary domain
+    for u in (model.UnitOn.values() if index is None else (model.UnitOn[k] for k in index)):
+        u.unfix()
+        u.domain = Binary
+
+
+def fix_initial_commitment(model):
+    # Fixes UnitOn over the periods in which the initial conditions force a unit to stay on or off
+    for g in model.Generators:
+        online = value(model.InitialTimePeriodsOnLine[g])
+        offline = value(model.InitialTimePeriodsOffLine[g])
+        for t in model.TimePeriods:
+            if (t + 1) <= online:
+                fix_commitment(model, g, t, 1)
+            elif (t + 1) <= offline:
+                fix_commitment(model, g, t, 0)
+
+
 def hot_start_cold_start_costs(model,
                             hot_start_costs=None,
                             cold_start_costs=None,
@@ -175,11 +244,11 @@ def _minimum_production_cost_fn(m, g):
     # has to have lower bound of 0, so the unit can cost 0 when off -- this is added
     # back in to the objective if a unit is on
     if len(m.CostPiecewisePoints[g]) > 1:
-        return m.CostPiecewiseValues[g].first() * m.FuelCost[g]
+        return m.CostPiecewiseValues[g][0] * m.FuelCost[g]
     elif len(m.CostPiecewisePoints[g]) == 1:
         # If there's only one piecewise point given, that point should be (MaxPower, MaxCost) -- i.e. the cost function is linear through (0,0),
         # so we can find the slope of the line and use that to compute the cost of running at minimum generation
-        return m.MinimumPowerOutput[g] * (m.CostPiecewiseValues[g].first() / m.MaximumPowerOutput[g]) * m.FuelCost[g]
+        return m.MinimumPowerOutput[g] * (m.CostPiecewiseValues[g][0] / m.MaximumPowerOutput[g]) * m.FuelCost[g]
     else:
         return  m.FuelCost[g] * \
                (m.ProductionCostA0[g] + \
@@ -188,7 +257,7 @@ def _minimum_production_cost_fn(m, g):
 
 
 def minimum_production_cost(model, minimum_production_cost=_minimum_production_cost_fn):
-    model.MinimumProductionCost = Param(model.Generators, within=NonNegativeReals, initialize=_minimum_production_cost_fn, mutable=True)
+    model.MinimumProductionCost = Param(model.Generators, within=NonNegativeReals, initialize=minimum_production_cost, mutable=True)
 
 
 def quadratic_cost_coefficients(model, production_cost_a=None, production_cost_b=None, production_cost_c=None):
@@ -197,18 +266,19 @@ def quadratic_cost_coefficients(model, production_cost_a=None, production_cost_b
     ##################################################################################################################
 
     #\a_j
-    model.ProductionCostA0 = Param(model.Generators, default=0.0) # units are $/hr (or whatever the time unit is).
+    model.ProductionCostA0 = Param(model.Generators, default=0.0, initialize=production_cost_a) # units are $/hr (or whatever the time unit is).
     #\b_j
-    model.ProductionCostA1 = Param(model.Generators, default=0.0) # units are $/MWhr.
+    model.ProductionCostA1 = Param(model.Generators, default=0.0, initialize=production_cost_b) # units are $/MWhr.
     #\c_j
-    model.ProductionCostA2 = Param(model.Generators, default=0.0) # units are $/(MWhr^2).
+    model.ProductionCostA2 = Param(model.Generators, default=0.0, initialize=production_cost_c) # units are $/(MWhr^2).
 
 
 def piece_wise_linear_cost(model, points=None, values=None):
     # production cost associated with each generator, for each time period.
-    model.CostPiecewisePoints = Set(model.Generators, initialize=points, ordered=True)
+    # Params rather than ordered Sets, since Sets drop repeated cost values (e.g. flat segments)
+    model.CostPiecewisePoints = Param(model.Generators, within=Any, initialize=points)
     #click.echo("In model generator.py piece_wise_linear_cost - printing CostPiecewisePoints: " + str(model.CostPiecewisePoints))
-    model.CostPiecewiseValues = Set(model.Generators, initialize=values, ordered=True)
+    model.CostPiecewiseValues = Param(model.Generators, within=Any, initialize=values)
 
 def fuel_cost(model, fuel_cost=1):
 
@@ -220,66 +290,122 @@ def production_cost_function(m, g, t, x):
     return m.TimePeriodLength * m.PowerGenerationPiecewiseValues[g,t][x] * m.FuelCost[g]
 
 
+def epigraph_segments(points, values, tolerance=1e-6):
+    ''' Returns the (intercepts, slopes) of the segments of a piecewise linear curve, or None if it is not convex
+
+    Slopes may decrease by up to tolerance relative to their magnitude, which absorbs the round-off of curves
+    sampled from convex quadratics.
+    '''
+    x = np.asarray(points, dtype=float)
+    y = np.asarray(values, dtype=float)
+    width = np.diff(x)
+    keep = width > 0
+    slope = np.diff(y)[keep] / width[keep]
+    if np.any(np.diff(slope) < -tolerance * np.maximum(1, np.abs(slope[1:]))):
+        return None
+    return y[:-1][keep] - slope * x[:-1][keep], slope
+
+
+class PiecewiseBreakpoints(object):
+    ''' Interned piecewise linear cost curves, stored once per generator
+
+    Curves are kept as float arrays and identical curves share one entry, so every period of a generator, and
+    every generator with the same curve, uses the same breakpoints. The list and dict forms expected by Piecewise
+    and production_cost_function are built once per curve.
+    '''
+
+    def __init__(self):
+        self.points = list()
+        self.values = list()
+        self._curves = dict()
+        self._generator = dict()
+        self._lists = dict()
+        self._dicts = dict()
+
+    def __repr__(self):
+        return '<{}.{}({} generators, {} curves)>'.format(self.__class__.__module__,
+                                                           self.__class__.__name__,
+                                                           len(self._generator),
+                                                           len(self.points))
+
+    def intern(self, points, values):
+        ''' Returns the id of the curve through (points, values), adding it if it is new '''
+        points = np.asarray(points, dtype=float)
+        values = np.asarray(values, dtype=float)
+        key = (points.tobytes(), values.tobytes())
+        if key not in self._curves:
+            points.setflags(write=False)
+            values.setflags(write=False)
+            self._curves[key] = len(self.points)
+            self.points.append(points)
+            self.values.append(values)
+        return self._curves[key]
+
+    def set(self, g, points, values):
+        ''' Sets the curve of generator g '''
+        self._generator[g] = self.intern(points, values)
+
+    def curve(self, g):
+        ''' Returns the id of the curve of generator g '''
+        return self._generator[g]
+
+    def point_list(self, curve):
+        if curve not in self._lists:
+            self._lists[curve] = self.points[curve].tolist()
+        return self._lists[curve]
+
+    def value_dict(self, curve):
+        if curve not in self._dicts:
+            self._dicts[curve] = dict(zip(self.point_list(curve), self.values[curve].tolist()))
+        return self._dicts[curve]
+
+
 def production_cost(model):
+    # Returns the production cost curves of the generators above their minimum production cost
 
-    model.PowerGenerationPiecewisePoints = {}
-    model.PowerGenerationPiecewiseValues = {}
-    #click.echo("In generators.py production_cost ")
+    breakpoints = PiecewiseBreakpoints()
     for g in model.Generators:
-        for t in model.TimePeriods:
-            power_generation_piecewise_points_rule(model, g, t)
-    #print ('model.PowerGenerationPiecewisePoints: ', model.PowerGenerationPiecewisePoints)
-    #print ('model.PowerGenerationPiecewiseValues: ', model.PowerGenerationPiecewiseValues)
+        breakpoints.set(g, *power_generation_piecewise_points_rule(model, g))
+
+    return breakpoints
 
 
-def power_generation_piecewise_points_rule(m, g, t):
-    #click.echo("In generators.py power_generation_piecewise_points_rule ")
+def power_generation_piecewise_points_rule(m, g):
+    # Returns the breakpoints of the production cost curve of g above its minimum production cost, starting at (0, 0)
     minimum_production_cost = value(m.MinimumProductionCost[g])
     if len(m.CostPiecewisePoints[g]) > 0:
-        #click.echo("In model generator.py power_generation_piecewise_points_rule - printing list(m.CostPiecewisePoints[g]): " + str(list(m.CostPiecewisePoints[g])))
-        m.PowerGenerationPiecewisePoints[g,t] = list(m.CostPiecewisePoints[g])
-        temp = list(m.CostPiecewiseValues[g])
-        #click.echo("In model generator.py power_generation_piecewise_points_rule - printing list(m.CostPiecewiseValues[g]): " + str(temp))
-        m.PowerGenerationPiecewiseValues[g,t] = {}
-        for i in range(len(m.CostPiecewisePoints[g])):
-            m.PowerGenerationPiecewiseValues[g,t][m.PowerGenerationPiecewisePoints[g,t][i]] = temp[i] - minimum_production_cost
+        points = list(m.CostPiecewisePoints[g])
+        values = [v - minimum_production_cost for v in m.CostPiecewiseValues[g]]
         # MinimumPowerOutput will be one of our piecewise points, so it is safe to add (0,0)
-        if m.PowerGenerationPiecewisePoints[g,t][0] != 0:
-            m.PowerGenerationPiecewisePoints[g,t].insert(0,0)
-        m.PowerGenerationPiecewiseValues[g,t][0] = 0
+        if points[0] != 0:
+            points.insert(0, 0)
+            values.insert(0, 0)
+        values[0] = 0
     elif value(m.ProductionCostA2[g]) == 0:
         # If cost is linear, we only need two points -- (0,CostA0-MinCost) and (MaxOutput, MaxCost)
-        m.PowerGenerationPiecewisePoints[g, t] = [0, value(m.MaximumPowerOutput[g])]
-        m.PowerGenerationPiecewiseValues[g,t] = {}
-        m.PowerGenerationPiecewiseValues[g,t][0] = value(m.ProductionCostA0[g]) - minimum_production_cost
-        m.PowerGenerationPiecewiseValues[g,t][m.PowerGenerationPiecewisePoints[g,t][1]] = \
-                value(m.ProductionCostA0[g]) + \
-                value(m.ProductionCostA1[g]) * m.PowerGenerationPiecewisePoints[g, t][1] \
-                - minimum_production_cost
+        points = [0, value(m.MaximumPowerOutput[g])]
+        values = [value(m.ProductionCostA0[g]) - minimum_production_cost,
+                  value(m.ProductionCostA0[g]) + value(m.ProductionCostA1[g]) * points[1] - minimum_production_cost]
     else:
         min_power = value(m.MinimumPowerOutput[g])
         max_power = value(m.MaximumPowerOutput[g])
         n = value(m.NumGeneratorCostCurvePieces)
-        #click.echo("In generators.py n: " + str(n))
         width = (max_power - min_power) / float(n)
         if width == 0:
-            m.PowerGenerationPiecewisePoints[g, t] = [min_power]
+            points = [min_power]
         else:
-            m.PowerGenerationPiecewisePoints[g, t] = [min_power + i*width for i in range(0,n+1)]
+            points = [min_power + i*width for i in range(0,n+1)]
             # NOTE: due to numerical precision limitations, the last point in the x-domain
             #       of the generation piecewise cost curve may not be precisely equal to the
             #       maximum power output level of the generator. this can cause Piecewise to
             #       sqawk, as it would like the upper bound of the variable to be represented
             #       in the domain. so, we will make it so.
-            m.PowerGenerationPiecewisePoints[g, t][-1] = max_power
-        m.PowerGenerationPiecewiseValues[g,t] = {}
-        for i in range(n+1):
-            m.PowerGenerationPiecewiseValues[g,t][m.PowerGenerationPiecewisePoints[g,t][i]] = \
-                       value(m.ProductionCostA0[g]) + \
-                       value(m.ProductionCostA1[g]) * m.PowerGenerationPiecewisePoints[g, t][i] + \
-                       value(m.ProductionCostA2[g]) * m.PowerGenerationPiecewisePoints[g, t][i]**2 \
-                       - minimum_production_cost
-        if m.PowerGenerationPiecewisePoints[g, t][0] != 0:
-            m.PowerGenerationPiecewisePoints[g, t].insert(0,0)
-            m.PowerGenerationPiecewiseValues[g, t][0] = 0
-
+            points[-1] = max_power
+        values = [value(m.ProductionCostA0[g]) + \
+                  value(m.ProductionCostA1[g]) * p + \
+                  value(m.ProductionCostA2[g]) * p**2 \
+                  - minimum_production_cost for p in points]
+        if points[0] != 0:
+            points.insert(0, 0)
+            values.insert(0, 0)
+    return points, values
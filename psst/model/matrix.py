@@ -0,0 +1,538 @@
+# Copyright (c) 2020, Battelle Memorial Institute
+# Copyright 2007 - present: numerous others credited in AUTHORS.rst
+
+''' Direct sparse-matrix assembly of the DC-SCUC.
+
+build_matrices assembles the same unit commitment problem as build_model (production, start up, shut down
+and no-load costs, power balance, line flows, generator limits, ramps, minimum up and down times and
+reserves) straight into scipy.sparse arrays, without creating Pyomo components or expressions::
+
+    minimize    c @ x
+    subject to  row_lower <= A @ x <= row_upper
+                col_lower <= x <= col_upper
+                x[integrality == 1] integer
+
+The bookkeeping variables of the Pyomo model (stage costs) are folded into the objective and the
+tautological mismatch tolerance constraints are left out; neither changes the optimum.
+'''
+
+import logging
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from ..case.arrays import CaseArrays
+from ..case.utils import calculate_PTDF
+from .generators import epigraph_segments
+
+logger = logging.getLogger(__name__)
+
+eps = 1e-3
+
+ANGLE_BOUND = 3.14159265
+
+
+class _Columns(object):
+
+    def __init__(self):
+        self.blocks = OrderedDict()
+        self.lower = list()
+        self.upper = list()
+        self.integrality = list()
+        self.size = 0
+
+    def add(self, name, index, shape, lower=0.0, upper=np.inf, integer=False):
+        n = int(np.prod(shape))
+        positions = np.arange(self.size, self.size + n).reshape(shape)
+        self.blocks[name] = (positions, index)
+        self.lower.append(np.broadcast_to(np.asarray(lower, dtype=float), shape).ravel())
+        self.upper.append(np.broadcast_to(np.asarray(upper, dtype=float), shape).ravel())
+        self.integrality.append(np.full(n, int(integer)))
+        self.size = self.size + n
+        return positions
+
+
+class _Rows(object):
+
+    def __init__(self):
+        self.blocks = OrderedDict()
+        self.rows = list()
+        self.cols = list()
+        self.vals = list()
+        self.lower = list()
+        self.upper = list()
+        self.size = 0
+
+    def add(self, name, terms, lower=-np.inf, upper=np.inf, shape=None):
+        ''' Adds one row per element of shape, by default the broadcast shape of terms, lower and upper
+
+        terms is a list of (coefficient, column) pairs; coefficients and columns broadcast against each other,
+        and any trailing axes beyond shape are summed over. Columns equal to -1 are ignored, which allows
+        ragged sums to be expressed as padded arrays.
+        '''
+        if shape is None:
+            shape = np.broadcast(*([np.asarray(lower), np.asarray(upper)] + [np.asarray(c) for t in terms for c in t])).shape
+        shape = tuple(shape)
+        n = int(np.prod(shape))
+        rows = np.arange(self.size, self.size + n).reshape(shape)
+        for coefficient, column in terms:
+            coefficient = np.asarray(coefficient, dtype=float)
+            column = np.asarray(column)
+            extra = max(0, len(np.broadcast(coefficient, column).shape) - len(shape))
+            coefficient, column, row = np.broadcast_arrays(coefficient, column, rows.reshape(shape + (1, ) * extra))
+            keep = (column >= 0) & (coefficient != 0)
+            self.rows.append(row[keep])
+            self.cols.append(column[keep])
+            self.vals.append(coefficient[keep])
+        self.lower.append(np.broadcast_to(np.asarray(lower, dtype=float), shape).ravel())
+        self.upper.append(np.broadcast_to(np.asarray(upper, dtype=float), shape).ravel())
+        self.blocks[name] = rows
+        self.size = self.size + n
+        return rows
+
+
+def _concatenate(arrays, dtype=float):
+    if len(arrays) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.concatenate(arrays).astype(dtype)
+
+
+def production_cost_segments(arrays, fuel_cost=1.0):
+    ''' Returns the per-generator epigraph segments (intercepts, slopes) and minimum production cost
+
+    This mirrors psst.model.generators.power_generation_piecewise_points_rule: (0, 0) is added in front of
+    the curve and the minimum production cost is subtracted from every value.
+    '''
+    points, values = arrays.cost_curves()
+    intercepts = list()
+    slopes = list()
+    minimum_production_cost = np.zeros(len(arrays.gen_names))
+
+    for i, g in enumerate(arrays.gen_names):
+        if g not in points:
+            raise ValueError('Generator {} has no piecewise linear cost curve (NCOST={})'.format(g, arrays.ncost[i]))
+        x = np.array(points[g])
+        y = np.array(values[g])
+        if len(x) > 1:
+            minimum_production_cost[i] = y[0] * fuel_cost
+        else:
+            minimum_production_cost[i] = arrays.pmin[i] * (y[0] / arrays.pmax[i]) * fuel_cost
+        y = y - minimum_production_cost[i]
+        if x[0] != 0:
+            x = np.insert(x, 0, 0)
+            y = np.insert(y, 0, 0)
+        else:
+            y[0] = 0
+
+        segments = epigraph_segments(x, y)
+        if segments is None:
+            raise ValueError('Production cost curve of generator {} is not convex'.format(g))
+        slopes.append(segments[1] * fuel_cost)
+        intercepts.append(segments[0] * fuel_cost)
+
+    return intercepts, slopes, minimum_production_cost
+
+
+def _window(start, stop, size):
+    ''' Returns a (len(start), max window) array of time positions in [start, stop), padded with -1 '''
+    width = max(1, int((stop - start).max()) if len(start) else 1)
+    window = start[:, None] + np.arange(width)[None, :]
+    window[window >= stop[:, None]] = -1
+    window[window >= size] = -1
+    return window
+
+
+def build_matrices(case,
+                generator_df=None,
+                load_df=None,
+                branch_df=None,
+                bus_df=None,
+                ZonalDataComplete=None,
+                PriceSenLoadData=None,
+                base_MVA=None,
+                config=None):
+
+    if config is None:
+        config = dict()
+
+    use_ptdf = config.pop('use_ptdf', False)
+
+    if getattr(case, 'PriceSenLoadFlag', 0) != 0:
+        raise ValueError('Price sensitive loads are not supported by the matrix backend')
+    if getattr(case, 'StorageFlag', 0) != 0:
+        raise ValueError('Storage is not supported by the matrix backend')
+
+    arrays = CaseArrays(case, generator_df=generator_df, load_df=load_df, branch_df=branch_df, bus_df=bus_df, base_MVA=base_MVA)
+
+    G, T, B, L = len(arrays.gen_names), len(arrays.time_periods), len(arrays.bus_names), len(arrays.line_names)
+    if arrays.time_periods != list(range(T)):
+        raise ValueError('The matrix backend expects time periods 0 to {}, got {}'.format(T - 1, arrays.time_periods))
+
+    time_period_length = case.TimePeriodLength
+    demand = arrays.demand_matrix().T  # (bus, time)
+
+    pmin, pmax = arrays.pmin, arrays.pmax
+    nru, nrd = arrays.ramp_up, arrays.ramp_down
+    su = np.minimum(pmax, arrays.startup_ramp * time_period_length)
+    sd = np.minimum(pmax, arrays.shutdown_ramp * time_period_length)
+    ut, dt = arrays.minimum_up_time, arrays.minimum_down_time
+
+    state = arrays.unit_on_t0_state
+    u0 = (state >= 1).astype(float)
+    online = np.where(u0 == 1, np.minimum(T, np.round(np.maximum(0, ut - state) / time_period_length)), 0).astype(int)
+    offline = np.where(u0 == 0, np.minimum(T, np.round(np.maximum(0, dt + state) / time_period_length)), 0).astype(int)
+
+    intercepts, slopes, minimum_production_cost = production_cost_segments(arrays)
+
+    generators = arrays.gen_names
+    periods = arrays.time_periods
+    gt = (generators, periods)
+    bt = (arrays.bus_names, periods)
+    lt = (arrays.line_names, periods)
+
+    # Columns
+    columns = _Columns()
+    unit_on_upper = np.ones((G, T))
+    unit_on_lower = np.zeros((G, T))
+    status = arrays.gen_status.T
+    fixed = ~np.isnan(status)
+    unit_on_lower[fixed] = status[fixed]
+    unit_on_upper[fixed] = status[fixed]
+    u = columns.add('UnitOn', gt, (G, T), lower=unit_on_lower, upper=unit_on_upper, integer=True)
+    pg = columns.add('PowerGenerated', gt, (G, T), upper=pmax[:, None])
+    pmax_available = columns.add('MaximumPowerAvailable', gt, (G, T))
+    pmin_available = columns.add('MinimumPowerAvailable', gt, (G, T))
+    production = columns.add('ProductionCost', gt, (G, T))
+    startup = columns.add('StartupCost', gt, (G, T))
+    shutdown = columns.add('ShutdownCost', gt, (G, T))
+
+    cold_start_hours = arrays.cold_start_hours
+    tt = np.arange(T)[None, :]
+    hot_fixed = (tt <= cold_start_hours[:, None]) & (tt - cold_start_hours[:, None] <= state[:, None])
+    hot = columns.add('HotStart', gt, (G, T), lower=hot_fixed.astype(float), upper=1.0)
+    pg0 = columns.add('PowerGeneratedT0', (generators,), (G,))
+
+    # PTDF problems express the flows in terms of the injections and have no LinePower or Angle columns
+    if not use_ptdf:
+        line_power = columns.add('LinePower', lt, (L, T), lower=-np.inf)
+    net_injection = columns.add('NetPowerInjectionAtBus', bt, (B, T), lower=-np.inf)
+    if not use_ptdf:
+        angle = columns.add('Angle', bt, (B, T), lower=-ANGLE_BOUND, upper=ANGLE_BOUND)
+    mismatch = columns.add('LoadGenerateMismatch', bt, (B, T), lower=-np.inf)
+    pos_mismatch = columns.add('posLoadGenerateMismatch', bt, (B, T))
+    neg_mismatch = columns.add('negLoadGenerateMismatch', bt, (B, T))
+    total_demand = columns.add('TotalDemand', (periods,), (T,))
+    reserve_mismatch = columns.add('GlobalReserveMismatch', (periods,), (T,), lower=-np.inf)
+    pos_reserve_mismatch = columns.add('posGlobalReserveMismatch', (periods,), (T,))
+    neg_reserve_mismatch = columns.add('negGlobalReserveMismatch', (periods,), (T,))
+
+    rows = _Rows()
+
+    # Net power injection, only at buses with generators
+    gen_buses = np.unique(arrays.gen_bus)
+    net_rows = rows.add('CalculateNetPowerAtBus',
+                        [(1.0, net_injection[gen_buses]), (-1.0, mismatch[gen_buses])],
+                        lower=-demand[gen_buses], upper=-demand[gen_buses])
+    rows.rows.append(net_rows[np.searchsorted(gen_buses, arrays.gen_bus)].ravel())
+    rows.cols.append(pg.ravel())
+    rows.vals.append(np.full(G * T, -1.0))
+
+    # Line flows
+    reactance = arrays.reactance
+    susceptance = np.where(reactance < 0, 0, 1 / np.where(reactance == 0, 1, reactance))
+    limited = np.flatnonzero(np.absolute(arrays.thermal_limit) > eps)
+    limit = arrays.thermal_limit[limited][:, None]
+    if use_ptdf:
+        ptdf = calculate_PTDF(case, precision=config.pop('ptdf_precision', None), tolerance=config.pop('ptdf_tolerance', None),
+                              cache=config.pop('ptdf_cache', None))
+        ptdf = sp.csr_matrix(ptdf)[limited]
+        ptdf.eliminate_zeros()
+        # Lines whose PTDF row is empty carry no flow and have no limit rows, as in the Pyomo model
+        nonempty = ptdf.getnnz(axis=1) > 0
+        limited, limit, ptdf = limited[nonempty], limit[nonempty], ptdf[nonempty]
+        limit_rows = rows.add('LinePowerConstraint', [], lower=-limit, upper=limit, shape=(len(limited), T))
+        coo = ptdf.tocoo()
+        rows.rows.append(limit_rows[coo.row].ravel())
+        rows.cols.append(net_injection[coo.col].ravel())
+        rows.vals.append(np.repeat(coo.data, T))
+
+        # The flows cancel out of the sum of the bus balances, which leaves one system balance per period
+        rows.add('PowerBalance', [(1.0, net_injection.T), (1.0, mismatch.T)], lower=0.0, upper=0.0, shape=(T, ))
+    else:
+        rows.add('FixFirstAngle', [(1.0, angle[arrays.slack_bus])], lower=0.0, upper=0.0)
+        lines = np.flatnonzero(reactance != 0)
+        b = susceptance[lines][:, None]
+        rows.add('CalculateLinePower',
+                 [(1.0, line_power[lines]), (-b, angle[arrays.line_from[lines]]), (b, angle[arrays.line_to[lines]])],
+                 lower=0.0, upper=0.0)
+        rows.add('LinePowerConstraint', [(1.0, line_power[limited])], lower=-limit, upper=limit)
+
+        # Power balance
+        balance = rows.add('PowerBalance', [(1.0, net_injection), (1.0, mismatch)], lower=0.0, upper=0.0)
+        rows.rows.extend([balance[arrays.line_to].ravel(), balance[arrays.line_from].ravel()])
+        rows.cols.extend([line_power.ravel(), line_power.ravel()])
+        rows.vals.extend([np.ones(L * T), -np.ones(L * T)])
+
+    # Demand and mismatch
+    system_demand = demand.sum(axis=0)
+    rows.add('CalculateTotalDemand', [(1.0, total_demand)], lower=system_demand, upper=system_demand)
+    rows.add('DefinePosMismatch', [(1.0, pos_mismatch), (-1.0, mismatch)], lower=0.0)
+    rows.add('DefineNegMismatch', [(1.0, neg_mismatch), (1.0, mismatch)], lower=0.0)
+    rows.add('Global_Reserve_DefinePosMismatch', [(1.0, pos_reserve_mismatch), (-1.0, reserve_mismatch)], lower=0.0)
+    rows.add('Global_Reserve_DefineNegMismatch', [(1.0, neg_reserve_mismatch), (1.0, reserve_mismatch)], lower=0.0)
+
+    # Global reserves
+    reserve_up = case.ReserveUpSystemPercent * np.maximum(0, system_demand)
+    reserve_down = case.ReserveDownSystemPercent * np.maximum(0, system_demand)
+    up_rows = rows.add('EnforceReserveUpRequirements', [(-1.0, total_demand), (-1.0, reserve_mismatch)], lower=reserve_up, upper=reserve_up)
+    down_rows = rows.add('EnforceReserveDownRequirements', [(-1.0, total_demand), (-1.0, reserve_mismatch)], lower=-reserve_down, upper=-reserve_down)
+    rows.rows.extend([np.tile(up_rows, G), np.tile(down_rows, G)])
+    rows.cols.extend([pmax_available.ravel(), pmin_available.ravel()])
+    rows.vals.extend([np.ones(G * T), np.ones(G * T)])
+
+    # Zonal reserves
+    zonal_data = ZonalDataComplete['zonalData'] if ZonalDataComplete is not None else dict()
+    if zonal_data.get('HasZonalReserves', False) is True:
+        for z in zonal_data['Zones']:
+            zone_buses = arrays.bus_names.get_indexer(pd.Index(ZonalDataComplete['zonalBusData'][z]))
+            zone_generators = np.flatnonzero(np.isin(arrays.gen_bus, zone_buses))
+            zone_demand = demand[zone_buses].sum(axis=0)
+            rows.add('EnforceZonalReserveDownRequirements[{}]'.format(z), [(1.0, pmin_available[zone_generators].T)],
+                     upper=(1 - ZonalDataComplete['ReserveDownZonalPercent'][z]) * zone_demand, shape=(T, ))
+            rows.add('EnforceZonalReserveUpRequirements[{}]'.format(z), [(1.0, pmax_available[zone_generators].T)],
+                     lower=(1 + ZonalDataComplete['ReserveUpZonalPercent'][z]) * zone_demand, shape=(T, ))
+
+    # Generator output limits
+    rows.add('EnforceGeneratorOutputLimitsPartA', [(1.0, pmin_available), (-1.0, pg)], upper=0.0)
+    rows.add('EnforceGeneratorOutputLimitsPartB', [(1.0, pg), (-1.0, pmax_available)], upper=0.0)
+    rows.add('EnforceGeneratorOutputLimitsPartC', [(1.0, pmax_available), (-pmax[:, None], u)], upper=0.0)
+    rows.add('EnforceGeneratorOutputLimitsPartD', [(1.0, pmin_available), (-pmin[:, None], u)], lower=0.0)
+
+    # Ramping; the first period is coupled to the initial conditions
+    def c(a):
+        return a[:, None]
+
+    rows.add('EnforceMaxAvailableRampUpRates[0]',
+             [(1.0, pmax_available[:, 0]), (-1.0, pg0), (pmax - su, u[:, 0])],
+             upper=nru * u0 - su * u0 + pmax)
+    rows.add('EnforceMaxAvailableRampUpRates',
+             [(1.0, pmax_available[:, 1:]), (-1.0, pg[:, :-1]), (c(su - nru), u[:, :-1]), (c(pmax - su), u[:, 1:])],
+             upper=c(pmax))
+    rows.add('EnforceMaxAvailableRampDownRates[0]',
+             [(1.0, pmax_available[:, 0]), (sd - pmax, u[:, 0])],
+             upper=sd * u0)
+    rows.add('EnforceMaxAvailableRampDownRates',
+             [(1.0, pmax_available[:, :-1]), (c(-sd), u[:, :-1]), (c(sd - pmax), u[:, 1:])],
+             upper=0.0)
+    rows.add('EnforceNominalRampDownLimits[0]',
+             [(1.0, pg0), (-1.0, pmin_available[:, 0]), (sd - nrd, u[:, 0])],
+             upper=sd * u0 + pmax * (1 - u0))
+    rows.add('EnforceNominalRampDownLimits',
+             [(1.0, pg[:, :-1]), (-1.0, pmin_available[:, 1:]), (c(sd - nrd), u[:, 1:]), (c(pmax - sd), u[:, :-1])],
+             upper=c(pmax))
+    rows.add('EnforceNominalRampUpLimits[0]',
+             [(1.0, pg0), (-1.0, pg[:, 0]), (nru - su, u[:, 0])],
+             lower=-su * u0 - pmax * (1 - u0))
+    rows.add('EnforceNominalRampUpLimits',
+             [(1.0, pg[:, :-1]), (-1.0, pg[:, 1:]), (c(nru - su), u[:, 1:]), (c(su - pmax), u[:, :-1])],
+             lower=c(-pmax))
+
+    # Minimum up and down times
+    _minimum_time_rows(rows, u, u0, online, ut, T, up=True)
+    _minimum_time_rows(rows, u, u0, offline, dt, T, up=False)
+
+    # Start up and shut down costs
+    ccost, hcost = arrays.cold_start_cost, arrays.hot_start_cost
+    for g in range(G):
+        t = np.flatnonzero(~hot_fixed[g])
+        csh = cold_start_hours[g]
+        window = _window(np.where(t <= csh, 1, t - csh), t, T)
+        previous = np.where(window >= 0, u[g][np.maximum(window, 0)], -1)
+        rows.add('ComputeHotStart', [(1.0, hot[g, t][:, None]), (-1.0, previous)], upper=0.0, shape=t.shape)
+    rows.add('ComputeStartupCostsMinusM[0]',
+             [(1.0, startup[:, 0]), (ccost - hcost, hot[:, 0]), (-ccost, u[:, 0])],
+             lower=-ccost * u0)
+    rows.add('ComputeStartupCostsMinusM',
+             [(1.0, startup[:, 1:]), (c(ccost - hcost), hot[:, 1:]), (c(-ccost), u[:, 1:]), (c(ccost), u[:, :-1])],
+             lower=0.0)
+    coefficient = arrays.shutdown_cost_coefficient
+    rows.add('ComputeShutdownCosts[0]', [(1.0, shutdown[:, 0]), (coefficient, u[:, 0])], lower=coefficient * u0)
+    rows.add('ComputeShutdownCosts', [(1.0, shutdown[:, 1:]), (c(-coefficient), u[:, :-1]), (c(coefficient), u[:, 1:])], lower=0.0)
+
+    # Production costs as the epigraph of the convex piecewise linear curves
+    for g in range(G):
+        slope = time_period_length * slopes[g][:, None]
+        intercept = time_period_length * intercepts[g][:, None]
+        rows.add('ComputeProductionCosts', [(1.0, production[g][None, :]), (-slope, pg[g][None, :])], lower=intercept)
+
+    # Objective
+    objective = np.zeros(columns.size)
+    objective[production] = 1.0
+    objective[startup] = 1.0
+    objective[shutdown] = 1.0
+    objective[u] = c(minimum_production_cost * time_period_length)
+    objective[pos_mismatch] = case.PositiveMismatchPenalty * time_period_length
+    objective[neg_mismatch] = case.NegativeMismatchPenalty * time_period_length
+    objective[pos_reserve_mismatch] = case.PositiveMismatchPenalty * time_period_length
+    objective[neg_reserve_mismatch] = case.NegativeMismatchPenalty * time_period_length
+
+    A = sp.csr_matrix((_concatenate(rows.vals), (_concatenate(rows.rows, int), _concatenate(rows.cols, int))),
+                      shape=(rows.size, columns.size))
+
+    return SCUCMatrices(A=A,
+                        row_lower=_concatenate(rows.lower),
+                        row_upper=_concatenate(rows.upper),
+                        c=objective,
+                        col_lower=_concatenate(columns.lower),
+                        col_upper=_concatenate(columns.upper),
+                        integrality=_concatenate(columns.integrality, int),
+                        columns=columns.blocks,
+                        rows=rows.blocks)
+
+
+class SCUCMatrices(object):
+    ''' Sparse form of the SCUC
+
+    ``columns`` and ``rows`` map each variable and constraint name of the Pyomo model to the array of
+    column or row positions it occupies, so that solutions can be read back without variable labels.
+    '''
+
+    def __init__(self, A, row_lower, row_upper, c, col_lower, col_upper, integrality, columns, rows):
+        self.A = A
+        self.row_lower = row_lower
+        self.row_upper = row_upper
+        self.c = c
+        self.col_lower = col_lower
+        self.col_upper = col_upper
+        self.integrality = integrality
+        self.columns = columns
+        self.rows = rows
+        self.x = None
+        self.objective = None
+        self.status = None
+
+    def __repr__(self):
+        repr_string = 'Variables={}, Constraints={}, NonZeros={}'.format(self.A.shape[1], self.A.shape[0], self.A.nnz)
+        return '<{}.{}({})>'.format(self.__class__.__module__, self.__class__.__name__, repr_string)
+
+    def solve(self, mipgap=0.01, time_limit=None, verbose=False):
+        ''' Solves the problem with scipy.optimize.milp (HiGHS) and returns the objective value '''
+        from scipy.optimize import milp, Bounds, LinearConstraint
+
+        options = {'mip_rel_gap': mipgap, 'disp': verbose}
+        if time_limit is not None:
+            options['time_limit'] = time_limit
+
+        result = milp(self.c,
+                      integrality=self.integrality,
+                      bounds=Bounds(self.col_lower, self.col_upper),
+                      constraints=LinearConstraint(self.A, self.row_lower, self.row_upper),
+                      options=options)
+
+        self.status = result.message
+        if result.x is None:
+            raise ValueError('Unable to solve the SCUC: {}'.format(result.message))
+
+        self.x = result.x
+        self.objective = result.fun
+        return self.objective
+
+    def get(self, name):
+        ''' Returns the solution values of a variable as a DataFrame indexed by time period '''
+        if self.x is None:
+            raise AttributeError('The problem has not been solved')
+        positions, index = self.columns[name]
+        values = self.x[positions]
+        if len(index) == 1:
+            return pd.Series(values, index=index[0], name=name)
+        return pd.DataFrame(values.T, index=index[1], columns=index[0])
+
+    @property
+    def unit_commitment(self):
+        return self.get('UnitOn').round().astype(int)
+
+    @property
+    def power_generated(self):
+        return self.get('PowerGenerated')
+
+    def write_mps(self, filename):
+        ''' Writes the problem in free MPS format; columns are named x<n> and rows c<n> '''
+        A = self.A.tocsc()
+        lower, upper = self.row_lower, self.row_upper
+
+        equal = lower == upper
+        ranged = np.isfinite(lower) & np.isfinite(upper) & ~equal
+        greater = np.isfinite(lower) & ~np.isfinite(upper)
+        kind = np.where(equal, 'E', np.where(greater, 'G', 'L'))
+        rhs = np.where(equal | greater | ranged, lower, upper)
+        kind[ranged] = 'G'
+        if (~np.isfinite(lower) & ~np.isfinite(upper)).any():
+            raise ValueError('Free rows are not supported')
+
+        with open(filename, 'w') as f:
+            f.write('NAME PSST\nROWS\n N obj\n')
+            f.writelines(' {} c{}\n'.format(k, i) for i, k in enumerate(kind))
+
+            f.write('COLUMNS\n')
+            integer = False
+            for j in range(A.shape[1]):
+                if bool(self.integrality[j]) is not integer:
+                    integer = bool(self.integrality[j])
+                    f.write(' MARKER \'MARKER\' {}\n'.format('\'INTORG\'' if integer else '\'INTEND\''))
+                if self.c[j] != 0:
+                    f.write(' x{} obj {:.17g}\n'.format(j, self.c[j]))
+                start, stop = A.indptr[j], A.indptr[j + 1]
+                f.writelines(' x{} c{} {:.17g}\n'.format(j, i, v) for i, v in zip(A.indices[start:stop], A.data[start:stop]))
+                if start == stop and self.c[j] == 0:
+                    f.write(' x{} obj 0\n'.format(j))
+            if integer:
+                f.write(' MARKER \'MARKER\' \'INTEND\'\n')
+
+            f.write('RHS\n')
+            f.writelines(' rhs c{} {:.17g}\n'.format(i, v) for i, v in enumerate(rhs) if v != 0)
+
+            if ranged.any():
+                f.write('RANGES\n')
+                f.writelines(' rng c{} {:.17g}\n'.format(i, upper[i] - lower[i]) for i in np.flatnonzero(ranged))
+
+            f.write('BOUNDS\n')
+            for j, (l, u) in enumerate(zip(self.col_lower, self.col_upper)):
+                if l == u:
+                    f.write(' FX bnd x{} {:.17g}\n'.format(j, l))
+                    continue
+                if l == -np.inf:
+                    f.write(' MI bnd x{}\n'.format(j) if u != np.inf else ' FR bnd x{}\n'.format(j))
+                elif l != 0 or self.integrality[j]:
+                    f.write(' LO bnd x{} {:.17g}\n'.format(j, l))
+                if u != np.inf:
+                    f.write(' UP bnd x{} {:.17g}\n'.format(j, u))
+            f.write('ENDATA\n')
+
+
+def _minimum_time_rows(rows, u, u0, initial, minimum_time, T, up=True):
+    # Mirrors enforce_{up,down}_time_constraints_{initial,subsequent}. For down times the sums run over
+    # (1 - UnitOn), which flips the signs and moves the window size to the right hand side.
+    name = 'EnforceUpTimeConstraints' if up else 'EnforceDownTimeConstraints'
+    sign = 1.0 if up else -1.0
+
+    for g in np.flatnonzero(initial > 0):
+        fixed = float(initial[g]) if up else 0.0
+        rows.add(name + 'Initial', [(1.0, u[g, :initial[g]])], lower=fixed, upper=fixed, shape=())
+
+    for g in np.flatnonzero(minimum_time > 0):
+        t = np.arange(initial[g], T)
+        if len(t) == 0:
+            continue
+        regular = t <= T - minimum_time[g] + 1
+        weight = np.where(regular, minimum_time[g], T - t).astype(float)
+        window = _window(t, np.where(regular, t + minimum_time[g], T), T)
+        size = (window >= 0).sum(axis=1).astype(float)
+        columns = np.where(window >= 0, u[g][np.maximum(window, 0)], -1)
+        # In period 0 the previous status is the constant UnitOnT0, which moves to the right hand side
+        previous = np.where(t > 0, u[g][np.maximum(t - 1, 0)], -1)
+        constant = np.where(t == 0, sign * weight * u0[g], 0.0)
+        rows.add(name + 'Subsequent',
+                 [(sign, columns), (-sign * weight[:, None], u[g][t][:, None]), (sign * weight[:, None], previous[:, None])],
+                 lower=(0.0 if up else -size) - constant, shape=t.shape)
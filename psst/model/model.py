@@ -40,7 +40,9 @@ def initialize_model(model,
                     time_period_length=1.0,
                     stage_set=['FirstStage', 'SecondStage'],
                     positive_mismatch_penalty=1e5,
-                    negative_mismatch_penalty=1e5
+                    negative_mismatch_penalty=1e5,
+                    line_flow_variables=True,
+                    lean=False
                     ):
 
     model.CostCurveType = Param(mutable=True)
@@ -57,10 +59,12 @@ def initialize_model(model,
                                      initialize={'FirstStage': list(),
                                                 'SecondStage': model.TimePeriods})
 
-    model.CommitmentStageCost = Var(model.StageSet, within=NonNegativeReals)
-    model.GenerationStageCost = Var(model.StageSet, within=NonNegativeReals)
+    # lean models write the stage costs directly into the objective
+    if lean is not True:
+        model.CommitmentStageCost = Var(model.StageSet, within=NonNegativeReals)
+        model.GenerationStageCost = Var(model.StageSet, within=NonNegativeReals)
 
-    model.StageCost = Var(model.StageSet, within=NonNegativeReals)
+        model.StageCost = Var(model.StageSet, within=NonNegativeReals)
 
     # model.TotalLoadBenefit = Var(within=NonNegativeReals, initialize=0)
 
@@ -69,8 +73,10 @@ def initialize_model(model,
     # indicator variables for each generator, at each time period.
     model.UnitOn = Var(model.Generators, model.TimePeriods, within=Binary, initialize=1) #previously initialised to 1.
 
-    # amount of power flowing along each line, at each time period
-    model.LinePower = Var(model.TransmissionLines, model.TimePeriods, initialize=0)
+    # amount of power flowing along each line, at each time period. PTDF models express the flows in terms of
+    # NetPowerInjectionAtBus instead and have neither LinePower nor Angle
+    if line_flow_variables is True:
+        model.LinePower = Var(model.TransmissionLines, model.TimePeriods, initialize=0)
 
     model.NetPowerInjectionAtBus = Var(model.Buses, model.TimePeriods, initialize=0)
 
@@ -101,7 +107,8 @@ def initialize_model(model,
     model.MinimumPowerAvailable = Var(model.Generators, model.TimePeriods, within=NonNegativeReals)
 
     # voltage angles at the buses (S) (lock the first bus at 0) in radians
-    model.Angle = Var(model.Buses, model.TimePeriods, within=Reals, bounds=(-3.14159265,3.14159265))
+    if line_flow_variables is True:
+        model.Angle = Var(model.Buses, model.TimePeriods, within=Reals, bounds=(-3.14159265,3.14159265))
 
     ###################
     # cost components #
@@ -121,14 +128,26 @@ def initialize_model(model,
     # Load Mismatch #
     #################
 
-    model.LoadGenerateMismatch = Var(model.Buses, model.TimePeriods, within = Reals, initialize=0)
     model.posLoadGenerateMismatch = Var(model.Buses, model.TimePeriods, within = NonNegativeReals, initialize=0)
     model.negLoadGenerateMismatch = Var(model.Buses, model.TimePeriods, within = NonNegativeReals, initialize=0)
 
-    model.GlobalReserveMismatch = Var(model.TimePeriods, within = Reals, initialize=0)
     model.posGlobalReserveMismatch = Var(model.TimePeriods, within = NonNegativeReals, initialize=0)
     model.negGlobalReserveMismatch = Var(model.TimePeriods, within = NonNegativeReals, initialize=0)
 
+    if lean is True:
+        # The mismatch is the difference of its nonnegative parts, which needs no defining constraints
+        def load_generate_mismatch_rule(m, b, t):
+            return m.posLoadGenerateMismatch[b, t] - m.negLoadGenerateMismatch[b, t]
+
+        def global_reserve_mismatch_rule(m, t):
+            return m.posGlobalReserveMismatch[t] - m.negGlobalReserveMismatch[t]
+
+        model.LoadGenerateMismatch = Expression(model.Buses, model.TimePeriods, rule=load_generate_mismatch_rule)
+        model.GlobalReserveMismatch = Expression(model.TimePeriods, rule=global_reserve_mismatch_rule)
+    else:
+        model.LoadGenerateMismatch = Var(model.Buses, model.TimePeriods, within = Reals, initialize=0)
+        model.GlobalReserveMismatch = Var(model.TimePeriods, within = Reals, initialize=0)
+
     # model.GlobalLoadGenerateMismatch = Var(model.TimePeriods, within = Reals, initialize=0)
     # model.posGlobalLoadGenerateMismatch = Var(model.TimePeriods, within = NonNegativeReals, initialize=0)
     # model.negGlobalLoadGenerateMismatch = Var(model.TimePeriods, within = NonNegativeReals, initialize=0)
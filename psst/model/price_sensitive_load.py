@@ -1,6 +1,7 @@
 # Copyright (c) 2020, Battelle Memorial Institute
 # Copyright 2007 - present: numerous others credited in AUTHORS.rst
 
+import numpy as np
 from pyomo.environ import *
 
 def initialize_price_senstive_load(model,
@@ -42,57 +43,50 @@ def initialize_load_demand(model):
     model.PSLoadDemand = Var(model.PriceSensitiveLoads, model.TimePeriods, within=NonNegativeReals, bounds=demand_bounds_rule)
     model.LoadBenefit = Var(model.PriceSensitiveLoads, model.TimePeriods, within=NonNegativeReals)
 
-def load_benefit(model):
-
-    model.LoadDemandPiecewisePoints = {}
-    model.LoadDemandPiecewiseValues = {}
-    for l in model.PriceSensitiveLoads:
-        for t in model.TimePeriods:
-            load_demand_piecewise_points_rule(model, l, t)
-
-def load_demand_piecewise_points_rule(m, l, t):
-    if len(m.BenefitPiecewisePoints[l,t]) > 0:
-        m.LoadDemandPiecewisePoints[l,t] = list(m.BenefitPiecewisePoints[l,t])
-        temp = list(m.BenefitPiecewiseValues[l,t])
-        m.LoadDemandPiecewiseValues[l,t] = {}
-        for i in range(len(m.BenefitPiecewisePoints[l,t])):
-            m.LoadDemandPiecewiseValues[l,t][m.LoadDemandPiecewisePoints[l,t][i]] = temp[i]
-        # MinimumPowerOutput will be one of our piecewise points, so it is safe to add (0,0)
-        # TODO: we need to check if this applies to price sensitive loads
-        if m.BenefitPiecewisePoints[l,t][0] != 0:
-            m.BenefitPiecewisePoints[l,t].insert(0,0)
-        m.BenefitPiecewiseValues[l,t][0] = 0
-    elif value(m.BenifitCoefficientC2[l,t]) == 0:
-        # If cost is linear, we only need two points -- (0,CostA0-MinCost) and (MaxOutput, MaxCost)
-        m.BenefitPiecewiseValues[l, t] = [value(m.MinimumPowerDemand[l]), value(m.MaximumPowerDemand[l])]
-        m.BenefitPiecewiseValues[l,t] = {}
-        m.BenefitPiecewiseValues[l,t][0] = value(m.BenifitCoefficientC0[l,t])
-        m.BenefitPiecewiseValues[l,t][m.BenefitPiecewisePoints[l,t][1]] = \
-                value(m.BenifitCoefficientC0[l,t]) + \
-                value(m.BenifitCoefficientC1[l,t]) * m.BenefitPiecewisePoints[l, t][1]
-    else:
-        min_power = value(m.MinimumPowerDemand[l])
-        max_power = value(m.MaximumPowerDemand[l])
-        # TODO: we need to find where this is coming from since builder.py is not used
-        n = value(m.NumGeneratorCostCurvePieces)
-        #click.echo("In generators.py n: " + str(n))
-        width = (max_power - min_power) / float(n)
-        if width == 0:
-            m.BenefitPiecewisePoints[l, t] = [min_power]
-        else:
-            m.BenefitPiecewisePoints[l, t] = [min_power + i*width for i in range(0,n+1)]
-            # NOTE: due to numerical precision limitations, the last point in the x-domain
-            #       of the generation piecewise cost curve may not be precisely equal to the
-            #       maximum power output level of the generator. this can cause Piecewise to
-            #       sqawk, as it would like the upper bound of the variable to be represented
-            #       in the domain. so, we will make it so.
-            m.BenefitPiecewisePoints[l, t][-1] = max_power
-        m.BenefitPiecewiseValues[l,t] = {}
-        for i in range(n+1):
-            m.BenefitPiecewiseValues[l,t][m.BenefitPiecewisePoints[l,t][i]] = \
-                       value(m.BenifitCoefficientC0[l,t]) + \
-                       value(m.BenifitCoefficientC1[l,t]) * m.BenefitPiecewisePoints[l, t][i] + \
-                       value(m.BenifitCoefficientC2[l,t]) * m.BenefitPiecewisePoints[l, t][i]**2
-        if m.BenefitPiecewisePoints[l, t][0] != 0:
-            m.BenefitPiecewisePoints[l, t].insert(0,0)
-            m.BenefitPiecewiseValues[l, t][0] = 0
+def benefit_curves(price_sensitive_load_data, segments=5):
+    ''' Returns the (name, hour) keys of price_sensitive_load_data and the (key, segments) arrays of breakpoints and benefits
+
+    Breakpoints are evenly spaced between Pmin and Pmax and benefits follow d + e * p + f * p ** 2.
+    '''
+    keys = list(price_sensitive_load_data)
+    records = [price_sensitive_load_data[k] for k in keys]
+    pmin, pmax, d, e, f = (np.array([r[c] for r in records], dtype=float) for c in ['Pmin', 'Pmax', 'd', 'e', 'f'])
+    points = np.linspace(pmin, pmax, num=int(segments), axis=1)
+    values = d[:, None] + e[:, None] * points + f[:, None] * points ** 2
+    return keys, points, values
+
+
+def benefit_segments(points, values, tolerance=1e-6):
+    ''' Returns the (intercepts, slopes) of every segment of the rows of (points, values) and which rows are concave
+
+    Zero width segments get a zero slope, so a load with Pmin == Pmax is bounded by its single benefit value.
+    '''
+    points = np.asarray(points, dtype=float)
+    values = np.asarray(values, dtype=float)
+    width = np.diff(points, axis=1)
+    rise = np.diff(values, axis=1)
+    slopes = np.divide(rise, width, out=np.zeros(rise.shape), where=width > 0)
+    intercepts = values[:, :-1] - slopes * points[:, :-1]
+    concave = np.all(np.diff(slopes, axis=1) <= tolerance * np.maximum(1, np.abs(slopes[:, 1:])), axis=1)
+    return intercepts, slopes, concave
+
+
+def demand_bounds(price_sensitive_load_data, bus_index, time_periods):
+    ''' Returns the bus position and the (load, time) minimum and maximum demand of every (load, bus) pair
+
+    Periods without data have no demand, as the MinimumPowerDemand and MaximumPowerDemand defaults.
+    '''
+    periods = {t: j for j, t in enumerate(time_periods)}
+    loads = list(dict.fromkeys((name, record['atBus']) for (name, hour), record in price_sensitive_load_data.items()))
+    names = list(dict.fromkeys(name for name, bus in loads))
+    rows = {name: i for i, name in enumerate(names)}
+    minimum = np.zeros((len(names), len(time_periods)))
+    maximum = np.zeros((len(names), len(time_periods)))
+    for (name, hour), record in price_sensitive_load_data.items():
+        if hour in periods:
+            minimum[rows[name], periods[hour]] = record['Pmin']
+            maximum[rows[name], periods[hour]] = record['Pmax']
+    # a load at several buses withdraws its demand at each of them
+    index = [rows[name] for name, bus in loads]
+    return np.array([bus_index[bus] for name, bus in loads], dtype=int), minimum[index], maximum[index]
+
@@ -0,0 +1,113 @@
+# Copyright (c) 2020, Battelle Memorial Institute
+# Copyright 2007 - present: numerous others credited in AUTHORS.rst
+
+import logging
+import time
+import tracemalloc
+
+import pandas as pd
+
+from pyomo.environ import Var, Constraint, Block
+from pyomo.core.expr.visitor import identify_variables
+
+logger = logging.getLogger(__name__)
+
+
+class BuildReport(object):
+    ''' Per-stage construction report of build_model
+
+    ``begin(name)`` closes the running stage and starts a new one, ``end()`` closes the last one. Every stage
+    records its wall time, the peak memory allocated while it ran and the number of variables, constraints
+    and constraint nonzeros it added to the model. Memory tracing slows the build down, so the report is
+    opt-in; when disabled, both calls do nothing.
+    '''
+
+    columns = ['time', 'memory', 'variables', 'constraints', 'nonzeros']
+
+    def __init__(self, model, enabled=True):
+        self._model = model
+        self.enabled = enabled
+        self._stages = list()
+        self._running = None
+        self._started_tracing = False
+
+    def __repr__(self):
+        repr_string = 'stages={}'.format(len(self._stages))
+        return '<{}.{}({})>'.format(self.__class__.__module__, self.__class__.__name__, repr_string)
+
+    def __str__(self):
+        return self.to_string()
+
+    def begin(self, name):
+        if self.enabled is False:
+            return
+        self.end()
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        existing = set(id(c) for c in self._model.component_objects(descend_into=False))
+        tracemalloc.reset_peak()
+        memory, _ = tracemalloc.get_traced_memory()
+        self._running = (name, existing, memory, time.perf_counter())
+
+    def end(self):
+        if self._running is None:
+            return
+
+        name, existing, memory, start = self._running
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        added = [c for c in self._model.component_objects(descend_into=False) if id(c) not in existing]
+        variables, constraints, nonzeros = _count(added)
+        self._running = None
+
+        self._stages.append((name, elapsed, peak - memory, variables, constraints, nonzeros))
+        logger.debug('Stage {} took {:.4f} s and added {} variables, {} constraints and {} nonzeros'.format(
+            name, elapsed, variables, constraints, nonzeros))
+
+        if self._started_tracing is True:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @property
+    def stages(self):
+        ''' Returns the report as a DataFrame indexed by stage; time is in seconds and memory in bytes '''
+        df = pd.DataFrame([s[1:] for s in self._stages], index=[s[0] for s in self._stages], columns=self.columns)
+        df.index.name = 'stage'
+        return df
+
+    @property
+    def total(self):
+        return self.stages.sum()
+
+    def to_string(self):
+        df = self.stages
+        df.loc['total'] = df.sum()
+        df[['variables', 'constraints', 'nonzeros']] = df[['variables', 'constraints', 'nonzeros']].astype(int)
+        df['memory'] = df['memory'] / 2 ** 20
+        return df.rename(columns={'time': 'time [s]', 'memory': 'memory [MiB]'}).to_string(
+            formatters={'time [s]': '{:.4f}'.format, 'memory [MiB]': '{:.2f}'.format})
+
+
+def _count(components):
+    variables = 0
+    constraints = 0
+    nonzeros = 0
+    for component in components:
+        if component.ctype is Var:
+            variables = variables + len(component)
+            continue
+        if component.ctype is Constraint:
+            data = list(component.values())
+        elif component.ctype is Block:
+            blocks = list(component.values())
+            variables = variables + sum(1 for b in blocks for _ in b.component_data_objects(Var, descend_into=True))
+            data = [c for b in blocks for c in b.component_data_objects(Constraint, descend_into=True)]
+        else:
+            continue
+        for c in data:
+            constraints = constraints + 1
+            nonzeros = nonzeros + sum(1 for _ in identify_variables(c.body))
+    return variables, constraints, nonzeros
@@ -50,6 +50,13 @@ def initialize_global_reserves(model, ReserveDownSystemPercent=None, ReserveUpSy
     model.ReserveDownRequirement = Param(model.TimePeriods, initialize=reserve_down_requirement, within=NonNegativeReals, default=0.0, mutable=True)
 
 
+def update_global_reserves(model, reserve_up_requirement=_reserve_up_requirement_rule, reserve_down_requirement=_reserve_down_requirement_rule):
+    # Recomputes the requirements after the demand has been changed
+    for t in model.TimePeriods:
+        model.ReserveUpRequirement[t] = reserve_up_requirement(model, t)
+        model.ReserveDownRequirement[t] = reserve_down_requirement(model, t)
+
+
 def initialize_regulating_reserves(model):
     model.RegulatingReserveUpAvailable = Var(model.Generators, model.TimePeriods, initialize=0.0, within=NonNegativeReals)
 
@@ -0,0 +1,114 @@
+# Copyright (c) 2020, Battelle Memorial Institute
+# Copyright 2007 - present: numerous others credited in AUTHORS.rst
+
+import logging
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from pyomo.environ import value
+
+from . import PSSTModelTemplate
+from .generators import initial_state_from_commitment
+
+logger = logging.getLogger(__name__)
+
+
+RollingWindow = namedtuple('RollingWindow', ['start', 'periods', 'status', 'objective',
+                                             'unit_commitment', 'power_generated', 'initial_state'])
+
+
+class PSSTRollingHorizon(object):
+    ''' Solves a long load time series as a sequence of overlapping unit commitment windows
+
+    Every window covers ``window + look_ahead`` periods and commits the first ``window`` of them. The
+    commitment and output of the last committed period become UnitOnT0State and PowerGeneratedT0 of the
+    next window; run lengths are carried forward, so minimum up and down times hold across windows.
+    The model is built once as a PSSTModelTemplate and updated for every window. Look-ahead periods past
+    the end of the series repeat its last load.
+    '''
+
+    def __init__(self, case, load_df=None, window=24, look_ahead=12, ZonalDataComplete=None, PriceSenLoadData=None, config=None):
+
+        if load_df is None:
+            load_df = case.load
+
+        self.case = case
+        self.load = load_df.reset_index(drop=True)
+        self.window = window
+        self.look_ahead = look_ahead
+        self.horizon = window + look_ahead
+        self.gen_status = getattr(case, 'gen_status', None)
+
+        self._template = PSSTModelTemplate(case, config=config, load_df=self._window_load(0),
+                                           ZonalDataComplete=ZonalDataComplete, PriceSenLoadData=PriceSenLoadData)
+        # PowerGeneratedT0 is left free in the first window, as in build_model
+        self._initial_state = pd.DataFrame({'UnitOnT0State': case.gen['UnitOnT0State'].astype(float)})
+        self.initial_state = self._initial_state
+
+    def __repr__(self):
+        repr_string = 'periods={}, window={}, look_ahead={}'.format(len(self.load.index), self.window, self.look_ahead)
+        return '<{}.{}({})>'.format(self.__class__.__module__, self.__class__.__name__, repr_string)
+
+    @property
+    def template(self):
+        return self._template
+
+    def _window_load(self, start):
+        positions = np.minimum(np.arange(start, start + self.horizon), len(self.load.index) - 1)
+        return self.load.iloc[positions].reset_index(drop=True)
+
+    def _window_status(self, start):
+        if self.gen_status is None:
+            return None
+        status = self.gen_status.reset_index(drop=True).reindex(range(start, start + self.horizon))
+        return status.reset_index(drop=True)
+
+    def run(self, **kwargs):
+        ''' Solves the windows in order and yields a RollingWindow for each of them
+
+        Keyword arguments are passed to PSSTModel.solve. unit_commitment and power_generated only cover the
+        committed periods and are indexed by position in the load series.
+        '''
+        periods = len(self.load.index)
+        model = self._template.model._model
+        time_period_length = self.case.TimePeriodLength
+
+        self.initial_state = self._initial_state
+        model.PowerGeneratedT0.unfix()
+
+        for start in range(0, periods, self.window):
+            committed = min(self.window, periods - start)
+
+            self._template.update(load_df=self._window_load(start), gen_status=self._window_status(start),
+                                  initial_state=self.initial_state)
+            _, status = self._template.solve(**kwargs)
+
+            index = pd.RangeIndex(start, start + committed)
+            generators = list(model.Generators)
+            unit_commitment = pd.DataFrame([[value(model.UnitOn[g, t]) for g in generators] for t in range(committed)],
+                                           index=index, columns=generators).round().astype(int)
+            power_generated = pd.DataFrame([[value(model.PowerGenerated[g, t]) for g in generators] for t in range(committed)],
+                                           index=index, columns=generators)
+
+            initial_state = pd.DataFrame({
+                'UnitOnT0State': initial_state_from_commitment(unit_commitment, previous_state=self.initial_state['UnitOnT0State'],
+                                                               time_period_length=time_period_length),
+                'PowerGeneratedT0': power_generated.iloc[-1].clip(lower=0),
+            })
+            self.initial_state = initial_state
+
+            objective = value(model.TotalCostObjective)
+            logger.info('Solved periods {} to {} with status {} and objective {}'.format(start, start + committed - 1, status, objective))
+
+            yield RollingWindow(start=start, periods=committed, status=status, objective=objective,
+                                unit_commitment=unit_commitment, power_generated=power_generated,
+                                initial_state=initial_state)
+
+    def solve(self, **kwargs):
+        ''' Solves every window and returns the stitched (unit_commitment, power_generated) frames '''
+        windows = list(self.run(**kwargs))
+        unit_commitment = pd.concat([w.unit_commitment for w in windows])
+        power_generated = pd.concat([w.power_generated for w in windows])
+        return unit_commitment, power_generated
@@ -0,0 +1,168 @@
+# Copyright (c) 2020, Battelle Memorial Institute
+# Copyright 2007 - present: numerous others credited in AUTHORS.rst
+
+''' Row and slack column scaling of the constraint matrix
+
+``scale_constraints`` multiplies every linear constraint by the power of two closest to the inverse of the
+geometric mean of its largest and smallest coefficient, which centers the coefficients of every row around
+one. Powers of two are exact in floating point, so the scaled model has the same solutions. The factors are
+kept in the ``RowScaling`` suffix, which ``PSSTResults`` uses to return the duals in the units of the original
+constraints. Constraints added after scaling, such as lazy line limits, are left unscaled.
+
+Row scaling cannot narrow the range within a row. The mismatch slacks are priced at the mismatch penalty in the
+stage cost rows, next to the unit coefficients of the production costs, so their columns are scaled first, by
+the same rule: a slack variable then holds its value divided by the factor kept in the ``ColumnScaling``
+suffix, which ``PSSTResults`` multiplies back.
+'''
+
+import logging
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from pyomo.core.expr.visitor import replace_expressions
+from pyomo.environ import Expression, Objective, Suffix, Var
+from pyomo.repn.plugins.standard_form import LinearStandardFormCompiler
+from pyomo.repn.standard_repn import generate_standard_repn
+
+logger = logging.getLogger(__name__)
+
+# Slack variables whose columns are scaled, the other variables keep their units
+SLACK_VARIABLES = ('posLoadGenerateMismatch', 'negLoadGenerateMismatch', 'posGlobalReserveMismatch', 'negGlobalReserveMismatch')
+
+
+def _range(values):
+    values = np.absolute(np.asarray(values, dtype=float))
+    values = values[(values > 0) & np.isfinite(values)]
+    if len(values) == 0:
+        return np.nan, np.nan
+    return values.min(), values.max()
+
+
+def _linear_rows(model):
+    # (constraint of every row, CSR matrix, right hand sides, variable of every column) of the active linear
+    # constraints, compiled in one pass; fixed variables are treated as constants, as they are when the model is
+    # written for the solver. Ranged constraints have a row for each bound. The objective may be quadratic, so it is left out of the compilation
+    objectives = list(model.component_data_objects(Objective, active=True, descend_into=True))
+    for o in objectives:
+        o.deactivate()
+    try:
+        repn = LinearStandardFormCompiler().write(model, mixed_form=True)
+    finally:
+        for o in objectives:
+            o.activate()
+    return [r.constraint for r in repn.rows], sp.csr_matrix(repn.A), np.asarray(repn.rhs, dtype=float), list(repn.columns)
+
+
+def _row_factors(matrix):
+    # Power of two closest to the inverse of the geometric mean of the largest and smallest coefficient of every row
+    magnitudes = sp.csr_matrix(abs(matrix))
+    magnitudes.eliminate_zeros()
+    nonempty = np.diff(magnitudes.indptr) > 0
+    starts = magnitudes.indptr[:-1][nonempty]
+    exponent = np.zeros(matrix.shape[0])
+    if len(starts) > 0:
+        product = np.minimum.reduceat(magnitudes.data, starts) * np.maximum.reduceat(magnitudes.data, starts)
+        exponent[nonempty] = -np.round(np.log2(product) / 2)
+    return 2.0 ** exponent
+
+
+def _column_factors(matrix, columns):
+    # Factors of the slack columns by the rule of the rows, one for the other columns
+    factors = _row_factors(matrix.T)
+    slack = np.array([v.parent_component().local_name in SLACK_VARIABLES for v in columns], dtype=bool)
+    factors[~slack] = 1.0
+    return factors
+
+
+def _substitute(expr, substitution):
+    # The named expressions are substituted in place, so they are not descended into
+    return replace_expressions(expr, substitution, descend_into_named_expressions=False, remove_named_expressions=False)
+
+
+def _table(matrix, rhs, objective, bounds):
+    ranges = [_range(matrix), _range(rhs), _range(objective), _range(bounds)]
+    return pd.DataFrame(ranges, index=['matrix', 'rhs', 'objective', 'bounds'], columns=['min', 'max'])
+
+
+def _objective_and_bounds(model):
+    objective = list()
+    for o in model.component_data_objects(Objective, active=True, descend_into=True):
+        repn = generate_standard_repn(o.expr, compute_values=True, quadratic=True)
+        objective.extend(repn.linear_coefs)
+        objective.extend(repn.quadratic_coefs)
+    bounds = [b for v in model.component_data_objects(Var, descend_into=True) if not v.fixed for b in v.bounds if b is not None]
+    return objective, bounds
+
+
+def coefficient_ranges(model):
+    ''' Returns the smallest and largest absolute nonzero matrix, right hand side, objective and bound values '''
+    constraints, matrix, rhs, columns = _linear_rows(model)
+    return _table(matrix.data, rhs, *_objective_and_bounds(model))
+
+
+def scale_constraints(model):
+    ''' Scales the mismatch slack columns and every active linear constraint by powers of two and returns the
+    coefficient ranges before and after
+
+    The coefficients of all constraints are compiled and the factors computed at once, so the cost is about that of
+    writing the model once more, plus rebuilding the expressions of the scaled constraints; it roughly doubles the
+    build time of build_model.
+    '''
+    for name in ['RowScaling', 'ColumnScaling']:
+        if not hasattr(model, name):
+            setattr(model, name, Suffix(direction=Suffix.LOCAL))
+
+    constraints, matrix, rhs, columns = _linear_rows(model)
+    before = _table(matrix.data, rhs, *_objective_and_bounds(model))
+
+    column_factors = _column_factors(matrix, columns)
+    matrix = sp.csr_matrix(matrix @ sp.diags(column_factors))
+    factors = _row_factors(matrix)
+    scaled_matrix = sp.diags(factors) @ matrix
+
+    # A scaled column holds the value of the variable divided by its factor
+    substitution = dict()
+    for v, factor in zip(columns, column_factors.tolist()):
+        if factor == 1:
+            continue
+        substitution[id(v)] = factor * v
+        lower, upper = v.bounds
+        v.setlb(None if lower is None else lower / factor)
+        v.setub(None if upper is None else upper / factor)
+        if v.value is not None:
+            v.set_value(v.value / factor, skip_validation=True)
+        model.ColumnScaling[v] = model.ColumnScaling.get(v, 1.0) * factor
+
+    if len(substitution) > 0:
+        for e in model.component_data_objects(Expression, descend_into=True):
+            if e.expr is not None:
+                e.set_value(_substitute(e.expr, substitution))
+        for o in model.component_data_objects(Objective, active=True, descend_into=True):
+            o.set_value(_substitute(o.expr, substitution))
+    touched = abs(matrix) @ (column_factors != 1).astype(float) > 0
+
+    # the rows of a ranged constraint have the same coefficients, so the same factor
+    rows = dict()
+    for c, factor, substituted in zip(constraints, factors.tolist(), touched.tolist()):
+        rows[c] = (factor, substituted or rows.get(c, (factor, False))[1])
+
+    scaled = 0
+    for c, (factor, substituted) in rows.items():
+        if factor == 1 and not substituted:
+            continue
+        body = _substitute(c.body, substitution) if substituted else c.body
+        if c.equality:
+            c.set_value(factor * body == factor * c.upper)
+        else:
+            lower = None if c.lower is None else factor * c.lower
+            upper = None if c.upper is None else factor * c.upper
+            c.set_value((lower, factor * body, upper))
+        if factor != 1:
+            model.RowScaling[c] = model.RowScaling.get(c, 1.0) * factor
+            scaled = scaled + 1
+
+    logger.debug('Scaled {} constraints and {} slack columns'.format(scaled, len(substitution)))
+    after = _table(scaled_matrix.data, factors * rhs, *_objective_and_bounds(model))
+    return pd.concat({'before': before, 'after': after}, axis=1)
@@ -3,31 +3,240 @@
 # Copyright 2007 - present: numerous others credited in AUTHORS.rst
 
 
-from pyomo.environ import SolverFactory
+from pyomo.environ import SolverFactory, SOSConstraint, Var
+from pyomo.common.errors import PyomoException
+from pyomo.common.timing import HierarchicalTimer
+import importlib
+import logging
+import time
 import warnings
 import os
 import click
+import pandas as pd
 from .results import PSSTResults
 
 PSST_WARNING = os.getenv("PSST_WARNING", "ignore")
 
+logger = logging.getLogger(__name__)
 
-def solve_model(model, solver="glpk", solver_io=None, keepfiles=True, verbose=True, symbolic_solver_labels=True, is_mip=True, mipgap=0.01):
+# Solvers that take a quadratic objective in a mixed integer model; other solvers need a linearized production cost
+QUADRATIC_MIP_SOLVERS = ("gurobi", "cplex", "xpress", "scip", "mosek")
+
+# Solvers that take a quadratic objective only in a continuous model, such as a model whose commitment is all fixed
+QUADRATIC_SOLVERS = ("highs", "ipopt")
+
+# Solvers with an in-memory persistent interface, by the name of their APPSI class
+PERSISTENT_SOLVERS = {"highs": "Highs", "cbc": "Cbc", "gurobi": "Gurobi", "cplex": "Cplex"}
+
+# Persistent solvers whose APPSI interface takes no quadratic objective, by the name of their pyomo.contrib.solver
+# class, which does
+QUADRATIC_PERSISTENT_SOLVERS = {"highs": "Highs"}
+
+# Name of the thread count option of each persistent solver
+THREAD_OPTIONS = {"highs": "threads", "cbc": "threads", "gurobi": "Threads", "cplex": "threads"}
+
+# Solvers that solve_model runs in-process through their Python bindings, without a subprocess or files
+IN_PROCESS_SOLVERS = ("highs", "appsi_highs")
+
+# File options of solve_model and their defaults, which the in-process solvers have no use for
+FILE_OPTIONS = {"solver_io": None, "keepfiles": True, "symbolic_solver_labels": True, "preprocess": True}
+
+# Size of the HiGHS thread pool, which HiGHS creates once per process on its first solve (0 is automatic)
+_highs_threads = None
+
+
+def supports_quadratic_objective(solver, is_mip=True):
+    name = solver[len("appsi_"):] if solver.startswith("appsi_") else solver
+    name = name.split("_")[0]
+    if name in QUADRATIC_MIP_SOLVERS:
+        return True
+    return is_mip is False and name in QUADRATIC_SOLVERS
+
+
+def has_free_integer_variables(model):
+    # Fixed commitments are continuous (see fix_commitment), so a model whose commitment is all fixed has none
+    return any(v.is_integer() and not v.fixed for v in model.component_data_objects(Var, active=True, descend_into=True))
+
+
+def check_quadratic_objective(model, solver):
+    # Raises a ValueError when model has a quadratic production cost that solver cannot take
+    if not hasattr(model, "ProductionCostQuadratic"):
+        return
+    is_mip = has_free_integer_variables(model)
+    if not supports_quadratic_objective(solver, is_mip=is_mip):
+        raise ValueError("Solver {} does not support quadratic objectives{}, fix the commitment or build the model with "
+                         "a piecewise linear production_cost_formulation".format(solver, " in mixed integer models" if is_mip else ""))
+
+
+def highs_threads(threads=None):
+    ''' Returns the thread count to pass to HiGHS for a solve that asks for threads
+
+    HiGHS fails the solves that ask for another number of threads than its thread pool has, so those run on the
+    existing pool (0) instead.
+    '''
+    global _highs_threads
+    threads = 0 if threads is None else threads
+    if _highs_threads is None:
+        _highs_threads = threads
+    if threads not in (0, _highs_threads):
+        logger.warning("HiGHS keeps the thread pool of its first solve (threads={}), ignoring threads={}".format(_highs_threads, threads))
+        return 0
+    return threads
+
+
+def has_sos_constraints(model):
+    # The Piecewise fallback of non-convex cost and benefit curves adds SOS2 constraints, which the in-process
+    # interfaces do not accept
+    return any(True for _ in model.component_data_objects(SOSConstraint, active=True, descend_into=True))
+
+
+def solve_model(model, solver="glpk", solver_io=None, keepfiles=True, verbose=True, symbolic_solver_labels=True, is_mip=True, mipgap=0.01, preprocess=True, warmstart=False,
+                time_limit=None, threads=None):
+    check_quadratic_objective(model, solver)
+    if solver in IN_PROCESS_SOLVERS:
+        if not has_sos_constraints(model):
+            return PersistentSolver(solver).solve(model, verbose=verbose, is_mip=is_mip, mipgap=mipgap, warmstart=warmstart,
+                                                  time_limit=time_limit, threads=threads, solver_io=solver_io, keepfiles=keepfiles,
+                                                  symbolic_solver_labels=symbolic_solver_labels, preprocess=preprocess)
+        logger.warning("The in-process interface of {} does not accept SOS constraints, solving through SolverFactory".format(solver))
+    if time_limit is not None or threads is not None:
+        logger.warning("Solver {} runs as a subprocess, time_limit and threads are only passed to in-process solvers".format(solver))
     if solver == "xpress":
         engine = SolverFactory(solver, solver_io=solver_io, is_mip=is_mip)
     else:
         engine = SolverFactory(solver, solver_io=solver_io)
-    model.preprocess()
+    if preprocess:
+        model.preprocess()
     if is_mip:
         if solver == "cbc":
             engine.options["ratioGap"] = mipgap
         else:
             engine.options["mipgap"] = mipgap
 
+    # The current variable values are passed as a MIP start to the solvers that accept one
+    solve_options = dict()
+    if warmstart is True:
+        if engine.warm_start_capable():
+            solve_options["warmstart"] = True
+        else:
+            logger.warning("Solver {} does not accept a MIP start, solving without it".format(solver))
+
     with warnings.catch_warnings():
         warnings.simplefilter(PSST_WARNING)
         #        TempfileManager.tempdir = os.path.join(os.getcwd(),'PyomoTempFiles')
-        resultsPSST = engine.solve(model, suffixes=["dual"], tee=verbose, keepfiles=True, symbolic_solver_labels=symbolic_solver_labels)
+        resultsPSST = engine.solve(model, suffixes=["dual"], tee=verbose, keepfiles=True, symbolic_solver_labels=symbolic_solver_labels, **solve_options)
         TC = str(resultsPSST.solver.termination_condition)
 
     return model, TC
+
+
+class PersistentSolver(object):
+    ''' In-memory solver that keeps the model loaded between solves
+
+    The model is sent to an APPSI solver interface on the first solve; later solves only stream the
+    variables, constraints and parameters that changed, as when lazy limits are added or a template is
+    updated. No LP, solution or log file is written and no labels are generated. ``timings`` has one row per
+    solve with the time spent sending the model to the solver, solving and loading the solution. Its
+    ``update_saving`` column is the transfer time of the first solve of the model less that of this solve, the
+    time saved by sending only the changes; it is zero for the first solve, and it does not include the LP write
+    and parse that a SolverFactory solve also spends, which is not measured.
+    '''
+
+    def __init__(self, solver="highs"):
+        from pyomo.contrib.appsi import solvers
+
+        name = solver[len("appsi_"):] if solver.startswith("appsi_") else solver
+        if name not in PERSISTENT_SOLVERS:
+            raise ValueError("Solver {} has no persistent interface, use one of {}".format(solver, ", ".join(PERSISTENT_SOLVERS)))
+        self.solver = solver
+        self._name = name
+        self._engine = getattr(solvers, PERSISTENT_SOLVERS[name])()
+        if not self._engine.available():
+            raise ValueError("Solver {} is not available".format(solver))
+        self._engine.config.load_solution = False
+        self._quadratic_engine = None
+        self._model = None
+        self._full_transfer = None
+        self._timings = list()
+        self._warned = False
+
+    def __repr__(self):
+        repr_string = "solver={}, solves={}".format(self.solver, len(self._timings))
+        return "<{}.{}({})>".format(self.__class__.__module__, self.__class__.__name__, repr_string)
+
+    @property
+    def timings(self):
+        ''' Returns the per-solve timings as a DataFrame; times are in seconds '''
+        return pd.DataFrame(self._timings, columns=["transfer", "solve", "load", "update_saving"])
+
+    def solve(self, model, verbose=False, is_mip=True, mipgap=0.01, warmstart=False, time_limit=None, threads=None, **kwargs):
+        ''' Solves model like solve_model and returns (model, termination condition)
+
+        The file options of solve_model (keepfiles, symbolic_solver_labels, solver_io, preprocess) are
+        accepted and ignored, with a warning on the first solve that sets one of them to another value than its
+        default. Duals are loaded when the solver has them, that is when the model is an LP or a QP.
+        '''
+        check_quadratic_objective(model, self._name)
+        ignored = [k for k in FILE_OPTIONS if k in kwargs and kwargs[k] != FILE_OPTIONS[k]]
+        if len(ignored) > 0 and self._warned is False:
+            logger.warning("Solver {} runs in process and writes no files, ignoring {}".format(
+                self.solver, ", ".join("{}={}".format(k, kwargs[k]) for k in ignored)))
+            self._warned = True
+        if self._name == "highs":
+            # the option stays set on the solver once sent, so it is always sent
+            threads = highs_threads(threads)
+
+        # The first solve sends the whole model, later ones only its changes
+        timer = HierarchicalTimer()
+        start = time.perf_counter()
+        if hasattr(model, "ProductionCostQuadratic") and self._name in QUADRATIC_PERSISTENT_SOLVERS:
+            results, objective, termination = self._solve_quadratic(model, timer, verbose=verbose, mipgap=mipgap if is_mip else None,
+                                                                    time_limit=time_limit, threads=threads)
+        else:
+            config = self._engine.config
+            config.stream_solver = verbose
+            config.mip_gap = mipgap if is_mip else None
+            config.time_limit = time_limit
+            config.warmstart = warmstart is True and self._engine.warm_start_capable()
+            options = getattr(self._engine, "{}_options".format(self._name))
+            if threads is not None:
+                options[THREAD_OPTIONS[self._name]] = threads
+            else:
+                options.pop(THREAD_OPTIONS[self._name], None)
+            results = self._engine.solve(model, timer=timer)
+            objective, termination = results.best_feasible_objective, results.termination_condition.name
+        solved = time.perf_counter()
+        transfer = sum(timer.timers[k].total_time for k in ("set_instance", "update") if k in timer.timers)
+        if model is not self._model:
+            self._model = model
+            self._full_transfer = transfer
+
+        if objective is not None:
+            results.solution_loader.load_vars()
+            if hasattr(model, "dual"):
+                # Solvers only have duals for an LP or QP, such as a model whose commitment is all fixed
+                model.dual.clear()
+                try:
+                    duals = results.solution_loader.get_duals()
+                except (RuntimeError, PyomoException):
+                    duals = dict()
+                for c, d in duals.items():
+                    model.dual[c] = d
+        load = time.perf_counter() - solved
+
+        update_saving = self._full_transfer - transfer
+        self._timings.append((transfer, solved - start - transfer, load, update_saving))
+        logger.debug("Sent the model in {:.3f} s, {:.3f} s less than its first transfer".format(transfer, update_saving))
+        return model, termination
+
+    def _solve_quadratic(self, model, timer, verbose=False, mipgap=None, time_limit=None, threads=None):
+        # Solves model on the interface of QUADRATIC_PERSISTENT_SOLVERS, which is kept like the APPSI one
+        from pyomo.contrib.solver.common.results import legacy_termination_condition_map
+
+        if self._quadratic_engine is None:
+            module = importlib.import_module("pyomo.contrib.solver.solvers.{}".format(self._name))
+            self._quadratic_engine = getattr(module, QUADRATIC_PERSISTENT_SOLVERS[self._name])()
+
+        results = self._quadratic_engine.solve(model, tee=verbose, load_solutions=False, raise_exception_on_nonoptimal_result=False,
+                                               rel_gap=mipgap, time_limit=time_limit, threads=threads, timer=timer)
+        return results, results.incumbent_objective, str(legacy_termination_condition_map[results.termination_condition])
@@ -1,21 +1,36 @@
 # Copyright (c) 2020, Battelle Memorial Institute
 # Copyright 2007 - present: numerous others credited in AUTHORS.rst
 
+import numpy as np
 import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.linalg import spsolve
 import click
+from pyomo.environ import value
 
 class PSSTResults(object):
 
-    def __init__(self, model):
+    def __init__(self, model, sensitivities=None, prices=None):
 
         self._model = model
+        self._sensitivities = sensitivities
         self._maximum_hours = 24
+        # Function that loads the duals of a model solved without them, called on the first read of a dual
+        self._prices = prices
+
+    def _load_prices(self):
+        if self._prices is not None:
+            prices, self._prices = self._prices, None
+            prices()
 
     @property
     def production_cost(self):
         m = self._model
         st = 'SecondStage'
-        return sum([m.ProductionCost[g, t].value for t in m.GenerationTimeInStage[st] if t < self._maximum_hours for g in m.Generators])
+        cost = sum([m.ProductionCost[g, t].value for t in m.GenerationTimeInStage[st] if t < self._maximum_hours for g in m.Generators])
+        if hasattr(m, 'ProductionCostQuadratic'):
+            cost = cost + sum([value(m.ProductionCostQuadratic[g, t]) for t in m.GenerationTimeInStage[st] if t < self._maximum_hours for g in m.Generators])
+        return cost
 
     @property
     def commitment_cost(self):
@@ -36,10 +51,17 @@ class PSSTResults(object):
 
     @property
     def line_power(self):
+        m = self._model
+        if not hasattr(m, 'LinePower'):
+            # PTDF models have no flow variables, the flows are recovered from the injections
+            return self._frame(self._sensitivities.ptdf @ _injections(m), m.TransmissionLines, m.TimePeriods)
         return self._get('LinePower', self._model)
 
     @property
     def angles(self):
+        m = self._model
+        if not hasattr(m, 'Angle'):
+            return self._frame(_angles(m, _injections(m), self._sensitivities.slack_bus), m.Buses, m.TimePeriods)
         return self._get('Angle', self._model)
 
     @property
@@ -72,23 +94,35 @@ class PSSTResults(object):
 
     @property
     def lmp(self):
+        self._load_prices()
+        m = self._model
+        if not hasattr(m, 'LinePower'):
+            return self._frame(_ptdf_lmp(m, self._sensitivities), m.Buses, m.TimePeriods)
         return self._get('PowerBalance', self._model, dual=True)
 
     @property
     def reserve_zonal_down_dual(self):
+        self._load_prices()
         return self._get('EnforceZonalReserveDownRequirements', self._model, dual=True)
 
     @property
     def reserve_zonal_up_dual(self):
+        self._load_prices()
         return self._get('EnforceZonalReserveUpRequirements', self._model, dual=True)
 
+    @staticmethod
+    def _frame(values, set1, set2):
+        # (set1, set2) array as a DataFrame laid out like _get, one column per element of set1
+        df = pd.DataFrame(np.asarray(values).T, index=list(set2), columns=list(set1))
+        return df.reindex(sorted(df.columns), axis=1)
+
     @staticmethod
     def _get(attribute, model, set1=None, set2=None, dual=False):
         _dict = dict()
 
         if set1 is not None and set2 is None:
             for s1 in set1:
-                _dict[s1] = getattr(model, attribute)[s1]
+                _dict[s1] = _value(model, getattr(model, attribute)[s1])
 
             return pd.Series(_dict)
 
@@ -96,7 +130,7 @@ class PSSTResults(object):
             if set1 is None and set2 is None:
                 set1 = set()
                 set2 = set()
-                index = getattr(model, attribute + '_index')
+                index = getattr(model, attribute).index_set()
                 for i, j in index:
                     set1.add(i)
                     set2.add(j)
@@ -107,11 +141,70 @@ class PSSTResults(object):
 
                 for s2 in set2:
                     if dual is True:
-                        _dict[s1].append(model.dual.get(getattr(model, attribute)[s1, s2]))
+                        _dict[s1].append(_dual(model, getattr(model, attribute)[s1, s2]))
                     else:
-                        _dict[s1].append(getattr(model, attribute)[s1, s2].value)
+                        _dict[s1].append(_value(model, getattr(model, attribute)[s1, s2], exception=False))
 
             pd_unsorted = pd.DataFrame(_dict)
             pd_sorted = pd_unsorted.reindex(sorted(pd_unsorted.columns),axis=1)
             return pd_sorted
 
+
+
+def _dual(m, c, default=None):
+    # Duals of a scaled model are returned in the units of the original constraint
+    d = m.dual.get(c, default)
+    if d is None or not hasattr(m, 'RowScaling'):
+        return d
+    return d * m.RowScaling.get(c, 1.0)
+
+
+def _value(m, v, exception=True):
+    # Values of the scaled slack columns are returned in the units of the original variable
+    x = value(v, exception=exception)
+    if x is None or not hasattr(m, 'ColumnScaling'):
+        return x
+    return x * m.ColumnScaling.get(v, 1.0)
+
+
+def _injections(m):
+    # (bus, time) array of the net injections of the current solution
+    values = [[m.NetPowerInjectionAtBus[b, t].value for t in m.TimePeriods] for b in m.Buses]
+    return np.nan_to_num(np.array(values, dtype=float))
+
+
+def _angles(m, injections, slack_bus):
+    # Voltage angles of a PTDF model, solving the DC power flow of the injections with the slack bus at zero
+    buses = list(m.Buses)
+    position = {b: i for i, b in enumerate(buses)}
+    lines = [l for l in m.TransmissionLines if value(m.B[l]) != 0]
+    rows = np.tile(np.arange(len(lines)), 2)
+    columns = [position[m.BusFrom[l]] for l in lines] + [position[m.BusTo[l]] for l in lines]
+    incidence = sp.csr_matrix((np.repeat([1.0, -1.0], len(lines)), (rows, columns)), shape=(len(lines), len(buses)))
+    susceptance = incidence.T @ sp.diags([float(value(m.B[l])) for l in lines]) @ incidence
+
+    keep = np.flatnonzero(np.arange(len(buses)) != position[slack_bus])
+    angles = np.zeros(injections.shape)
+    solution = spsolve(susceptance[keep][:, keep].tocsc(), injections[keep])
+    angles[keep] = np.reshape(solution, (len(keep), -1))
+    return angles
+
+
+def _ptdf_lmp(m, sensitivities):
+    # LMPs of a PTDF model: the price of the system balance plus the congestion prices of the limits, through the
+    # PTDF of the limited lines. They equal the PowerBalance duals of the model with LinePower.
+    lines = {l: i for i, l in enumerate(m.TransmissionLines)}
+    periods = {t: i for i, t in enumerate(m.TimePeriods)}
+    energy = np.array([_dual(m, m.PowerBalance[t], 0) for t in periods])
+    congestion = np.zeros((len(lines), len(periods)))
+    for constraints in [m.LinePowerConstraintLower, m.LinePowerConstraintHigher]:
+        for (l, t), c in constraints.items():
+            congestion[lines[l], periods[t]] += _dual(m, c, 0)
+    lmp = energy[None, :] + sensitivities.ptdf.T @ congestion
+
+    if hasattr(m, 'ContingencyLinePowerConstraint'):
+        for (k, l, t), c in m.ContingencyLinePowerConstraint.items():
+            lodf = sensitivities.lodf[sensitivities.monitored[l], sensitivities.contingencies[k]]
+            row = sensitivities.ptdf[lines[l]] + lodf * sensitivities.ptdf[lines[k]]
+            lmp[:, periods[t]] += _dual(m, c, 0) * row.toarray().ravel()
+    return lmp
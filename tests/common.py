@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Bundled cases with the SCUC data that MATPOWER files do not carry, shared by the model tests.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyomo.environ import SolverFactory, value
+
+from psst.case import read_matpower
+
+CURDIR = os.path.realpath(os.path.dirname(__file__))
+
+SOLVER = 'highs'
+
+requires_solver = pytest.mark.skipif(not SolverFactory(SOLVER).available(exception_flag=False),
+                                     reason='{} is not available'.format(SOLVER))
+
+ZONAL_DATA = {'zonalData': {'NumberOfZones': 0, 'Zones': '', 'HasZonalReserves': False},
+              'zonalBusData': {},
+              'ReserveDownZonalPercent': {},
+              'ReserveUpZonalPercent': {}}
+
+
+def load_case(name='case5', periods=6, minimum_up_time=2, minimum_down_time=2, segments=5):
+    case = read_matpower(os.path.join(CURDIR, '../cases/{}.m'.format(name)))
+
+    case.gen['UnitOnT0State'] = 1
+    case.gen['MINIMUM_UP_TIME'] = minimum_up_time
+    case.gen['MINIMUM_DOWN_TIME'] = minimum_down_time
+    case.gencost['NS'] = segments
+    case.gencost['COLD_START_HOURS'] = 2
+    case.gencost['STARTUP_HOT'] = 10.0
+    case.gencost['STARTUP_COLD'] = 20.0
+    case.gencost['SHUTDOWN_COEFFICIENT'] = 0.0
+
+    profile = 0.8 + 0.2 * np.sin(2 * np.pi * np.arange(periods) / 24.0)
+    case.load = pd.DataFrame(np.outer(profile, case.bus['PD'].values), columns=case.bus.index)
+    case.gen_status = pd.DataFrame(np.nan, index=case.load.index, columns=case.gen.index)
+
+    case.TimePeriodLength = 1
+    case.ReserveDownSystemPercent = 0.0
+    case.ReserveUpSystemPercent = 0.0
+    case.PositiveMismatchPenalty = 1e6
+    case.NegativeMismatchPenalty = 1e6
+    case.PriceSenLoadFlag = 0
+    case.StorageFlag = 0
+
+    return case
+
+
+def objective(psst_model):
+    return value(psst_model._model.TotalCostObjective)
+
+
+def solve(psst_model, **kwargs):
+    # Solves a PSSTModel or PSSTModelTemplate to optimality and returns its objective
+    kwargs.setdefault('mipgap', 1e-6)
+    _, status = psst_model.solve(solver=SOLVER, **kwargs)
+    assert status == 'optimal'
+    return objective(getattr(psst_model, 'model', psst_model))
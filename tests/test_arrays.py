@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+The array view of a case gives the same model data as walking the case tables row by row.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from psst.case.arrays import CaseArrays
+from psst.model import build_model
+
+from .common import load_case, ZONAL_DATA
+
+
+def generator_table(case):
+    return pd.merge(case.gen, case.gencost, left_index=True, right_index=True)
+
+
+def row_cost_curves(generator_df):
+    # The piecewise linear cost curves as computed row by row before the array view
+    points = dict()
+    values = dict()
+    for i, g in generator_df.iterrows():
+        if g['NCOST'] == 2:
+            small_increment = 1 if g['PMIN'] == g['PMAX'] else 0
+            points[i] = np.linspace(g['PMIN'], g['PMAX'] + small_increment, num=int(g['NS'])+1)
+            values[i] = g['COST_0'] + g['COST_1'] * points[i]
+        if g['NCOST'] == 3:
+            points[i] = np.linspace(g['PMIN'], g['PMAX'], num=int(g['NS'])+1)
+            values[i] = g['COST_0'] + g['COST_1'] * points[i] + g['COST_2'] * points[i] ** 2
+    return points, values
+
+
+@pytest.mark.parametrize('name', ['case5', 'case14', 'case24_ieee_rts'])
+def test_cost_curves(name):
+    case = load_case(name)
+    # mixed numbers of segments and a unit whose output cannot be dispatched
+    case.gencost.loc[case.gencost.index[0], 'NS'] = 3
+    case.gen.loc[case.gen.index[-1], 'PMIN'] = case.gen.loc[case.gen.index[-1], 'PMAX']
+    case.gencost.loc[case.gencost.index[-1], 'NCOST'] = 2
+
+    points, values = CaseArrays(case).cost_curves()
+    expected_points, expected_values = row_cost_curves(generator_table(case))
+
+    assert sorted(points) == sorted(expected_points)
+    for g in expected_points:
+        np.testing.assert_allclose(points[g], expected_points[g], rtol=1e-12)
+        np.testing.assert_allclose(values[g], expected_values[g], rtol=1e-12)
+
+
+def test_repeated_cost_curves():
+    # case24_ieee_rts has several units with the same cost curve, each of which keeps its own breakpoints
+    case = load_case('case24_ieee_rts')
+    points, values = CaseArrays(case).cost_curves()
+    assert len(points) == len(case.gen.index)
+    assert points['GenCo0'] == points['GenCo1'] and values['GenCo0'] == values['GenCo1']
+    assert points['GenCo0'] is not points['GenCo1']
+
+
+def test_fixed_commitment_and_demand():
+    case = load_case('case14')
+    case.gen_status.loc[1, 'GenCo1'] = 0
+    case.gen_status.loc[3, 'GenCo0'] = 1
+    arrays = CaseArrays(case)
+
+    assert sorted(arrays.fixed_commitment()) == [('GenCo0', 3, 1), ('GenCo1', 1, 0)]
+
+    demand = arrays.demand()
+    assert demand == {(b, t): v for (t, b), v in case.load.stack().items() if v != 0}
+
+    matrix = arrays.demand_matrix()
+    assert matrix.shape == (len(case.load.index), len(case.bus.index))
+    np.testing.assert_array_equal(matrix, case.load.reindex(columns=case.bus.index).fillna(0).values)
+
+
+def test_model_parameters():
+    case = load_case('case14')
+    m = build_model(case, ZonalDataComplete=ZONAL_DATA)._model
+    generator_df = generator_table(case)
+
+    for g, row in generator_df.iterrows():
+        assert m.MinimumPowerOutput[g] == row['PMIN']
+        assert m.MaximumPowerOutput[g] == row['PMAX']
+        assert m.NominalRampUpLimit[g] == row['RAMP_10']
+        assert m.MinimumUpTime[g] == row['MINIMUM_UP_TIME']
+        assert m.HotStartCost[g] == row['STARTUP_HOT']
+
+    for g, b in generator_df['GEN_BUS'].items():
+        assert g in m.GeneratorsAtBus[b]
+
+    for i, row in case.branch.iterrows():
+        assert m.BusFrom[i] == row['F_BUS'] and m.BusTo[i] == row['T_BUS']
+        assert m.ThermalLimit[i] == row['RATE_A']
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+PSSTParallelHorizon only stitches the windows and seams that were solved, and the stitched schedule is feasible
+over the whole horizon.
+"""
+
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from psst.model import build_model, decomposition
+from psst.model.decomposition import PSSTParallelHorizon
+
+from .common import load_case, requires_solver, SOLVER, ZONAL_DATA
+
+pytestmark = requires_solver
+
+solve_window = decomposition.solve_window
+
+
+def failing_windows(*args, **kwargs):
+    # solve_window, with the windows reported as infeasible; seams pass fixed_power and are solved as usual
+    solution = solve_window(*args, **kwargs)
+    if inspect.signature(solve_window).bind(*args, **kwargs).arguments.get('fixed_power') is None:
+        return solution._replace(status='infeasible', objective=None, unit_commitment=None, power_generated=None)
+    return solution
+
+
+def horizon(seam=4, periods=16, window=8, minimum_up_down_time=3):
+    case = load_case('case5', periods=periods, minimum_up_time=minimum_up_down_time, minimum_down_time=minimum_up_down_time)
+    return PSSTParallelHorizon(case, window=window, overlap=2, seam=seam, ZonalDataComplete=ZONAL_DATA)
+
+
+def solve_fixed(unit_commitment, power_generated, periods, minimum_up_down_time):
+    # Solves the whole horizon with the commitment and output fixed to a stitched schedule
+    case = load_case('case5', periods=periods, minimum_up_time=minimum_up_down_time, minimum_down_time=minimum_up_down_time)
+    case.gen_status = unit_commitment.reset_index(drop=True)
+    model = build_model(case, ZonalDataComplete=ZONAL_DATA)
+    for t, row in power_generated.reset_index(drop=True).iterrows():
+        for g, v in row.items():
+            model._model.PowerGenerated[g, t].fix(v)
+    _, status = model.solve(solver=SOLVER)
+    return status
+
+
+@pytest.mark.parametrize('periods, window, seam, minimum_up_down_time', [(16, 8, 4, 3), (48, 12, 6, 4)])
+def test_parallel_horizon(periods, window, seam, minimum_up_down_time):
+    parallel = horizon(seam=seam, periods=periods, window=window, minimum_up_down_time=minimum_up_down_time)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        unit_commitment, power_generated = parallel.solve(executor=executor, solver=SOLVER)
+    windows = periods // window
+    assert [s.status for s in parallel.windows + parallel.seams] == ['optimal'] * (2 * windows - 1)
+    assert unit_commitment.shape == power_generated.shape == (periods, 5)
+    assert solve_fixed(unit_commitment, power_generated, periods, minimum_up_down_time) == 'optimal'
+
+
+def test_overlapping_seams():
+    # Seams solved concurrently from the same schedule would overwrite each other's repairs
+    with pytest.raises(ValueError):
+        horizon(seam=5)
+
+
+def test_unsolved_seam_keeps_windows(caplog):
+    # A two period seam cannot bridge the three hour minimum up and down times of the two windows
+    parallel = horizon(seam=2)
+    with ThreadPoolExecutor(max_workers=1) as executor, caplog.at_level(logging.WARNING):
+        unit_commitment, power_generated = parallel.solve(executor=executor, solver=SOLVER)
+
+    assert [s.status for s in parallel.seams] == ['infeasible']
+    assert 'Unable to repair the seam' in caplog.text
+    pd.testing.assert_frame_equal(unit_commitment, pd.concat([w.unit_commitment for w in parallel.windows]))
+    pd.testing.assert_frame_equal(power_generated, pd.concat([w.power_generated for w in parallel.windows]))
+
+
+def test_unsolved_window_raises(monkeypatch):
+    monkeypatch.setattr(decomposition, 'solve_window', failing_windows)
+    with ThreadPoolExecutor(max_workers=1) as executor, pytest.raises(ValueError):
+        horizon().solve(executor=executor, solver=SOLVER)
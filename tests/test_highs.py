@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+The in-process HiGHS backend keeps one solver per model and returns the prices of the LP with the commitment of
+the MIP solution, which is solved when the prices are first read. Models with SOS constraints, which its interface
+does not accept, go through SolverFactory; the file options of SolverFactory are ignored with a warning.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import psst.solver
+from psst.model import build_model
+from psst.solver import has_sos_constraints, solve_model
+
+from .common import load_case, solve, requires_solver, ZONAL_DATA
+
+pytestmark = requires_solver
+
+
+def commitment(psst_model):
+    m = psst_model._model
+    return pd.DataFrame([[round(m.UnitOn[g, t].value) for g in m.Generators] for t in m.TimePeriods],
+                        index=list(m.TimePeriods), columns=list(m.Generators))
+
+
+@pytest.mark.parametrize('name', ['case5', 'case14'])
+def test_prices_of_fixed_commitment(name):
+    model = build_model(load_case(name), ZonalDataComplete=ZONAL_DATA)
+    expected = solve(model)
+    assert model.persistent_solver is not None
+    assert model.persistent_solver.timings.shape[0] == 1
+    assert model.results.lmp.notnull().all().all()
+    assert model.persistent_solver.timings.shape[0] == 2
+    # the pricing LP is solved once
+    model.results.lmp
+    assert model.persistent_solver.timings.shape[0] == 2
+
+    # The dispatch with the commitment fixed is an LP from the start, whose duals need no second solve
+    case = load_case(name)
+    case.gen_status = commitment(model)
+    dispatch = build_model(case, ZonalDataComplete=ZONAL_DATA)
+    assert solve(dispatch) == pytest.approx(expected, rel=1e-6)
+    assert dispatch.persistent_solver.timings.shape[0] == 1
+    np.testing.assert_allclose(model.results.lmp.values, dispatch.results.lmp.values, atol=1e-6)
+
+    # The LP leaves the commitment free for the next solve, on the same solver
+    assert not any(u.fixed for u in model._model.UnitOn.values())
+    solver = model.persistent_solver
+    assert solve(model) == pytest.approx(expected, rel=1e-6)
+    assert model.persistent_solver is solver
+
+
+def test_file_options(caplog):
+    model = build_model(load_case('case5'), ZonalDataComplete=ZONAL_DATA)
+    with caplog.at_level(logging.WARNING, logger='psst.solver'):
+        _, status = solve_model(model._model, solver='highs', verbose=False)
+    assert status == 'optimal'
+    assert 'ignoring' not in caplog.text
+
+    with caplog.at_level(logging.WARNING, logger='psst.solver'):
+        _, status = solve_model(model._model, solver='highs', verbose=False, keepfiles=False, symbolic_solver_labels=False)
+    assert status == 'optimal'
+    assert 'ignoring keepfiles=False, symbolic_solver_labels=False' in caplog.text
+
+
+def test_thread_count():
+    model = build_model(load_case('case5'), ZonalDataComplete=ZONAL_DATA)
+    expected = solve(model, threads=1)
+    for threads in [2, None, 1]:
+        assert solve(model, threads=threads) == pytest.approx(expected, rel=1e-6)
+
+
+def test_sos_constraints_use_solver_factory(monkeypatch):
+    # A concave cost curve is modelled with Piecewise and its SOS2 constraints
+    case = load_case('case5')
+    case.gencost.loc['GenCo2', 'COST_2'] = -0.01
+    model = build_model(case, ZonalDataComplete=ZONAL_DATA)
+    assert has_sos_constraints(model._model)
+    assert not has_sos_constraints(build_model(load_case('case5'), ZonalDataComplete=ZONAL_DATA)._model)
+
+    solved = list()
+
+    class Results(object):
+        class solver(object):
+            termination_condition = 'optimal'
+
+    class Engine(object):
+        options = dict()
+
+        def warm_start_capable(self):
+            return False
+
+        def solve(self, model, **kwargs):
+            solved.append(model)
+            return Results()
+
+    def persistent_solver(solver):
+        raise AssertionError('{} was solved in process'.format(solver))
+
+    monkeypatch.setattr(psst.solver, 'SolverFactory', lambda solver, solver_io=None: Engine())
+    monkeypatch.setattr(psst.solver, 'PersistentSolver', persistent_solver)
+    monkeypatch.setattr('psst.model.PersistentSolver', persistent_solver)
+    _, status = model.solve(solver='highs')
+    assert status == 'optimal'
+    assert solved == [model._model]
+    assert model.persistent_solver is None
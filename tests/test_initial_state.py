@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+The initial state of the generators is the signed run length at the end of a previous commitment, which
+build_model uses in place of UnitOnT0State for the generators that commitment covers.
+"""
+
+import pandas as pd
+import pytest
+
+from pyomo.environ import value
+
+from psst.model import build_model
+from psst.model.generators import initial_state_from_commitment
+
+from .common import load_case, ZONAL_DATA
+
+
+def previous_commitment():
+    return pd.DataFrame({'A': [1, 0, 0, 0], 'B': [0, 1, 1, 1], 'C': [1, 1, 1, 1], 'D': [0, 0, 0, 0], 'E': [1, 1, 1, 1]})
+
+
+def test_run_lengths():
+    state = initial_state_from_commitment(previous_commitment())
+    assert state.to_dict() == {'A': -3.0, 'B': 3.0, 'C': 4.0, 'D': -4.0, 'E': 4.0}
+
+
+def test_previous_state_is_carried():
+    # Only generators that keep their status over the whole commitment, in the same sign as before, carry it
+    previous_state = pd.Series({'A': 5.0, 'B': 2.0, 'C': 2.0, 'D': 5.0, 'E': -3.0})
+    state = initial_state_from_commitment(previous_commitment(), previous_state=previous_state)
+    assert state.to_dict() == {'A': -3.0, 'B': 3.0, 'C': 6.0, 'D': -4.0, 'E': 4.0}
+
+    # generators missing from previous_state carry nothing
+    state = initial_state_from_commitment(previous_commitment(), previous_state=pd.Series({'C': -2.0}))
+    assert state['C'] == 4.0 and state['D'] == -4.0
+
+
+def test_time_period_length():
+    previous_state = pd.Series({'C': 2.0})
+    state = initial_state_from_commitment(previous_commitment(), previous_state=previous_state, time_period_length=0.5)
+    assert state.to_dict() == {'A': -1.5, 'B': 1.5, 'C': 4.0, 'D': -2.0, 'E': 2.0}
+
+
+def test_build_with_previous_commitment():
+    # GenCo0 has been off for one period and GenCo1 on for one, so each has one more period to stay so; the
+    # other generators keep the UnitOnT0State of the case
+    case = load_case('case5', minimum_up_time=2, minimum_down_time=2)
+    case.gen['UnitOnT0State'] = 5
+    previous = pd.DataFrame({'GenCo0': [1, 1, 0], 'GenCo1': [0, 0, 1]})
+    m = build_model(case, ZonalDataComplete=ZONAL_DATA, previous_unit_commitment_df=previous)._model
+
+    assert value(m.UnitOnT0State['GenCo0']) == -1 and value(m.UnitOnT0['GenCo0']) == 0
+    assert value(m.InitialTimePeriodsOffLine['GenCo0']) == 1 and value(m.InitialTimePeriodsOnLine['GenCo0']) == 0
+    assert value(m.UnitOnT0State['GenCo1']) == 1 and value(m.UnitOnT0['GenCo1']) == 1
+    assert value(m.InitialTimePeriodsOnLine['GenCo1']) == 1 and value(m.InitialTimePeriodsOffLine['GenCo1']) == 0
+    for g in ['GenCo2', 'GenCo3', 'GenCo4']:
+        assert value(m.UnitOnT0State[g]) == 5 and value(m.InitialTimePeriodsOnLine[g]) == 0
+
+    m = build_model(case, ZonalDataComplete=ZONAL_DATA)._model
+    assert value(m.UnitOnT0State['GenCo0']) == 5
+
+
+@pytest.mark.parametrize('time_period_length, minimum_up_time, on_line', [(1, 2, 1), (2, 6, 2)])
+def test_build_time_period_length(time_period_length, minimum_up_time, on_line):
+    # A run of one period is time_period_length hours long; the remaining minimum up time is counted in periods
+    case = load_case('case5', minimum_up_time=minimum_up_time, minimum_down_time=2)
+    case.TimePeriodLength = time_period_length
+    previous = pd.DataFrame({'GenCo1': [0, 0, 1]})
+    m = build_model(case, ZonalDataComplete=ZONAL_DATA, previous_unit_commitment_df=previous)._model
+    assert value(m.UnitOnT0State['GenCo1']) == time_period_length
+    assert value(m.InitialTimePeriodsOnLine['GenCo1']) == on_line
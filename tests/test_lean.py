@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+The lean formulation, without the mismatch and stage cost bookkeeping, gives the optimum of the default
+formulation, also when the load cannot be met.
+"""
+
+import pytest
+
+from psst.model import build_model
+
+from .common import load_case, solve, requires_solver, ZONAL_DATA
+
+pytestmark = requires_solver
+
+
+@pytest.mark.parametrize('scale', [1.0, 3.0])
+@pytest.mark.parametrize('name', ['case5', 'case14'])
+def test_lean_matches_default(name, scale):
+    def build(config):
+        case = load_case(name)
+        case.load = case.load * scale
+        return build_model(case, ZonalDataComplete=ZONAL_DATA, config=config)
+
+    default = build({})
+    expected = solve(default)
+
+    lean = build({'lean_formulation': True})
+    assert solve(lean) == pytest.approx(expected, rel=1e-6)
+    assert lean._model.nvariables() < default._model.nvariables()
+    assert lean._model.nconstraints() < default._model.nconstraints()
+    assert lean.results.production_cost == pytest.approx(default.results.production_cost, rel=1e-6)
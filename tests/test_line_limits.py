@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Thermal limits added lazily give the optimum of the model with every limit.
+"""
+
+import numpy as np
+import pytest
+
+from psst.model import build_model
+
+from .common import load_case, solve, requires_solver, ZONAL_DATA
+
+pytestmark = requires_solver
+
+
+def congested_case(name):
+    # case5 has binding limits of its own; case14 has none, so all of its lines get a tight one
+    case = load_case(name)
+    if name == 'case14':
+        case.branch['RATE_A'] = 40.0
+    return case
+
+
+@pytest.mark.parametrize('use_ptdf', [False, True])
+@pytest.mark.parametrize('name', ['case5', 'case14'])
+def test_lazy_line_limits(name, use_ptdf):
+    full = build_model(congested_case(name), ZonalDataComplete=ZONAL_DATA, config={'use_ptdf': use_ptdf})
+    expected = solve(full)
+
+    lazy = build_model(congested_case(name), ZonalDataComplete=ZONAL_DATA, config={'use_ptdf': use_ptdf, 'lazy_line_limits': True})
+    assert solve(lazy) == pytest.approx(expected, rel=1e-6)
+    assert len(lazy.line_limit_iterations) > 1
+    assert len(lazy._model.LinePowerConstraintHigher) < len(full._model.LinePowerConstraintHigher)
+
+    # a zero rating means the line is not limited
+    limits = lazy.results.maximum_line_power.abs()
+    limits = limits[limits > 1e-3]
+    flows = lazy.results.line_power[limits.index].abs()
+    assert np.all(flows.values <= limits.values + 1e-6)
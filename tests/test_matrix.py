@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+build_matrices assembles the same unit commitment problem as build_model.
+"""
+
+import pytest
+
+from psst.model import build_model
+from psst.model.matrix import build_matrices
+
+from .common import load_case, solve, requires_solver, ZONAL_DATA
+
+pytestmark = requires_solver
+
+
+def initial_state_case(name, initial_state):
+    case = load_case(name, periods=8, minimum_up_time=3, minimum_down_time=3)
+    case.gen['UnitOnT0State'] = initial_state[:len(case.gen.index)]
+    return case
+
+
+@pytest.mark.parametrize('use_ptdf', [False, True])
+@pytest.mark.parametrize('name', ['case5', 'case14'])
+def test_matrix_objective(name, use_ptdf):
+    config = {'use_ptdf': use_ptdf}
+    expected = solve(build_model(load_case(name), ZonalDataComplete=ZONAL_DATA, config=dict(config)))
+    matrices = build_matrices(load_case(name), ZonalDataComplete=ZONAL_DATA, config=dict(config))
+    assert matrices.solve(mipgap=1e-6) == pytest.approx(expected, rel=1e-6)
+
+
+@pytest.mark.parametrize('initial_state', [[1, -1, 5, -2, 2], [-5, -4, 1, -1, -3]])
+def test_matrix_initial_state(initial_state):
+    expected = solve(build_model(initial_state_case('case5', initial_state), ZonalDataComplete=ZONAL_DATA))
+    matrices = build_matrices(initial_state_case('case5', initial_state), ZonalDataComplete=ZONAL_DATA)
+    assert matrices.solve(mipgap=1e-6) == pytest.approx(expected, rel=1e-6)
+
+
+def test_matrix_unsupported():
+    case = load_case('case5')
+    case.StorageFlag = 1
+    with pytest.raises(ValueError):
+        build_matrices(case, ZonalDataComplete=ZONAL_DATA)
+
+
+def test_matrix_minimum_up_time_from_first_period():
+    # GenCo0 may start in period 0, but has to stay on for its minimum up time, as in build_model
+    case = initial_state_case('case5', [-5, 1, 5, 5, 5])
+    case.gen_status['GenCo0'] = 0
+    case.gen_status.loc[0, 'GenCo0'] = 1
+    matrices = build_matrices(case, ZonalDataComplete=ZONAL_DATA)
+    with pytest.raises(ValueError):
+        matrices.solve()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+The persistent solver keeps a model loaded between solves and gives the optimum of a fresh solve. Fixed
+commitments are continuous, so a model whose commitment is all fixed is solved as an LP, with duals.
+"""
+
+import pandas as pd
+import pytest
+
+from pyomo.environ import Binary, UnitInterval
+
+from psst.model import build_model, PSSTModelTemplate
+
+from .common import load_case, solve, requires_solver, ZONAL_DATA
+
+pytestmark = requires_solver
+
+
+def test_fixed_commitment_is_continuous():
+    case = load_case('case5')
+    case.gen_status.loc[2, 'GenCo2'] = 0
+    template = PSSTModelTemplate(case, ZonalDataComplete=ZONAL_DATA)
+    m = template.model._model
+    assert m.UnitOn['GenCo2', 2].fixed and m.UnitOn['GenCo2', 2].domain is UnitInterval
+    assert not m.UnitOn['GenCo2', 3].fixed and m.UnitOn['GenCo2', 3].domain is Binary
+
+    template.update(gen_status=load_case('case5').gen_status)
+    assert not m.UnitOn['GenCo2', 2].fixed and m.UnitOn['GenCo2', 2].domain is Binary
+
+
+def test_persistent_matches_fresh_solve():
+    case = load_case('case14')
+    case.branch['RATE_A'] = 40.0
+    expected = solve(build_model(case, ZonalDataComplete=ZONAL_DATA))
+
+    case = load_case('case14')
+    case.branch['RATE_A'] = 40.0
+    model = build_model(case, ZonalDataComplete=ZONAL_DATA, config={'lazy_line_limits': True})
+    assert solve(model, persistent=True) == pytest.approx(expected, rel=1e-6)
+
+    # one solver for every lazy iteration, each of which solves the MIP once; the LP with its commitment is only
+    # solved for the prices. The transfer times are wall clock times, so only their presence is checked
+    timings = model.persistent_solver.timings
+    assert len(timings) == len(model.line_limit_iterations) > 1
+    assert timings.notnull().all().all()
+    assert list(timings.columns) == ['transfer', 'solve', 'load', 'update_saving']
+    # the first solve sends the whole model, so it saves nothing
+    assert timings['update_saving'].iloc[0] == 0
+
+
+def test_fixed_commitment_has_duals():
+    # With every status fixed the model is an LP and the solver returns its duals
+    commitment = build_model(load_case('case5'), ZonalDataComplete=ZONAL_DATA)
+    expected = solve(commitment, persistent=True)
+
+    m = commitment._model
+    case = load_case('case5')
+    case.gen_status = pd.DataFrame([[round(m.UnitOn[g, t].value) for g in m.Generators] for t in m.TimePeriods],
+                                   index=list(m.TimePeriods), columns=list(m.Generators))
+    model = build_model(case, ZonalDataComplete=ZONAL_DATA)
+    assert solve(model, persistent=True) == pytest.approx(expected, rel=1e-6)
+    assert len(model._model.dual) > 0
+    assert model.results.lmp.notnull().all().all()
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+The epigraph benefit formulation, with one upper bound per segment of every concave benefit curve, gives the
+optimum of the Piecewise formulation.
+"""
+
+import pytest
+
+from psst.model import build_model
+
+from .common import load_case, solve, requires_solver, ZONAL_DATA
+
+pytestmark = requires_solver
+
+
+def price_sensitive_loads(case):
+    # One load at every bus, whose bid falls over the day
+    data = dict()
+    for i, bus in enumerate(case.bus.index):
+        for t in case.load.index:
+            data['PSL{}'.format(i), t] = {'atBus': bus, 'd': 0.0, 'e': 60.0 - t - i, 'f': -0.5, 'Pmin': 0.0, 'Pmax': 40.0}
+    return data
+
+
+def build(name, config=None):
+    case = load_case(name)
+    case.PriceSenLoadFlag = 1
+    return build_model(case, ZonalDataComplete=ZONAL_DATA, PriceSenLoadData=price_sensitive_loads(case), config=config)
+
+
+@pytest.mark.parametrize('name', ['case5', 'case14'])
+def test_epigraph_matches_piecewise(name):
+    expected = solve(build(name, {'benefit_formulation': 'piecewise'}))
+
+    model = build(name)
+    assert solve(model) == pytest.approx(expected, rel=1e-6)
+
+    m = model._model
+    # five breakpoints by default, so four segments per (load, time)
+    assert len(m.LoadBenefitSegments) == len(m.PriceSensitiveLoads) * len(m.TimePeriods) * 4
+    assert not hasattr(m, 'PiecewiseLoadBenefitIndex')
+    assert not hasattr(m, 'LoadDemandPiecewisePoints')
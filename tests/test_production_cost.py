@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+The production cost formulations give the optimum of the default epigraph formulation, which keeps one
+inequality per segment of every convex cost curve. Generators with the same cost curve share one set of
+breakpoints.
+"""
+
+import pandas as pd
+import pytest
+from pyomo.environ import Reals, NonNegativeReals, value
+
+from psst.case.arrays import CaseArrays
+from psst.model import build_model
+from psst.model.generators import PiecewiseBreakpoints
+from psst.solver import supports_quadratic_objective
+
+from .common import load_case, solve, requires_solver, ZONAL_DATA
+
+pytestmark = requires_solver
+
+
+def test_breakpoints_are_interned():
+    breakpoints = PiecewiseBreakpoints()
+    breakpoints.set('G1', [0, 10, 20], [0, 100, 250])
+    breakpoints.set('G2', [0.0, 10.0, 20.0], [0.0, 100.0, 250.0])
+    breakpoints.set('G3', [0, 10, 20], [0, 120, 250])
+
+    assert breakpoints.curve('G1') == breakpoints.curve('G2') != breakpoints.curve('G3')
+    assert len(breakpoints.points) == 2
+    curve = breakpoints.curve('G1')
+    assert breakpoints.point_list(curve) is breakpoints.point_list(breakpoints.curve('G2'))
+    assert breakpoints.value_dict(curve) == {0.0: 0.0, 10.0: 100.0, 20.0: 250.0}
+
+
+def test_epigraph_segments():
+    # A concave curve has no epigraph, so the generator falls back to Piecewise in every period
+    case = load_case('case5')
+    case.gencost.loc['GenCo2', 'COST_2'] = -0.01
+    m = build_model(case, ZonalDataComplete=ZONAL_DATA)._model
+
+    convex = [g for g in m.Generators if g != 'GenCo2']
+    assert sorted(set(g for g, k in m.ProductionCostSegments)) == sorted(convex)
+    assert len(m.ProductionCostSegments) == len(convex) * case.gencost['NS'].iloc[0]
+    assert len(m.ComputeProductionCostsEpigraph) == len(m.ProductionCostSegments) * len(m.TimePeriods)
+    assert list(m.PiecewiseProductionCostIndex) == [('GenCo2', t) for t in m.TimePeriods]
+    for g, k in m.ProductionCostSegments:
+        if k > 0:
+            assert m.ProductionCostSlope[g, k] > m.ProductionCostSlope[g, k - 1]
+
+
+@pytest.mark.parametrize('name', ['case5', 'case14'])
+def test_piecewise_matches_epigraph(name):
+    expected = solve(build_model(load_case(name), ZonalDataComplete=ZONAL_DATA))
+
+    model = build_model(load_case(name), ZonalDataComplete=ZONAL_DATA, config={'production_cost_formulation': 'piecewise'})
+    assert solve(model) == pytest.approx(expected, rel=1e-6)
+    assert not hasattr(model._model, 'PowerGenerationPiecewisePoints')
+
+
+def test_quadratic_negative_linear_cost():
+    # The linear part of the cost above MinimumProductionCost is negative at full output when its coefficient is
+    case = load_case('case5')
+    case.gencost.loc['GenCo0', 'COST_1'] = -5.0
+    m = build_model(case, ZonalDataComplete=ZONAL_DATA, config={'production_cost_formulation': 'quadratic'})._model
+    assert m.ProductionCost['GenCo0', 1].domain is Reals
+    assert m.ProductionCost['GenCo0', 1].lb is None
+
+    m.UnitOn['GenCo0', 1].fix(1)
+    m.PowerGenerated['GenCo0', 1].fix(value(m.MaximumPowerOutput['GenCo0']))
+    m.ProductionCost['GenCo0', 1].set_value(-1.0)
+    constraint = m.ComputeProductionCostsLinear['GenCo0', 1]
+    assert constraint.lslack() >= 0 and constraint.uslack() >= 0
+
+    m = build_model(load_case('case5'), ZonalDataComplete=ZONAL_DATA)._model
+    assert m.ProductionCost['GenCo0', 1].domain is NonNegativeReals
+
+
+def test_cost_coefficients_need_a_polynomial():
+    case = load_case('case5')
+    case.gencost.loc['GenCo0', 'NCOST'] = 4
+    with pytest.raises(ValueError):
+        CaseArrays(case).cost_coefficients()
+
+
+def lowest_production_cost(m, g, t):
+    # The smallest ProductionCost[g, t] allowed by ComputeProductionCostsLinear at the current UnitOn and PowerGenerated
+    constraint = m.ComputeProductionCostsLinear[g, t]
+    m.ProductionCost[g, t].set_value(0.0)
+    at_zero = value(constraint.body)
+    m.ProductionCost[g, t].set_value(1.0)
+    slope = value(constraint.body) - at_zero
+    bound = value(constraint.lower) if constraint.has_lb() else value(constraint.upper)
+    return (bound - at_zero) / slope
+
+
+@pytest.mark.parametrize('name', ['case5', 'case24_ieee_rts'])
+def test_quadratic_cost_identity(name):
+    # MinimumProductionCost, the linear part and the quadratic part add up to COST_0 u + COST_1 p + COST_2 p^2
+    case = load_case(name)
+    m = build_model(case, ZonalDataComplete=ZONAL_DATA, config={'production_cost_formulation': 'quadratic'})._model
+    t = m.TimePeriods.first()
+    for g, row in case.gencost.iterrows():
+        pmin, pmax = case.gen.loc[g, 'PMIN'], case.gen.loc[g, 'PMAX']
+        for u, p in [(0, 0.0), (1, pmin), (1, (pmin + pmax) / 2), (1, pmax)]:
+            m.UnitOn[g, t].set_value(u)
+            m.PowerGenerated[g, t].set_value(p)
+            cost = value(m.MinimumProductionCost[g] * m.UnitOn[g, t] * m.TimePeriodLength) + \
+                lowest_production_cost(m, g, t) + value(m.ProductionCostQuadratic[g, t])
+            expected = row['COST_0'] * u + row['COST_1'] * p + row['COST_2'] * p ** 2
+            assert cost == pytest.approx(expected, rel=1e-9, abs=1e-9)
+
+
+@pytest.mark.parametrize('name', ['case5', 'case14'])
+def test_quadratic_matches_fine_epigraph(name):
+    # HiGHS solves the QP of a fixed commitment; the epigraph of a fine cost curve is within its secant error.
+    # The active set QP solver of HiGHS stalls on the angle and stage cost rows of the default formulation, so
+    # the comparison is made in the lean PTDF formulation, which has neither
+    commitment = build_model(load_case(name), ZonalDataComplete=ZONAL_DATA)
+    solve(commitment)
+    m = commitment._model
+    status = pd.DataFrame([[round(m.UnitOn[g, t].value) for g in m.Generators] for t in m.TimePeriods],
+                          index=list(m.TimePeriods), columns=list(m.Generators))
+
+    case = load_case(name, segments=200)
+    case.gen_status = status
+    expected = solve(build_model(case, ZonalDataComplete=ZONAL_DATA, config={'lean_formulation': True, 'use_ptdf': True}))
+
+    case = load_case(name)
+    case.gen_status = status
+    model = build_model(case, ZonalDataComplete=ZONAL_DATA, config={'lean_formulation': True, 'use_ptdf': True,
+                                                                        'production_cost_formulation': 'quadratic'})
+    objective = solve(model)
+    assert objective == pytest.approx(expected, rel=1e-5)
+    assert objective <= expected * (1 + 1e-6)
+    assert model.results.lmp.notnull().all().all()
+
+
+def test_quadratic_needs_a_fixed_commitment_with_highs():
+    model = build_model(load_case('case5'), ZonalDataComplete=ZONAL_DATA, config={'production_cost_formulation': 'quadratic'})
+    with pytest.raises(ValueError):
+        model.solve(solver='highs')
+
+
+def test_quadratic_solvers():
+    assert supports_quadratic_objective('gurobi') and supports_quadratic_objective('cplex_direct')
+    assert not supports_quadratic_objective('highs') and supports_quadratic_objective('highs', is_mip=False)
+    assert not supports_quadratic_objective('appsi_highs') and supports_quadratic_objective('appsi_highs', is_mip=False)
+    assert not supports_quadratic_objective('glpk', is_mip=False)
+    assert not supports_quadratic_objective('unknown_solver', is_mip=False)
+
+
+def test_quadratic_concave_cost():
+    case = load_case('case5')
+    case.gencost.loc['GenCo2', 'COST_2'] = -0.01
+    with pytest.raises(ValueError):
+        build_model(case, ZonalDataComplete=ZONAL_DATA, config={'production_cost_formulation': 'quadratic'})
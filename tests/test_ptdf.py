@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+The PTDF formulation, with its sparse PTDF kept by the PSSTModel, gives the optimum of the angle formulation
+without angle and flow variables; the flows and angles recovered after the solve are those of the angle
+formulation.
+"""
+
+import numpy as np
+import pytest
+
+from psst.case.utils import calculate_PTDF
+from psst.model import build_model
+
+from .common import load_case, solve, requires_solver, ZONAL_DATA
+
+pytestmark = requires_solver
+
+
+@pytest.mark.parametrize('name', ['case5', 'case14'])
+def test_ptdf_matches_angles(name):
+    angles = build_model(load_case(name), ZonalDataComplete=ZONAL_DATA)
+    expected = solve(angles)
+
+    ptdf = build_model(load_case(name), ZonalDataComplete=ZONAL_DATA, config={'use_ptdf': True})
+    assert solve(ptdf) == pytest.approx(expected, rel=1e-6)
+    assert not hasattr(ptdf._model, 'PTDF')
+    for name in ['Angle', 'LinePower', 'CalculateLinePower']:
+        assert not hasattr(ptdf._model, name)
+
+
+def test_recovered_flows_and_angles():
+    # case5 has no taps, so both formulations model the same network, and its optimal flows are unique
+    angles = build_model(load_case('case5'), ZonalDataComplete=ZONAL_DATA)
+    solve(angles)
+    ptdf = build_model(load_case('case5'), ZonalDataComplete=ZONAL_DATA, config={'use_ptdf': True})
+    solve(ptdf)
+
+    np.testing.assert_allclose(ptdf.results.line_power.values, angles.results.line_power.values, atol=1e-6)
+    np.testing.assert_allclose(ptdf.results.angles.values, angles.results.angles.values, atol=1e-8)
+
+
+def test_ptdf_tolerance():
+    case = load_case('case14')
+    dense = calculate_PTDF(case)
+    model = build_model(case, ZonalDataComplete=ZONAL_DATA, config={'use_ptdf': True, 'ptdf_tolerance': 0.05})
+
+    assert model.sensitivities.ptdf.nnz == np.count_nonzero(np.absolute(dense) >= 0.05)
+    assert sum(len(terms) for terms in model.sensitivities.terms.values()) == model.sensitivities.ptdf.nnz
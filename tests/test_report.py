@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+The build report has one row per stage of build_model, whose counts add up to the size of the model.
+"""
+
+import tracemalloc
+
+import pytest
+
+from psst.model import build_model
+
+from .common import load_case, ZONAL_DATA
+
+
+def concave_cost(case):
+    # A concave cost curve is modelled with a Piecewise block, whose variables and constraints are counted too
+    case.gencost.loc['GenCo2', 'COST_2'] = -0.01
+    return case
+
+
+@pytest.mark.parametrize('name, prepare', [('case5', None), ('case14', None), ('case5', concave_cost)])
+def test_stages_add_up_to_model(name, prepare):
+    case = load_case(name)
+    if prepare is not None:
+        case = prepare(case)
+    model = build_model(case, ZonalDataComplete=ZONAL_DATA, config={'report': True})
+    stages = model.build_report.stages
+
+    assert list(stages.columns) == ['time', 'memory', 'variables', 'constraints', 'nonzeros']
+    for stage in ['ingest', 'network', 'generators', 'production_cost', 'variables', 'constraint_line',
+                  'constraint_power_balance', 'constraint_for_cost', 'objective_function']:
+        assert stage in stages.index
+    assert stages.index.is_unique
+    assert (stages['time'] >= 0).all()
+
+    m = model._model
+    assert stages['variables'].sum() == m.nvariables()
+    assert stages['constraints'].sum() == m.nconstraints()
+    assert stages.loc['constraint_for_cost', 'constraints'] > 0
+    assert 'total' in str(model.build_report)
+
+    # tracing is stopped again when the build started it
+    assert not tracemalloc.is_tracing()
+
+
+def test_report_is_opt_in():
+    model = build_model(load_case('case5'), ZonalDataComplete=ZONAL_DATA)
+    assert model.build_report is None
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Every window of a PSSTRollingHorizon, solved on the updated template, has the objective of a model built from
+scratch for the load and initial state of that window.
+"""
+
+import pandas as pd
+import pytest
+
+from psst.model import build_model
+from psst.model.rolling import PSSTRollingHorizon
+
+from .common import load_case, solve, requires_solver, SOLVER, ZONAL_DATA
+
+pytestmark = requires_solver
+
+
+def build_window(case, load_df, initial_state, first):
+    generator_df = pd.merge(case.gen, case.gencost, left_index=True, right_index=True)
+    generator_df['UnitOnT0State'] = initial_state['UnitOnT0State']
+    case.gen_status = None
+    model = build_model(case, generator_df=generator_df, load_df=load_df, ZonalDataComplete=ZONAL_DATA)
+    if not first:
+        for g, v in initial_state['PowerGeneratedT0'].items():
+            model._model.PowerGeneratedT0[g].fix(v)
+    return model
+
+
+def test_rolling_windows_match_build():
+    case = load_case('case5', periods=20, minimum_up_time=3, minimum_down_time=3)
+    rolling = PSSTRollingHorizon(case, window=8, look_ahead=4, ZonalDataComplete=ZONAL_DATA)
+
+    initial_state = rolling.initial_state
+    windows = list()
+    for window in rolling.run(solver=SOLVER, mipgap=1e-6):
+        assert window.status == 'optimal'
+        model = build_window(load_case('case5', periods=20, minimum_up_time=3, minimum_down_time=3),
+                             rolling._window_load(window.start), initial_state, first=window.start == 0)
+        assert window.objective == pytest.approx(solve(model), rel=1e-6)
+        initial_state = window.initial_state
+        windows.append(window)
+
+    assert [w.start for w in windows] == [0, 8, 16]
+    assert sum(w.periods for w in windows) == 20
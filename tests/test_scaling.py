@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Row and slack column scaling by powers of two gives the optimum of the unscaled model, centers the coefficients of
+every row around one and narrows the range of the matrix.
+"""
+
+import numpy as np
+import pytest
+
+from pyomo.environ import Objective
+
+from psst.model import build_model
+from psst.model.scaling import coefficient_ranges, _linear_rows
+from psst.solver.results import PSSTResults
+
+from .common import load_case, solve, requires_solver, ZONAL_DATA
+
+
+@requires_solver
+@pytest.mark.parametrize('name', ['case5', 'case14'])
+def test_scaling_matches_unscaled(name):
+    expected = solve(build_model(load_case(name), ZonalDataComplete=ZONAL_DATA))
+
+    model = build_model(load_case(name), ZonalDataComplete=ZONAL_DATA, config={'scaling': True})
+    assert solve(model) == pytest.approx(expected, rel=1e-6)
+
+    factors = np.array(list(model._model.RowScaling.values()))
+    assert len(factors) > 0
+    np.testing.assert_array_equal(np.exp2(np.round(np.log2(factors))), factors)
+
+
+def test_scaled_rows():
+    model = build_model(load_case('case14'), ZonalDataComplete=ZONAL_DATA, config={'scaling': True})
+    report = model.scaling_report
+    # the mismatch penalty of the stage cost rows no longer sets the range of the matrix
+    assert report.loc['matrix', ('before', 'max')] / report.loc['matrix', ('before', 'min')] == pytest.approx(1e6)
+    assert report.loc['matrix', ('after', 'max')] / report.loc['matrix', ('after', 'min')] < 1e4
+    # the objective has no slack columns
+    assert report.loc['objective', 'before'].equals(report.loc['objective', 'after'])
+    ranges = coefficient_ranges(model._model)
+    assert ranges.loc['matrix', 'max'] == report.loc['matrix', ('after', 'max')]
+    assert ranges.loc['matrix', 'min'] == report.loc['matrix', ('after', 'min')]
+
+    # The geometric mean of the largest and smallest coefficient of every row is within a factor sqrt(2) of one
+    constraints, matrix, rhs, columns = _linear_rows(model._model)
+    magnitudes = abs(matrix).tolil()
+    for row in magnitudes.data:
+        if len(row) > 0:
+            assert 2 ** -0.5 <= np.sqrt(min(row) * max(row)) <= 2 ** 0.5
+
+
+@requires_solver
+@pytest.mark.parametrize('config', [{}, {'lean_formulation': True}])
+def test_scaled_slack_columns(config):
+    # A load that the units cannot serve, so the mismatch slacks are in the solution
+    def build(scaling):
+        case = load_case('case5')
+        case.load = case.load * 2.0
+        return build_model(case, ZonalDataComplete=ZONAL_DATA, config=dict(config, scaling=scaling))
+
+    unscaled = build(False)
+    expected = solve(unscaled)
+    model = build(True)
+    assert solve(model) == pytest.approx(expected, rel=1e-6)
+
+    m = model._model
+    if not config:
+        factors = [m.ColumnScaling[v] for v in m.posLoadGenerateMismatch.values()]
+        assert factors == [2.0 ** -10] * len(factors)
+
+    # the slacks are returned in the units of the unscaled model
+    assert PSSTResults._get('LoadGenerateMismatch', unscaled._model).abs().values.max() > 1
+    for attribute in ['LoadGenerateMismatch', 'posLoadGenerateMismatch', 'negLoadGenerateMismatch']:
+        expected = PSSTResults._get(attribute, unscaled._model)
+        np.testing.assert_allclose(PSSTResults._get(attribute, m).values, expected.values, rtol=1e-6, atol=1e-6)
+
+
+def test_scaling_quadratic_cost():
+    # The quadratic objective is left out of the compiled rows and stays active
+    model = build_model(load_case('case5'), ZonalDataComplete=ZONAL_DATA,
+                        config={'production_cost_formulation': 'quadratic', 'scaling': True})
+    assert len(list(model._model.component_data_objects(Objective, active=True))) == 1
+    assert len(model._model.RowScaling) > 0
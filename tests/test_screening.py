@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Screened thermal limits give the optimum of the model with every limit, with price sensitive loads and with a
+load generation mismatch.
+"""
+
+import numpy as np
+import pytest
+from scipy.optimize import linprog
+
+from psst.case.utils import line_flow_bounds
+from psst.model import build_model
+
+from .common import load_case, solve, requires_solver, ZONAL_DATA
+
+
+def price_sensitive_loads(case):
+    # One load at every bus, with the same bid in every period
+    data = dict()
+    for i, bus in enumerate(case.bus.index):
+        for t in case.load.index:
+            data['PSL{}'.format(i), t] = {'atBus': bus, 'd': 0.0, 'e': 40.0 + i, 'f': -1.0, 'Pmin': 5.0, 'Pmax': 30.0}
+    return data
+
+
+def screened_case(name, price_sensitive_load, scale):
+    case = load_case(name)
+    case.load = case.load * scale
+    if name == 'case14':
+        case.branch['RATE_A'] = 40.0
+    case.PriceSenLoadFlag = int(price_sensitive_load)
+    return case
+
+
+@pytest.mark.parametrize('method', ['interval', 'balance'])
+def test_line_flow_bounds(method):
+    # The bounds are the extreme flows over the box of injections, which must also balance demand for 'balance'
+    rng = np.random.RandomState(0)
+    ptdf = rng.randn(4, 6)
+    bus = np.array([0, 1, 2, 3, 5, 5, 1])
+    lower = np.vstack([np.zeros((4, 3)), -1 - 5 * rng.rand(3, 3)])
+    upper = np.vstack([5 + 10 * rng.rand(4, 3), lower[4:] + 2 * rng.rand(3, 3)])
+    demand = 4 * rng.rand(6, 3)
+
+    flow_lower, flow_upper = line_flow_bounds(ptdf, bus, lower, upper, demand, method=method)
+    for l in range(4):
+        for t in range(3):
+            constraints = dict(bounds=list(zip(lower[:, t], upper[:, t])))
+            if method == 'balance':
+                constraints.update(A_eq=np.ones((1, len(bus))), b_eq=[demand[:, t].sum()])
+            c = ptdf[l, bus]
+            demand_flow = ptdf[l] @ demand[:, t]
+            assert flow_upper[l, t] == pytest.approx(-linprog(-c, **constraints).fun - demand_flow)
+            assert flow_lower[l, t] == pytest.approx(linprog(c, **constraints).fun - demand_flow)
+
+
+@requires_solver
+@pytest.mark.parametrize('scale', [1.0, 3.0])
+@pytest.mark.parametrize('price_sensitive_load', [False, True])
+@pytest.mark.parametrize('name', ['case5', 'case14'])
+def test_screened_line_limits(name, price_sensitive_load, scale):
+    # Three times the load is more than the generators can supply, so the solution has a load generation mismatch
+    def build(config):
+        case = screened_case(name, price_sensitive_load, scale)
+        data = price_sensitive_loads(case) if price_sensitive_load else None
+        return build_model(case, ZonalDataComplete=ZONAL_DATA, PriceSenLoadData=data, config=config)
+
+    expected = solve(build({}))
+    screened = build({'screen_line_limits': True})
+    assert screened.screened_line_limits > 0
+    assert solve(screened) == pytest.approx(expected, rel=1e-6)
+
+    limits = screened.results.maximum_line_power.abs()
+    limits = limits[limits > 1e-3]
+    flows = screened.results.line_power[limits.index].abs()
+    assert np.all(flows.values <= limits.values + 1e-6)
+
+
+def test_screening_with_storage():
+    case = load_case('case5')
+    case.StorageFlag = 1
+    with pytest.raises(ValueError):
+        build_model(case, ZonalDataComplete=ZONAL_DATA, config={'screen_line_limits': True})
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+N-1 limits added lazily give the optimum of the model with every post-contingency limit, and the flows after
+every outage, recomputed from the outage PTDF, are within the limits.
+"""
+
+import numpy as np
+import pytest
+
+from psst.case.sensitivities import SensitivityEngine
+from psst.model import build_model
+from psst.model.constraints import contingency_line_power_rule
+
+from .common import load_case, solve, requires_solver, ZONAL_DATA
+
+pytestmark = requires_solver
+
+
+def secure_case(name):
+    # case5 has binding limits of its own; case14 has none, so all of its lines get a tight one
+    case = load_case(name)
+    if name == 'case14':
+        case.branch['RATE_A'] = 60.0
+    return case
+
+
+def build_all_contingencies(case, config):
+    model = build_model(case, ZonalDataComplete=ZONAL_DATA, config=dict(config))
+    m, sensitivities = model._model, model.sensitivities
+    for k in sensitivities.contingencies:
+        for l in sensitivities.monitored:
+            if l != k:
+                for t in m.TimePeriods:
+                    m.ContingencyLinePowerConstraint[k, l, t] = contingency_line_power_rule(m, k, l, t, sensitivities)
+    return model
+
+
+@pytest.mark.parametrize('use_ptdf', [False, True])
+@pytest.mark.parametrize('name', ['case5', 'case14'])
+def test_lazy_contingency_limits(name, use_ptdf):
+    config = {'security_constraints': True, 'use_ptdf': use_ptdf}
+    full = build_all_contingencies(secure_case(name), config)
+    expected = solve(full)
+    assert full.contingency_iterations == [0]
+
+    lazy = build_model(secure_case(name), ZonalDataComplete=ZONAL_DATA, config=dict(config))
+    assert solve(lazy) == pytest.approx(expected, rel=1e-6)
+    assert len(lazy.contingency_iterations) > 1
+    assert len(lazy._model.ContingencyLinePowerConstraint) < len(full._model.ContingencyLinePowerConstraint)
+
+    # Bus injections from the base case flows, and the flows after each outage from the outage PTDF of the
+    # network of the model, whose angle formulation leaves out taps; a zero rating means the line is not limited
+    case = secure_case(name)
+    engine = SensitivityEngine(case, taps=use_ptdf)
+    injections = engine.incidence.T @ lazy.results.line_power[case.branch.index].values.T
+    limits = np.absolute(case.branch['RATE_A'].values)
+    limited = limits > 1e-3
+    for k in lazy.sensitivities.contingencies:
+        flows = engine.outage_ptdf([k]) @ injections
+        assert np.all(np.absolute(flows[limited]) <= limits[limited, None] + 1e-6)
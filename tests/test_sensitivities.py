@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+The sparse SensitivityEngine gives the PTDF and LODF of pypower's dense makePTDF and makeLODF, directly and
+through the on-disk SensitivityCache; its low-rank outage updates give the PTDF of the network without the
+outaged branches.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from pypower.makeLODF import makeLODF
+from pypower.makePTDF import makePTDF
+
+from psst.case import read_matpower
+from psst.case.sensitivities import SensitivityEngine, SensitivityCache
+from psst.case.utils import calculate_PTDF, calculate_LODF
+
+from .common import CURDIR
+
+CASES = ['case5', 'case14', 'case24_ieee_rts', 'case118']
+
+
+def read_case(name):
+    return read_matpower(os.path.join(CURDIR, '../cases/{}.m'.format(name)))
+
+
+def pypower_sensitivities(case):
+    # Dense (PTDF, LODF) of pypower, with the buses numbered from 0 in the order of the bus table
+    branch = case.branch.copy(deep=True)
+    branch['F_BUS'] = case.bus.index.get_indexer(branch['F_BUS'])
+    branch['T_BUS'] = case.bus.index.get_indexer(branch['T_BUS'])
+    bus = case.bus.reset_index(drop=True).reset_index().values.astype(float)
+    branch = branch.values.astype(float)
+    slack = int(np.flatnonzero(case.bus['TYPE'].values == 3)[0])
+    ptdf = makePTDF(case.baseMVA, bus, branch, slack)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return ptdf, makeLODF(branch, ptdf)
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_ptdf_matches_pypower(name):
+    case = read_case(name)
+    expected, _ = pypower_sensitivities(case)
+    np.testing.assert_allclose(calculate_PTDF(case), expected, atol=1e-10)
+
+    engine = SensitivityEngine(case)
+    lines = case.branch.index[::3]
+    np.testing.assert_allclose(engine.ptdf(lines=lines), expected[::3], atol=1e-10)
+    np.testing.assert_allclose(engine.sparse_ptdf(lines=lines).toarray(), expected[::3], atol=1e-10)
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_lodf_matches_pypower(name):
+    # Outages that island the network have no LODF, the engine leaves them as NaN
+    case = read_case(name)
+    _, expected = pypower_sensitivities(case)
+    lodf = SensitivityEngine(case).lodf()
+
+    secure = np.isfinite(lodf).all(axis=0)
+    assert np.all(np.isnan(lodf[:, ~secure]).any(axis=0))
+    np.testing.assert_allclose(lodf[:, secure], expected[:, secure], atol=1e-10)
+
+
+def test_engine_reuses_factors():
+    case = read_case('case14')
+    engine = SensitivityEngine.from_case(case)
+    engine.factors
+    assert SensitivityEngine.from_case(read_case('case14')) is engine
+
+    case.branch.loc[case.branch.index[0], 'BR_X'] *= 2
+    assert SensitivityEngine.from_case(case) is not engine
+
+
+def test_cache_round_trip(tmp_path):
+    case = read_case('case14')
+    cache = SensitivityCache(directory=str(tmp_path))
+    expected = SensitivityEngine(case).ptdf()
+
+    np.testing.assert_array_equal(calculate_PTDF(case, cache=cache), expected)
+    cached = calculate_PTDF(case, cache=cache)
+    assert isinstance(cached, np.memmap)
+    np.testing.assert_array_equal(cached, expected)
+    np.testing.assert_array_equal(calculate_LODF(case, cache=cache), SensitivityEngine(case).lodf())
+
+    # A new reactance is a new topology, with an entry of its own
+    case.branch.loc[case.branch.index[0], 'BR_X'] *= 2
+    assert not np.allclose(calculate_PTDF(case, cache=cache), expected)
+    assert len(os.listdir(str(tmp_path))) == 2
+
+
+def test_cache_eviction(tmp_path):
+    cache = SensitivityCache(directory=str(tmp_path), max_size=0)
+    first, second = read_case('case5'), read_case('case14')
+    cache.ptdf(first)
+    cache.ptdf(second)
+    assert os.listdir(str(tmp_path)) == [SensitivityEngine(second).fingerprint]
+
+    cache = SensitivityCache(directory=str(tmp_path), max_age=-1)
+    cache.ptdf(first)
+    assert os.listdir(str(tmp_path)) == [SensitivityEngine(first).fingerprint]
+
+
+@pytest.mark.parametrize('name, outages', [('case14', [0]), ('case14', [2, 6]), ('case14', [1, 7, 12]),
+                                           ('case118', [0]), ('case118', [2, 5]), ('case118', [3, 20, 40])])
+def test_outage_ptdf_matches_recomputed(name, outages):
+    # Outages that keep the network connected, against a PTDF factorized with the branches out of service
+    case = read_case(name)
+    engine = SensitivityEngine(case)
+    outaged = case.branch.index[outages]
+    lines = case.branch.index[::2]
+    updated = engine.outage_ptdf(outaged, lines=lines, base=engine.ptdf(lines=lines))
+
+    case.branch.loc[outaged, 'BR_STATUS'] = 0
+    np.testing.assert_allclose(updated, SensitivityEngine(case).ptdf(lines=lines), atol=1e-10)
+    np.testing.assert_allclose(engine.outage_ptdf(outaged), SensitivityEngine(case).ptdf(), atol=1e-10)
+
+
+def test_outage_islanding():
+    # Branch 13 is the only connection of bus 8 in case14
+    case = read_case('case14')
+    engine = SensitivityEngine(case)
+    outaged = case.branch.index[[13]]
+    assert engine.islanding(outaged)
+    assert not engine.islanding(case.branch.index[[0]])
+    with pytest.raises(ValueError):
+        engine.outage_ptdf(outaged)
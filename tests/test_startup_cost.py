@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+The startup type formulation, with one hot and one cold start variable per unit and period, gives the optimum of
+the big-M formulation of startup costs.
+"""
+
+import numpy as np
+import pytest
+
+from pyomo.environ import value
+
+from psst.model import build_model
+
+from .common import load_case, solve, requires_solver, ZONAL_DATA
+
+
+def build(name, config, initial_state=None):
+    case = load_case(name, periods=12, minimum_up_time=1, minimum_down_time=1)
+    # Starts that cost as much as a few hours of production, after one hour (hot) or three hours (cold) off line
+    case.load = case.load.mul(np.where(np.isin(np.arange(12), [3, 6, 7, 8]), 1.0 / 3.0, 1.0), axis=0)
+    case.gencost['STARTUP_HOT'] = 100.0
+    case.gencost['STARTUP_COLD'] = 500.0
+    for g, state in (initial_state or {}).items():
+        case.gen.loc[g, 'UnitOnT0State'] = state
+    return build_model(case, ZonalDataComplete=ZONAL_DATA, config=config)
+
+
+# Units that start the horizon off line for one (hot) or for many (cold) periods. Only units that are not needed
+# in the first period, since a shortfall is priced at the mismatch penalty and swamps the startup costs
+@requires_solver
+@pytest.mark.parametrize('up_down_time_formulation', ['window', 'turn_on_off'])
+@pytest.mark.parametrize('name, initial_state', [('case5', {}), ('case5', {'GenCo0': -1, 'GenCo1': -5}),
+                                                 ('case14', {'GenCo2': -1, 'GenCo4': -5})])
+def test_startup_type_matches_big_m(name, initial_state, up_down_time_formulation):
+    config = {'up_down_time_formulation': up_down_time_formulation}
+    expected = solve(build(name, dict(config, startup_cost_formulation='big_m'), initial_state))
+
+    model = build(name, dict(config, startup_cost_formulation='startup_type'), initial_state)
+    assert solve(model) == pytest.approx(expected, rel=1e-6)
+
+    m = model._model
+    assert not hasattr(m, 'ComputeStartupCostsMinusM')
+    # every start is either hot or cold, and priced as such
+    for g in m.Generators:
+        for t in m.TimePeriods:
+            assert value(m.HotStartup[g, t] + m.ColdStartup[g, t]) == pytest.approx(value(m.UnitStart[g, t]), abs=1e-6)
+            assert value(m.StartupCost[g, t]) == pytest.approx(value(m.HotStartCost[g] * m.HotStartup[g, t] + m.ColdStartCost[g] * m.ColdStartup[g, t]), abs=1e-4)
+
+
+def test_unknown_formulation():
+    with pytest.raises(ValueError):
+        build('case5', {'startup_cost_formulation': 'big-m'})
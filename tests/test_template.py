@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+A PSSTModelTemplate, which imposes the initial conditions by fixing UnitOn, has the same feasible set as a
+model built with the initial up and down time constraints, before and after an update.
+"""
+
+import pytest
+
+from psst.model import build_model, PSSTModelTemplate
+
+from .common import load_case, solve, requires_solver, SOLVER, ZONAL_DATA
+
+pytestmark = requires_solver
+
+# Signed hours each unit has been on (positive) or off (negative); with three hour minimum up and down times
+# they leave units that must stay on, must stay off and are free in the first periods
+INITIAL_STATES = [
+    {'GenCo0': 1, 'GenCo1': 1, 'GenCo2': 1, 'GenCo3': 1, 'GenCo4': 1},
+    {'GenCo0': 1, 'GenCo1': -1, 'GenCo2': 5, 'GenCo3': -2, 'GenCo4': 2},
+    {'GenCo0': -1, 'GenCo1': -4, 'GenCo2': 1, 'GenCo3': -1, 'GenCo4': -3},
+]
+
+
+def initial_state_case(initial_state, scale=1.0):
+    case = load_case('case5', periods=8, minimum_up_time=3, minimum_down_time=3)
+    case.gen['UnitOnT0State'] = case.gen.index.map(initial_state)
+    case.load = case.load * scale
+    return case
+
+
+@pytest.mark.parametrize('formulation', ['window', 'turn_on_off'])
+@pytest.mark.parametrize('initial_state', INITIAL_STATES)
+def test_template_matches_build(initial_state, formulation):
+    config = {'up_down_time_formulation': formulation}
+    case = initial_state_case(initial_state)
+    expected = solve(build_model(case, ZonalDataComplete=ZONAL_DATA, config=dict(config)))
+    template = PSSTModelTemplate(case, ZonalDataComplete=ZONAL_DATA, config=dict(config))
+    assert solve(template) == pytest.approx(expected, rel=1e-6)
+
+
+@pytest.mark.parametrize('initial_state', INITIAL_STATES[1:])
+def test_template_update_matches_build(initial_state):
+    template = PSSTModelTemplate(initial_state_case(INITIAL_STATES[0]), ZonalDataComplete=ZONAL_DATA)
+    solve(template)
+
+    case = initial_state_case(initial_state, scale=1.2)
+    template.update(load_df=case.load, initial_state={'UnitOnT0State': initial_state})
+    expected = solve(build_model(case, ZonalDataComplete=ZONAL_DATA))
+    assert solve(template) == pytest.approx(expected, rel=1e-6)
+
+
+@pytest.mark.parametrize('template', [False, True])
+def test_minimum_up_time_from_first_period(template):
+    # GenCo0 has been off long enough to start in period 0, but not to shut down again in period 1
+    case = initial_state_case({'GenCo0': -5, 'GenCo1': 1, 'GenCo2': 5, 'GenCo3': 5, 'GenCo4': 5})
+    case.gen_status['GenCo0'] = 0
+    case.gen_status.loc[0, 'GenCo0'] = 1
+    if template is True:
+        model = PSSTModelTemplate(case, ZonalDataComplete=ZONAL_DATA)
+    else:
+        model = build_model(case, ZonalDataComplete=ZONAL_DATA)
+    _, status = model.solve(solver=SOLVER)
+    assert status == 'infeasible'
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+The turn-on/turn-off formulation of minimum up and down times gives the optimum of the window formulation.
+"""
+
+import numpy as np
+import pytest
+
+from pyomo.environ import value
+
+from psst.model import build_model
+
+from .common import load_case, solve, requires_solver, ZONAL_DATA
+
+
+# Units that start the horizon off line, which are not needed in the first period: a shortfall is priced at the
+# mismatch penalty and swamps the rest of the objective
+INITIAL_STATE = {'case5': {'GenCo0': -1, 'GenCo1': -5}, 'case14': {'GenCo2': -1, 'GenCo4': -5}}
+
+
+def build(name, formulation, minimum_up_down_time=3):
+    case = load_case(name, periods=12, minimum_up_time=minimum_up_down_time, minimum_down_time=minimum_up_down_time)
+    # A load that drops to a third and back, so that units are stopped and started again
+    case.load = case.load.mul(np.where(np.arange(12) % 6 < 3, 1.0, 1.0 / 3.0), axis=0)
+    for g, state in INITIAL_STATE[name].items():
+        case.gen.loc[g, 'UnitOnT0State'] = state
+    return build_model(case, ZonalDataComplete=ZONAL_DATA, config={'up_down_time_formulation': formulation})
+
+
+@requires_solver
+@pytest.mark.parametrize('minimum_up_down_time', [1, 3])
+@pytest.mark.parametrize('name', ['case5', 'case14'])
+def test_turn_on_off_matches_window(name, minimum_up_down_time):
+    expected = solve(build(name, 'window', minimum_up_down_time))
+
+    model = build(name, 'turn_on_off', minimum_up_down_time)
+    assert solve(model) == pytest.approx(expected, rel=1e-6)
+
+    m = model._model
+    assert not hasattr(m, 'EnforceUpTimeConstraintsSubsequent')
+    # starts and stops follow the changes of status, of which there are some
+    changes = 0
+    for g in m.Generators:
+        previous = value(m.UnitOnT0[g])
+        for t in m.TimePeriods:
+            status = round(value(m.UnitOn[g, t]))
+            assert value(m.UnitStart[g, t] - m.UnitStop[g, t]) == pytest.approx(status - previous, abs=1e-6)
+            changes = changes + abs(status - previous)
+            previous = status
+    assert changes > 0
+
+
+def test_unknown_formulation():
+    with pytest.raises(ValueError):
+        build('case5', 'windows')
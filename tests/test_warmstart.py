@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+A warm start from a given commitment is completed by an LP solve and does not change the optimum; a commitment
+that breaks the minimum up and down times is dropped with a warning.
+"""
+
+import logging
+
+import pandas as pd
+import pytest
+
+from psst.model import build_model
+
+from .common import load_case, solve, requires_solver, ZONAL_DATA
+
+pytestmark = requires_solver
+
+
+def commitment(psst_model):
+    m = psst_model._model
+    return pd.DataFrame([[round(m.UnitOn[g, t].value) for g in m.Generators] for t in m.TimePeriods],
+                        index=list(m.TimePeriods), columns=list(m.Generators))
+
+
+@pytest.mark.parametrize('persistent', [False, True])
+@pytest.mark.parametrize('name', ['case5', 'case14'])
+def test_warmstart_matches_cold_start(name, persistent):
+    cold = build_model(load_case(name), ZonalDataComplete=ZONAL_DATA)
+    expected = solve(cold)
+
+    model = build_model(load_case(name), ZonalDataComplete=ZONAL_DATA)
+    assert model.set_warmstart(commitment(cold), solver='highs', persistent=persistent) is True
+    # the start is not kept fixed
+    assert not any(u.fixed for u in model._model.UnitOn.values())
+    assert solve(model, warmstart=commitment(cold), persistent=persistent) == pytest.approx(expected, rel=1e-6)
+
+
+def test_partial_warmstart():
+    # Generators and periods missing from the commitment keep the current value of UnitOn
+    cold = build_model(load_case('case5'), ZonalDataComplete=ZONAL_DATA)
+    expected = solve(cold)
+
+    model = build_model(load_case('case5'), ZonalDataComplete=ZONAL_DATA)
+    assert model.set_warmstart(commitment(cold).iloc[:3, :2], solver='highs') is True
+    assert solve(model) == pytest.approx(expected, rel=1e-6)
+
+
+def test_infeasible_warmstart(caplog):
+    # Every unit has been on for one period and has to stay on for another, so it cannot be off at first
+    expected = solve(build_model(load_case('case5'), ZonalDataComplete=ZONAL_DATA))
+
+    model = build_model(load_case('case5'), ZonalDataComplete=ZONAL_DATA)
+    m = model._model
+    off = pd.DataFrame(0, index=list(m.TimePeriods), columns=list(m.Generators))
+    with caplog.at_level(logging.WARNING, logger='psst.model'):
+        assert model.set_warmstart(off, solver='highs') is False
+    assert 'infeasible' in caplog.text
+    assert not any(u.fixed for u in m.UnitOn.values())
+
+    assert solve(model, warmstart=off) == pytest.approx(expected, rel=1e-6)